@@ -0,0 +1,300 @@
+import heapq, json, math, time
+
+class RunningStats(object):
+	"""
+	Count, sum, min, max, mean and variance of a stream of numbers in constant memory.
+	The mean and variance follow Welford's update, and two instances merge exactly with
+	Chan's parallel formula, so shards can be aggregated separately and combined later.
+	"""
+
+	def __init__(self, count: int = 0, mean: float = 0.0, m2: float = 0.0, minimum: float = None, maximum: float = None):
+		self.count = count
+		self.mean = mean
+		self.m2 = m2
+		self.minimum = minimum
+		self.maximum = maximum
+
+	def update(self, value: float):
+		self.count += 1
+		delta = value - self.mean
+		self.mean += delta / self.count
+		self.m2 += delta * (value - self.mean)
+		self.minimum = value if self.minimum is None else min(self.minimum, value)
+		self.maximum = value if self.maximum is None else max(self.maximum, value)
+
+	def merge(self, other: object) -> object:
+		if other.count == 0:
+			return self
+		if self.count == 0:
+			self.count, self.mean, self.m2, self.minimum, self.maximum = other.count, other.mean, other.m2, other.minimum, other.maximum
+			return self
+		count = self.count + other.count
+		delta = other.mean - self.mean
+		self.mean += delta * other.count / count
+		self.m2 += other.m2 + delta * delta * self.count * other.count / count
+		self.count = count
+		self.minimum = min(self.minimum, other.minimum)
+		self.maximum = max(self.maximum, other.maximum)
+		return self
+
+	@property
+	def total(self) -> float:
+		return self.mean * self.count
+
+	@property
+	def variance(self) -> float:
+		return self.m2 / self.count if self.count else 0.0
+
+	@property
+	def stddev(self) -> float:
+		return math.sqrt(self.variance)
+
+	def to_list(self) -> list:
+		return [self.count, self.mean, self.m2, self.minimum, self.maximum]
+
+	@classmethod
+	def from_list(cls, values: list) -> object:
+		return cls(*values)
+
+	def summary(self) -> dict:
+		return {"count": self.count, "mean": self.mean, "variance": self.variance, "min": self.minimum, "max": self.maximum}
+
+class PhraseCounter(object):
+	"""
+	Exact phrase -> count table. Merging adds counts.
+	"""
+
+	def __init__(self, counts: dict = None):
+		self.counts = dict(counts or {})
+
+	def update(self, phrase: str, count: int = 1):
+		self.counts[phrase] = self.counts.get(phrase, 0) + count
+
+	def merge(self, other: object) -> object:
+		for phrase, count in other.counts.items():
+			self.update(phrase, count)
+		return self
+
+	def top(self, k: int = None) -> list:
+		return sorted(self.counts.items(), key=lambda item: (-item[1], item[0]))[:k]
+
+	def to_dict(self) -> dict:
+		return {"type": "exact", "counts": self.counts}
+
+	@classmethod
+	def from_dict(cls, data: dict) -> object:
+		return cls(data["counts"])
+
+class SpaceSaving(object):
+	"""
+	Space-Saving heavy hitter sketch. Tracks at most `capacity` phrases, so memory stays
+	fixed however many distinct phrases are seen. Each reported count overestimates the true
+	count by at most its error, and every error is at most total / capacity, so any phrase
+	with a share above 1 / capacity is guaranteed to be tracked. Use from_error to size the
+	sketch from an error bound instead. Sketches merge by adding counts, charging phrases
+	missing from one side that side's minimum count, and keeping the top `capacity`.
+	"""
+
+	def __init__(self, capacity: int = 1000):
+		self.capacity = capacity
+		self.counts = {}
+		self.errors = {}
+		self.total = 0
+		self.heap = []
+
+	@classmethod
+	def from_error(cls, epsilon: float) -> object:
+		return cls(int(math.ceil(1 / epsilon)))
+
+	def minimum(self) -> int:
+		if len(self.counts) < self.capacity:
+			return 0
+		# entries are pushed on every increment, so skip the ones that are out of date
+		while self.heap[0][0] != self.counts.get(self.heap[0][1]):
+			heapq.heappop(self.heap)
+		return self.heap[0][0]
+
+	def update(self, phrase: str, count: int = 1):
+		self.total += count
+		if phrase not in self.counts and len(self.counts) >= self.capacity:
+			floor = self.minimum()
+			evicted = heapq.heappop(self.heap)[1]
+			del self.counts[evicted]
+			del self.errors[evicted]
+			self.counts[phrase], self.errors[phrase] = floor, floor
+		self.counts[phrase] = self.counts.get(phrase, 0) + count
+		self.errors.setdefault(phrase, 0)
+		heapq.heappush(self.heap, (self.counts[phrase], phrase))
+		if len(self.heap) > 4 * self.capacity:
+			self.heap = [(count, phrase) for phrase, count in self.counts.items()]
+			heapq.heapify(self.heap)
+
+	def merge(self, other: object) -> object:
+		selfFloor, otherFloor = self.minimum(), other.minimum()
+		counts, errors = {}, {}
+		for phrase in set(self.counts) | set(other.counts):
+			counts[phrase] = self.counts.get(phrase, selfFloor) + other.counts.get(phrase, otherFloor)
+			errors[phrase] = self.errors.get(phrase, selfFloor) + other.errors.get(phrase, otherFloor)
+		kept = heapq.nlargest(self.capacity, counts.items(), key=lambda item: item[1])
+		self.counts = dict(kept)
+		self.errors = {phrase: errors[phrase] for phrase in self.counts}
+		self.total += other.total
+		self.heap = [(count, phrase) for phrase, count in self.counts.items()]
+		heapq.heapify(self.heap)
+		return self
+
+	def top(self, k: int = None) -> list:
+		return sorted(self.counts.items(), key=lambda item: (-item[1], item[0]))[:k]
+
+	def guaranteed(self, k: int = None) -> list:
+		"""
+		The top phrases with (count, lower bound) pairs. A lower bound above the next
+		phrase's count means the phrase is certainly among the heavy hitters.
+		"""
+		return [(phrase, count, count - self.errors[phrase]) for phrase, count in self.top(k)]
+
+	def to_dict(self) -> dict:
+		return {"type": "space_saving", "capacity": self.capacity, "total": self.total,
+				"counts": [[phrase, count, self.errors[phrase]] for phrase, count in self.counts.items()]}
+
+	@classmethod
+	def from_dict(cls, data: dict) -> object:
+		sketch = cls(data["capacity"])
+		sketch.total = data["total"]
+		for phrase, count, error in data["counts"]:
+			sketch.counts[phrase], sketch.errors[phrase] = count, error
+		sketch.heap = [(count, phrase) for phrase, count in sketch.counts.items()]
+		heapq.heapify(sketch.heap)
+		return sketch
+
+class WindowedPhraseTracker(object):
+	"""
+	Sliding window of phrase counts. Time is cut into buckets of `bucketSeconds`, each with
+	its own counter (a SpaceSaving sketch when capacity is set, exact counts otherwise), and
+	buckets older than `windowSeconds` are dropped. Queries merge the buckets in the window,
+	so memory stays at most capacity phrases per bucket.
+	"""
+
+	def __init__(self, windowSeconds: float = 86400, bucketSeconds: float = 3600, capacity: int = None, clock: object = time.time):
+		self.windowSeconds = windowSeconds
+		self.bucketSeconds = bucketSeconds
+		self.capacity = capacity
+		self.clock = clock
+		self.buckets = {}
+
+	def counter(self) -> object:
+		return SpaceSaving(self.capacity) if self.capacity is not None else PhraseCounter()
+
+	def expire(self, now: float):
+		oldest = int((now - self.windowSeconds) // self.bucketSeconds)
+		for bucket in [bucket for bucket in self.buckets if bucket <= oldest]:
+			del self.buckets[bucket]
+
+	def update(self, phrase: str, count: int = 1, timestamp: float = None):
+		timestamp = self.clock() if timestamp is None else timestamp
+		bucket = int(timestamp // self.bucketSeconds)
+		if bucket not in self.buckets:
+			self.buckets[bucket] = self.counter()
+			self.expire(timestamp)
+		if bucket in self.buckets:
+			self.buckets[bucket].update(phrase, count)
+
+	def merge(self, other: object) -> object:
+		for bucket, counter in other.buckets.items():
+			if bucket in self.buckets:
+				self.buckets[bucket].merge(counter)
+			else:
+				self.buckets[bucket] = self.counter().merge(counter)
+		self.expire(self.clock())
+		return self
+
+	def window(self) -> object:
+		self.expire(self.clock())
+		payload = self.counter()
+		for counter in self.buckets.values():
+			payload.merge(counter)
+		return payload
+
+	def top(self, k: int = None) -> list:
+		return self.window().top(k)
+
+	def to_dict(self) -> dict:
+		return {"type": "windowed", "windowSeconds": self.windowSeconds, "bucketSeconds": self.bucketSeconds, "capacity": self.capacity,
+				"buckets": {str(bucket): counter.to_dict() for bucket, counter in self.buckets.items()}}
+
+	@classmethod
+	def from_dict(cls, data: dict) -> object:
+		tracker = cls(data["windowSeconds"], data["bucketSeconds"], data["capacity"])
+		tracker.buckets = {int(bucket): phrase_counter_from_dict(counter) for bucket, counter in data["buckets"].items()}
+		return tracker
+
+def phrase_counter_from_dict(data: dict) -> object:
+	return {"exact": PhraseCounter, "space_saving": SpaceSaving, "windowed": WindowedPhraseTracker}[data["type"]].from_dict(data)
+
+class TextAnalyticsAggregate(object):
+	"""
+	Streaming aggregate of text analytics results: document counts per language with the
+	statistics of their confidence, sentiment statistics and key phrase counts. Every update
+	is O(1) per document, aggregates of different shards, processes or days merge exactly,
+	and dumps/loads give a compact json form for storing or shipping partial aggregates.
+	"""
+
+	def __init__(self, phrases: object = None):
+		# pass a SpaceSaving or WindowedPhraseTracker to bound the memory of the phrase table
+		self.languages = {}
+		self.sentiment = RunningStats()
+		self.phrases = phrases if phrases is not None else PhraseCounter()
+		self.documents = 0
+
+	def update_languages(self, output: dict):
+		for document in output.get("documents", []):
+			for detectedLanguage in document["detectedLanguages"]:
+				self.languages.setdefault(detectedLanguage["name"], RunningStats()).update(detectedLanguage["score"])
+
+	def update_sentiment(self, output: dict):
+		for document in output.get("documents", []):
+			self.sentiment.update(document["score"])
+			self.documents += 1
+
+	def update_key_phrases(self, output: dict):
+		for document in output.get("documents", []):
+			for phrase in document["keyPhrases"]:
+				self.phrases.update(phrase)
+
+	def update(self, lData: dict, sData: dict, kData: dict) -> object:
+		self.update_languages(lData)
+		self.update_sentiment(sData)
+		self.update_key_phrases(kData)
+		return self
+
+	def merge(self, other: object) -> object:
+		for name, stats in other.languages.items():
+			self.languages.setdefault(name, RunningStats()).merge(stats)
+		self.sentiment.merge(other.sentiment)
+		self.phrases.merge(other.phrases)
+		self.documents += other.documents
+		return self
+
+	def summary(self, topPhrases: int = None) -> dict:
+		return {
+			"lAgg": {name: {"count": stats.count, "confidence": stats.mean} for name, stats in self.languages.items()},
+			"sAgg": dict(self.sentiment.summary(), totalScore=self.sentiment.mean),
+			"kAgg": dict(self.phrases.top(topPhrases))
+		}
+
+	def dumps(self) -> str:
+		return json.dumps({
+			"l": {name: stats.to_list() for name, stats in self.languages.items()},
+			"s": self.sentiment.to_list(),
+			"k": self.phrases.to_dict(),
+			"n": self.documents
+		}, separators=(",", ":"))
+
+	@classmethod
+	def loads(cls, data: str) -> object:
+		data = json.loads(data)
+		aggregate = cls(phrase_counter_from_dict(data["k"]))
+		aggregate.languages = {name: RunningStats.from_list(values) for name, values in data["l"].items()}
+		aggregate.sentiment = RunningStats.from_list(data["s"])
+		aggregate.documents = data["n"]
+		return aggregate
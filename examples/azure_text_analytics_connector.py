@@ -1,12 +1,105 @@
-import json, numpy, requests, sys, utils
+import concurrent.futures, json, numpy, requests, sys, threading, time
+from aggregators import PhraseCounter, RunningStats, SpaceSaving
+from requests.adapters import HTTPAdapter
+
+class RateLimiter(object):
+  """
+  Token bucket shared by every thread that calls the api.
+  Allows up to `calls` calls per `period` seconds.
+  """
+
+  def __init__(self, calls: int = 100, period: float = 60):
+    self.capacity = calls
+    self.tokens   = calls
+    self.rate     = calls / period
+    self.updated  = time.monotonic()
+    self.lock     = threading.Lock()
+
+  def acquire(self):
+    while True:
+      with self.lock:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+          self.tokens -= 1
+          return
+        wait = (1 - self.tokens) / self.rate
+      time.sleep(wait)
+
+class DocumentBatcher(object):
+  """
+  Packs texts into request bodies that respect the api limits:
+  Maximum size of a single document: 5,000 characters as measured by String.Length.
+  Maximum size of entire request: 1 MB
+  Maximum number of documents in a request: 1,000 documents
+  Request sizes are measured on the json that requests sends on the wire, so batches are
+  filled as far as the byte limit allows. Texts longer than the character limit, counted in
+  utf-16 code units like String.Length, are split into several documents. Every document gets an id that is unique across all batches, and
+  `sources` maps each id back to the index of the text it came from.
+  """
+
+  def __init__(self, maxRequestBytes: int = 1000000, maxDocuments: int = 1000, maxDocumentChars: int = 5000):
+    self.maxRequestBytes  = maxRequestBytes
+    self.maxDocuments     = maxDocuments
+    self.maxDocumentChars = maxDocumentChars
+    self.envelopeBytes    = len(json.dumps({"documents": []}).encode("utf-8"))
+    self.separatorBytes   = len(", ")
+    self.sources          = {}
+    self.nextId           = 0
+
+  def document_size(self, document: dict) -> int:
+    return len(json.dumps(document).encode("utf-8"))
+
+  def split(self, text: str) -> list:
+    # String.Length counts utf-16 code units, so characters outside the basic plane, like
+    # emoji, count twice. Python strings hold whole characters, so pairs are never cut.
+    if len(text.encode("utf-16-le")) // 2 <= self.maxDocumentChars:
+      return [text]
+    chunks, start, units = [], 0, 0
+    for position, character in enumerate(text):
+      width = 2 if ord(character) > 0xFFFF else 1
+      if units + width > self.maxDocumentChars:
+        chunks.append(text[start:position])
+        start, units = position, 0
+      units += width
+    chunks.append(text[start:])
+    return chunks
+
+  def pack(self, texts: list) -> list:
+    payload = []
+    documents, size = [], self.envelopeBytes
+    for index, text in enumerate(texts):
+      for chunk in self.split(text):
+        document = {"id": str(self.nextId), "text": chunk}
+        documentSize = self.document_size(document)
+        addedSize = documentSize + (self.separatorBytes if documents else 0)
+        if documents and (size + addedSize > self.maxRequestBytes or len(documents) == self.maxDocuments):
+          payload.append({"documents": documents})
+          documents, size = [], self.envelopeBytes
+          addedSize = documentSize
+        if self.envelopeBytes + documentSize > self.maxRequestBytes:
+          raise ValueError("document {id} does not fit in a single request".format(id=document["id"]))
+        documents.append(document)
+        size += addedSize
+        self.sources[document["id"]] = index
+        self.nextId += 1
+    if documents:
+      payload.append({"documents": documents})
+    return payload
 
 class AzureTextAnalyticsConnector(object):
 
-  def __init__(self, APP_NAME, APP_KEY1, API_ENDP):
-    self.appName  = APP_NAME
-    self.appKey   = APP_KEY1
-    self.endpoint = API_ENDP
-    self.headers  = {"Ocp-Apim-Subscription-Key": APP_KEY1}
+  def __init__(self, APP_NAME, APP_KEY1, API_ENDP, maxWorkers: int = 4, callsPerMinute: int = 100):
+    self.appName     = APP_NAME
+    self.appKey      = APP_KEY1
+    self.endpoint    = API_ENDP
+    self.headers     = {"Ocp-Apim-Subscription-Key": APP_KEY1}
+    self.maxWorkers  = maxWorkers
+    self.rateLimiter = RateLimiter(callsPerMinute, 60)
+    self.session     = requests.Session()
+    self.session.headers.update(self.headers)
+    self.session.mount("https://", HTTPAdapter(pool_connections=1, pool_maxsize=maxWorkers))
 
   def __str__(self) -> str:
     return "Azure Text Analytics Connector\n\
@@ -17,90 +110,89 @@ class AzureTextAnalyticsConnector(object):
               key = self.appKey,
               endpoint = self.endpoint)
 
-  def call_text_analytics(self, docs: dict, apiType: str) -> dict:
+  def call_text_analytics(self, docs: dict, apiType: str, retries: int = 3) -> dict:
     # apiType: "languages", "sentiment", keyPhrases"
     apiUrl = self.endpoint + apiType
-    response = requests.post(apiUrl, headers=self.headers, json=docs)
+    for attempt in range(retries + 1):
+      self.rateLimiter.acquire()
+      response = self.session.post(apiUrl, json=docs)
+      if response.status_code != 429 or attempt == retries:
+        break
+      time.sleep(float(response.headers.get("Retry-After", 2 ** attempt)))
     payload = response.json()
     return payload
 
+  def submit_batches(self, batches: list, apiType: str) -> list:
+    """
+    Submits document batches concurrently over the pooled session. Calls are throttled by
+    the shared rate limiter. Responses are returned in the order of batches.
+    """
+    with concurrent.futures.ThreadPoolExecutor(max_workers=self.maxWorkers) as executor:
+      return list(executor.map(lambda batch: self.call_text_analytics(batch, apiType), batches))
+
+  def analyze(self, texts: list, apiTypes: list = ["languages", "sentiment", "keyPhrases"]) -> (dict, dict):
+    """
+    Packs texts into batches and runs every api type on every batch at once, so a set of
+    texts costs one round of concurrent calls instead of three serial calls per batch.
+    Returns the id -> text index map of the batcher and, per api type, the documents and
+    errors of all batches merged and ordered by document id. A batch whose call fails
+    reports an error for each of its documents.
+    """
+    batcher = DocumentBatcher()
+    batches = batcher.pack(texts)
+    results = {apiType: {"documents": [], "errors": []} for apiType in apiTypes}
+    with concurrent.futures.ThreadPoolExecutor(max_workers=self.maxWorkers) as executor:
+      futureSet = {executor.submit(self.call_text_analytics, batch, apiType): (batch, apiType) for batch in batches for apiType in apiTypes}
+      for future in concurrent.futures.as_completed(futureSet):
+        batch, apiType = futureSet[future]
+        try:
+          output = future.result()
+          results[apiType]["documents"].extend(output.get("documents", []))
+          results[apiType]["errors"].extend(output.get("errors", []))
+        except Exception as e:
+          results[apiType]["errors"].extend([{"id": document["id"], "message": str(e)} for document in batch["documents"]])
+    for output in results.values():
+      output["documents"].sort(key=lambda document: int(document["id"]))
+    return batcher.sources, results
+
+  def join_results(self, results: dict) -> dict:
+    """
+    Joins the output of analyze per document id: {id: {apiType: document}}.
+    """
+    payload = {}
+    for apiType, output in results.items():
+      for document in output["documents"]:
+        payload.setdefault(document["id"], {})[apiType] = document
+    return payload
+
   def sentiment_aggregator(self, output: dict) -> float:
     return numpy.mean([score["score"] for score in output["documents"]])
 
-  def key_phrases_aggregator(self, output: dict) -> dict:
-    volumeCount = {}
-    allPhrases = [y for x in [phrase["keyPhrases"] for phrase in output["documents"]] for y in x]
-    for phrase in allPhrases:
-      if phrase in volumeCount.keys():
-        volumeCount[phrase] += 1
-      else:
-        volumeCount[phrase] = 1
-    return volumeCount
+  def key_phrases_aggregator(self, output: dict, capacity: int = None) -> dict:
+    # with a capacity, counts come from a SpaceSaving sketch holding at most that many phrases
+    volumeCount = SpaceSaving(capacity) if capacity is not None else PhraseCounter()
+    for document in output["documents"]:
+      for phrase in document["keyPhrases"]:
+        volumeCount.update(phrase)
+    return dict(volumeCount.top())
 
   def languages_aggregator(self, output: dict) -> dict:
-    payload = {}
-    for doc in output["documents"]:
-      for detectedLanguage in doc["detectedLanguages"]:
-        if not detectedLanguage["name"] in payload.keys():
-          payload[detectedLanguage["name"]] = {"count": 1, "confidence": detectedLanguage["score"]}
-        else:
-          payload[detectedLanguage["name"]]["count"] += 1
-          payload[detectedLanguage["name"]]["confidence"] = numpy.mean([payload[detectedLanguage["name"]]["confidence"], detectedLanguage["score"]])
-    return payload
+    # confidence is the true mean of every score, not a pairwise running average
+    languages = {}
+    for document in output["documents"]:
+      for detectedLanguage in document["detectedLanguages"]:
+        languages.setdefault(detectedLanguage["name"], RunningStats()).update(detectedLanguage["score"])
+    return {name: {"count": stats.count, "confidence": stats.mean} for name, stats in languages.items()}
 
   def create_document_set_large_text(self, text: str) -> list:
     """
-    Maximum size of a single document: 5,000 characters as measured by String.Length.
-    Maximum size of entire request: 1 MB
-    Maximum number of documents in a request: 1,000 documents 
-    The rate limit is 100 calls per minute. Note that you can submit a large quantity of documents in a single call (up to 1000 documents).
+    Splits a single text into 5,000 character documents packed into as few requests as the
+    api limits allow.
     """
-    payload = []
-    textBatches = [chunk for chunk in self.chunks(text, 5000)]
-    documentLimit = self.estimate_limit(textBatches[0])
-    if documentLimit > 1000:
-      documentLimit = 1000
-    if len(textBatches) > documentLimit:
-      switch = documentLimit
-    else:
-      switch = len(textBatches)
-    documentSet = {"documents": []}
-    while textBatches:
-      i = 0
-      while i < switch and textBatches:
-        textTarget = textBatches.pop(0)
-        documentSet["documents"].append(self.create_document(i, textTarget))
-        i += 1
-      payload.append(documentSet)
-    return payload
+    return DocumentBatcher().pack([text])
 
   def create_document_set_list_text(self, text: list) -> list:
-    setCount = 0
-    documentLimit = 1000
-    payload = []
-    docSet = {"documents": []}
-    sizeLimit = self.estimate_limit("")
-    currentSizeLimit = sizeLimit 
-    for doc in text:
-      docSize = utils.total_size(doc)
-      if ((docSize > sizeLimit) or (len(doc) > 5000)):
-        payload.extend(self.create_document_set_large_text(doc))
-      elif ((currentSizeLimit - docSize >= 0) and (setCount < 1000)):
-        docSet["documents"].append(self.create_document(setCount, doc))
-        currentSizeLimit -= docSize
-        setCount += 1
-      else:
-        payload.append(docSet)
-        docSet = {"documents": []}
-        currentSizeLimit = sizeLimit
-        docSet["documents"].append(self.create_document(setCount, doc))
-        currentSizeLimit -= docSize
-        setCount = 1
-    payload.append(docSet)
-    return payload
-
-  def estimate_limit(self, text: str) -> int:
-    return (1000000 - utils.total_size({"documents": []}) + utils.total_size(self.headers)) // utils.total_size(self.create_document(0, text))
+    return DocumentBatcher().pack(text)
 
   def create_document(self, id: int, text: str) -> dict:
     return {"id": str(id), "text": text}
@@ -111,4 +203,4 @@ class AzureTextAnalyticsConnector(object):
     CREDIT https://stackoverflow.com/questions/7111068/split-string-by-count-of-characters
     """
     for start in range(0, len(s), n):
-      yield s[start:start+n]
\ No newline at end of file
+      yield s[start:start+n]
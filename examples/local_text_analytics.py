@@ -0,0 +1,146 @@
+from azure_text_analytics_connector import AzureTextAnalyticsConnector
+import numpy, re, zlib
+
+POSITIVE = ("good great love loved loves like liked best better amazing awesome excellent happy glad win wins won "
+  "strong support hope success successful beautiful brilliant wonderful nice positive fantastic fair free safe "
+  "agree proud perfect thanks thank enjoy enjoyed fun peace smart kind helpful honest impressive").split()
+NEGATIVE = ("bad worse worst hate hated hates terrible awful horrible sad angry lose loses lost fail failed failure "
+  "weak wrong crisis disaster corrupt corruption fake lie lies liar attack attacks war kill killed death dead "
+  "fear afraid danger dangerous poor problem problems negative ugly stupid crime shame scandal threat violence").split()
+NEGATORS = set("not no never nobody nothing neither nor cannot can't don't doesn't didn't isn't wasn't won't aren't".split())
+STOPWORDS = set(("a an and are as at be been but by for from had has have he her his i if in into is it its me my of on "
+  "or our she so than that the their them then there these they this to too us was we were what when where which "
+  "who will with would you your just about after all also any can could do does did more most some such very via "
+  "rt amp http https not no").split())
+
+# short samples of frequent words are enough for trigram profiles to separate these languages
+PROFILES = {
+  ("English", "en"): "the and of to in is that it was for on are with as his they be at one have this from or had by "
+    "but not what all were we when your can said there use an each which she do how their if will up other about out",
+  ("Spanish", "es"): "el la de que y en los se del las un por con no una su para es al lo como mas pero sus le ya o "
+    "este si porque esta entre cuando muy sin sobre tambien me hasta hay donde quien desde todo nos durante todos",
+  ("French", "fr"): "le de un etre et a il avoir ne je son que se qui ce dans en du elle au pour pas vous par sur faire "
+    "plus dire me on mon lui nous comme mais pouvoir avec tout y aller voir bien ou sans tu leur homme si deux",
+  ("German", "de"): "der die und in den von zu das mit sich des auf fur ist im dem nicht ein eine als auch es an werden "
+    "aus er hat dass sie nach wird bei einer um am sind noch wie einem uber einen so zum war haben nur oder aber",
+  ("Italian", "it"): "il di che e la per un in non una sono mi ho lo ma ha le si ti con cosa se io come da ci questo qui "
+    "hai bene tu del me gli sei al anche era mio solo della lei molto ora fatto perche sta nel loro sua",
+  ("Portuguese", "pt"): "o de a que e do da em um para com nao uma os no se na por mais as dos como mas ao ele das seu "
+    "sua ou quando muito nos ja eu tambem so pelo pela ate isso ela entre depois sem mesmo aos seus quem"
+}
+
+class LocalTextAnalytics(AzureTextAnalyticsConnector):
+  """
+  Offline stand in for the Azure connector. call_text_analytics takes the same document
+  batches and returns the same output shapes, so analyze, mine_texts and the aggregators
+  work unchanged, but scores are computed locally with NumPy over the whole batch:
+  lexicon sentiment with negation, language identification by hashed character trigram
+  profiles, and RAKE style key phrases.
+  """
+
+  def __init__(self, lexicon: dict = None, profiles: dict = None, dimensions: int = 4096, maxPhrases: int = 10, maxWorkers: int = 4):
+    super().__init__("local", None, None, maxWorkers=maxWorkers)
+    self.dimensions = dimensions
+    self.maxPhrases = maxPhrases
+    self.lexicon    = lexicon if lexicon is not None else dict([(word, 1.0) for word in POSITIVE] + [(word, -1.0) for word in NEGATIVE])
+    self.languages  = list((profiles or PROFILES).keys())
+    # the frequent words of every profile double as stopwords for key phrase extraction
+    self.stopwords  = STOPWORDS | set(" ".join((profiles or PROFILES).values()).split())
+    profileMatrix   = self.trigram_matrix([(profiles or PROFILES)[language] for language in self.languages])
+    self.profiles   = profileMatrix / numpy.linalg.norm(profileMatrix, axis=1, keepdims=True)
+
+  def call_text_analytics(self, docs: dict, apiType: str, retries: int = 3) -> dict:
+    # apiType: "languages", "sentiment", keyPhrases"
+    documents = docs["documents"]
+    if apiType == "languages":
+      return {"documents": self.languages_documents(documents), "errors": []}
+    if apiType == "sentiment":
+      return {"documents": self.sentiment_documents(documents), "errors": []}
+    if apiType == "keyPhrases":
+      return {"documents": self.key_phrases_documents(documents), "errors": []}
+    return {"documents": [], "errors": [{"id": document["id"], "message": "unknown api type " + apiType} for document in documents]}
+
+  def tokenize(self, text: str) -> list:
+    return re.findall(r"[\w']+", text.lower())
+
+  def trigram_matrix(self, texts: list) -> numpy.ndarray:
+    rows, columns = [], []
+    for row, text in enumerate(texts):
+      padded = " " + " ".join(self.tokenize(text)) + " "
+      hashes = [zlib.crc32(padded[start:start + 3].encode("utf-8")) % self.dimensions for start in range(len(padded) - 2)]
+      rows.extend([row] * len(hashes))
+      columns.extend(hashes)
+    matrix = numpy.zeros((len(texts), self.dimensions))
+    numpy.add.at(matrix, (numpy.array(rows, dtype=int), numpy.array(columns, dtype=int)), 1)
+    return matrix
+
+  def languages_documents(self, documents: list) -> list:
+    matrix = self.trigram_matrix([document["text"] for document in documents])
+    norms = numpy.linalg.norm(matrix, axis=1, keepdims=True)
+    similarity = (matrix / numpy.where(norms == 0, 1, norms)) @ self.profiles.T
+    best = similarity.argmax(axis=1)
+    scores = similarity[numpy.arange(len(documents)), best]
+    payload = []
+    for document, index, score in zip(documents, best, scores):
+      if score == 0:
+        language = {"name": "(Unknown)", "iso6391Name": "(Unknown)", "score": 0.0}
+      else:
+        language = {"name": self.languages[index][0], "iso6391Name": self.languages[index][1], "score": round(float(score), 4)}
+      payload.append({"id": document["id"], "detectedLanguages": [language]})
+    return payload
+
+  def sentiment_documents(self, documents: list) -> list:
+    tokens, owners = [], []
+    for index, document in enumerate(documents):
+      words = self.tokenize(document["text"])
+      tokens.extend(words)
+      owners.extend([index] * len(words))
+    owners = numpy.array(owners, dtype=int)
+    values = numpy.array([self.lexicon.get(token, 0.0) for token in tokens])
+    negated = numpy.array([token in NEGATORS for token in tokens], dtype=bool)
+    # a negator flips the word that follows it within the same document
+    flip = numpy.zeros(len(tokens), dtype=bool)
+    if len(tokens) > 1:
+      flip[1:] = negated[:-1] & (owners[1:] == owners[:-1])
+    values = numpy.where(flip, -values, values)
+    totals = numpy.bincount(owners, weights=values, minlength=len(documents))
+    counts = numpy.bincount(owners, weights=(values != 0).astype(float), minlength=len(documents))
+    scores = 1 / (1 + numpy.exp(-totals / numpy.sqrt(counts + 1)))
+    return [{"id": document["id"], "score": round(float(score), 4)} for document, score in zip(documents, scores)]
+
+  def key_phrases_documents(self, documents: list) -> list:
+    # candidate phrases are runs of words between stopwords and punctuation
+    candidates = []
+    for document in documents:
+      phrases = []
+      for fragment in re.split(r"[^\w\s']+", document["text"].lower()):
+        phrase = []
+        for word in fragment.split():
+          if word in self.stopwords or word.isdigit():
+            if phrase:
+              phrases.append(tuple(phrase))
+            phrase = []
+          else:
+            phrase.append(word)
+        if phrase:
+          phrases.append(tuple(phrase))
+      candidates.append(phrases)
+    vocabulary = {}
+    wordIds, phraseLengths = [], []
+    for phrases in candidates:
+      for phrase in phrases:
+        wordIds.extend([vocabulary.setdefault(word, len(vocabulary)) for word in phrase])
+        phraseLengths.extend([len(phrase)] * len(phrase))
+    wordIds = numpy.array(wordIds, dtype=int)
+    # word score is degree / frequency over the whole batch, phrase score is the sum of its words
+    frequency = numpy.bincount(wordIds, minlength=len(vocabulary))
+    degree = numpy.bincount(wordIds, weights=numpy.array(phraseLengths, dtype=float), minlength=len(vocabulary))
+    wordScores = degree / numpy.maximum(frequency, 1)
+    payload = []
+    for document, phrases in zip(documents, candidates):
+      scored = {}
+      for phrase in phrases:
+        scored[" ".join(phrase)] = float(wordScores[[vocabulary[word] for word in phrase]].sum())
+      ranked = sorted(scored.items(), key=lambda item: (-item[1], item[0]))[:self.maxPhrases]
+      payload.append({"id": document["id"], "keyPhrases": [phrase for phrase, score in ranked]})
+    return payload
@@ -1,4 +1,6 @@
+from aggregators import TextAnalyticsAggregate
 from azure_text_analytics_connector import AzureTextAnalyticsConnector
+from local_text_analytics import LocalTextAnalytics
 import json, numpy, requests, xlwt, sys, os
 sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
 from open_social.open_social import OpenSocial
@@ -26,42 +28,37 @@ def extract_text_reddit(entry: dict) -> list:
 	return title
 
 def mine_text(atacInstance: object, data: list) -> tuple:
-	docSet = atacInstance.create_document_set_list_text(data)
-	lData = atac.call_text_analytics(docSet[0], "languages")
-	sData = atac.call_text_analytics(docSet[0], "sentiment")
-	kData = atac.call_text_analytics(docSet[0], "keyPhrases")
-	return lData, sData, kData
+	return mine_texts(atacInstance, [data])[0]
 
-def generate_text_analytics_aggregates(atacInstance: object, data: list) -> list:
-	payloadTmp, payloadFinal = [], {"lAgg": {}, "sAgg": {"totalScore": 0, "rawScores": []}, "kAgg": {}}
-	for entry in data:
-		lAgg = atacInstance.languages_aggregator(entry[0])
-		sAgg = atacInstance.sentiment_aggregator(entry[1])
-		kAgg = atacInstance.key_phrases_aggregator(entry[2])
-		payloadTmp.append({"lAgg": lAgg, "sAgg": sAgg, "kAgg": kAgg})
-	for entry in payloadTmp:
-		for k in list(entry["lAgg"].keys()):
-			if k in payloadFinal["lAgg"].keys():
-				payloadFinal["lAgg"][k] = {"count": payloadFinal["lAgg"][k]["count"] + entry["lAgg"][k]["count"], 
-										   "confidence": numpy.mean([payloadFinal["lAgg"][k]["confidence"], entry["lAgg"][k]["confidence"]])}
-			else:
-				payloadFinal["lAgg"][k] = {"count": entry["lAgg"][k]["count"],
-										   "confidence": entry["lAgg"][k]["confidence"]}
-		payloadFinal["sAgg"]["totalScore"] = numpy.mean([payloadFinal["sAgg"]["totalScore"], entry["sAgg"]])
-		payloadFinal["sAgg"]["rawScores"].append(entry["sAgg"])
-		for k in list(entry["kAgg"].keys()):
-			if k in payloadFinal["kAgg"].keys():
-				payloadFinal["kAgg"][k] += entry["kAgg"][k]
-			else:
-				payloadFinal["kAgg"][k] = entry["kAgg"][k]
-	return payloadFinal
+def mine_texts(atacInstance: object, data: list) -> list:
+	# analyze the texts of every entry together so batches are full and every operation runs
+	# on every batch concurrently, then split the documents back out per entry
+	texts, owners = [], []
+	for index, entry in enumerate(data):
+		entry = [entry] if isinstance(entry, str) else entry
+		texts.extend(entry)
+		owners.extend([index] * len(entry))
+	sources, results = atacInstance.analyze(texts, ["languages", "sentiment", "keyPhrases"])
+	payload = [tuple({"documents": [], "errors": []} for apiType in results) for entry in data]
+	for position, apiType in enumerate(results):
+		for key in ["documents", "errors"]:
+			for document in results[apiType][key]:
+				payload[owners[sources[document["id"]]]][position][key].append(document)
+	return payload
+
+def generate_text_analytics_aggregates(atacInstance: object, data: list, aggregate: TextAnalyticsAggregate = None) -> dict:
+	aggregate = aggregate if aggregate is not None else TextAnalyticsAggregate()
+	for lData, sData, kData in data:
+		aggregate.update(lData, sData, kData)
+	return aggregate.summary()
 
 if __name__ == '__main__':
 	APP_NAME = "<azure text analytics app name>"
 	APP_KEY1 = "<azure text analytics app key>"
 	API_ENDP = "https://<region app is provisioned in>.api.cognitive.microsoft.com/text/analytics/v2.0/"
 	# create clients
-	atac = AzureTextAnalyticsConnector(APP_NAME, APP_KEY1, API_ENDP)
+	# pass --local to score offline with NumPy instead of calling azure
+	atac = LocalTextAnalytics() if "--local" in sys.argv else AzureTextAnalyticsConnector(APP_NAME, APP_KEY1, API_ENDP)
 	opso = OpenSocial()
 	# get data
 	instagram = opso.get_data(opso.clients[4], "trump", 10, relevantUsers = ["cnn"])
@@ -74,10 +71,10 @@ if __name__ == '__main__':
 	twData = list(map(extract_text_twitter, twitter["twitter"]))
 	reData = list(map(extract_text_reddit, reddit["reddit"]))
 	# generate text analytics data
-	igTextMine = [mine_text(atac, x) for x in igData]
-	tuTextMine = [mine_text(atac, x) for x in tuData]
-	twTextMine = [mine_text(atac, x) for x in twData] 
-	reTextMine = [mine_text(atac, x) for x in reData]
+	igTextMine = mine_texts(atac, igData)
+	tuTextMine = mine_texts(atac, tuData)
+	twTextMine = mine_texts(atac, twData)
+	reTextMine = mine_texts(atac, reData)
 	# generate aggregate data for each source
 	igAggregates = generate_text_analytics_aggregates(atac, igTextMine)
 	tuAggregates = generate_text_analytics_aggregates(atac, tuTextMine)
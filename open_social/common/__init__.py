@@ -1,3 +1,4 @@
 from .abstract_social_client import AbstractSocialClient 
+from .crawl_planner import CrawlPlanner, SourceState
 from .social_error import SocialError 
 from .utils import *
\ No newline at end of file
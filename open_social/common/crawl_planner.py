@@ -0,0 +1,263 @@
+from .social_error import SocialError
+from collections import deque
+import sys
+
+class SourceState(object):
+
+	"""
+	Summary:
+		Tracks the crawl progress of a single source (page, blog, user) so that a crawl can be
+		suspended when a source reaches its quota and resumed if more quota is assigned later.
+	"""
+
+	def __init__(self, source: str, quota: int = 0):
+		"""
+		Summary:
+			Initializes an instance of SourceState
+
+		Args:
+			source: the name of the source being crawled
+			quota: (optional) the number of matched data points assigned to the source
+
+		Returns:
+			An instance of the SourceState class
+		"""
+		self.source = source
+		self.quota = quota
+		self.collected = 0
+		self.pages = 0
+		self.requests = 0
+		self.scanned = 0
+		self.matched = 0
+		self.dataPage = deque()
+		self.nextPageLink = None
+		self.started = False
+		self.lastPage = False
+		self.exhausted = False
+
+	def match_rate(self) -> float:
+		"""
+		Summary:
+			Smoothed ratio of matched to scanned data points. Sources that have not been
+			scanned yet get an optimistic rate of 0.5 so they are still given a chance.
+
+		Args:
+			None
+
+		Returns:
+			A float between 0 and 1
+		"""
+		return (self.matched + 1) / (self.scanned + 2)
+
+	def to_dict(self) -> dict:
+		"""
+		Summary:
+			Summarizes the state of the source for reporting
+
+		Args:
+			None
+
+		Returns:
+			A dictionary of crawl statistics for the source
+		"""
+		return {
+			"source": self.source,
+			"quota": self.quota,
+			"collected": self.collected,
+			"pages": self.pages,
+			"requests": self.requests,
+			"scanned": self.scanned,
+			"matched": self.matched,
+			"exhausted": self.exhausted
+		}
+
+class CrawlPlanner(object):
+
+	"""
+	Summary:
+		Plans a budgeted crawl over a list of sources. The global result budget (limit) is
+		split across sources, every source is bounded by a maximum number of page fetches and
+		requests, and quota left unused by quiet sources is reassigned to sources that are
+		still open, weighted by how often their data points match the search term.
+	"""
+
+	def __init__(self, sources: list, limit: int, maxPages: int = None, maxRequests: int = None):
+		"""
+		Summary:
+			Initializes an instance of CrawlPlanner and assigns the initial quotas
+
+		Args:
+			sources: a list of sources to crawl
+			limit: the global upper limit for the count of data points returned by the crawl
+			maxPages: (optional) the maximum number of pages fetched per source. None means
+					  pages are fetched until the source runs out of data.
+			maxRequests: (optional) the maximum number of requests (page fetches and parse calls
+						 that gather secondary information) issued per source. None means no limit.
+
+		Returns:
+			An instance of the CrawlPlanner class
+		"""
+		self.limit = limit
+		self.maxPages = maxPages
+		self.maxRequests = maxRequests
+		self.states = [SourceState(source) for source in sources]
+		self.errors = SocialError()
+		self.allocate(limit, self.states, [1 for state in self.states])
+
+	def allocate(self, budget: int, states: list, weights: list):
+		"""
+		Summary:
+			Adds budget to the quotas of states in proportion to weights. Uses the largest
+			remainder method so the full budget is handed out even when there are more
+			states than budget.
+
+		Args:
+			budget: the number of data points to hand out
+			states: a list of SourceState instances
+			weights: a list of non negative weights, one per state
+
+		Returns:
+			None
+		"""
+		totalWeight = sum(weights)
+		if budget <= 0 or not states or totalWeight <= 0:
+			return
+		shares = [budget * weight / totalWeight for weight in weights]
+		floors = [int(share) for share in shares]
+		leftover = budget - sum(floors)
+		order = sorted(range(len(states)), key=lambda i: shares[i] - floors[i], reverse=True)
+		for i in order[:leftover]:
+			floors[i] += 1
+		for state, share in zip(states, floors):
+			state.quota += share
+
+	def remaining(self) -> int:
+		"""
+		Summary:
+			The part of the global budget that has not been collected yet
+
+		Args:
+			None
+
+		Returns:
+			The count of data points still to be collected
+		"""
+		return self.limit - sum(state.collected for state in self.states)
+
+	def can_fetch(self, state: SourceState) -> bool:
+		"""
+		Summary:
+			Checks whether another page may be fetched for a source
+
+		Args:
+			state: the SourceState of the source
+
+		Returns:
+			True if the source has more pages and has not hit its page or request bounds
+		"""
+		if state.exhausted or state.lastPage:
+			return False
+		if self.maxPages is not None and state.pages >= self.maxPages:
+			return False
+		return self.can_request(state)
+
+	def can_request(self, state: SourceState) -> bool:
+		"""
+		Summary:
+			Checks whether another request may be issued for a source
+
+		Args:
+			state: the SourceState of the source
+
+		Returns:
+			True if the source has not hit its request bound
+		"""
+		return self.maxRequests is None or state.requests < self.maxRequests
+
+	def record_page(self, state: SourceState, dataPage: list, nextPageLink: list):
+		"""
+		Summary:
+			Updates a source's state after a page has been fetched. A page without data or
+			without a link to the next page marks the end of the source.
+
+		Args:
+			state: the SourceState of the source
+			dataPage: the list of data points on the fetched page
+			nextPageLink: the link to the next page of data
+
+		Returns:
+			None
+		"""
+		state.started = True
+		state.pages += 1
+		state.requests += 1
+		state.dataPage.extend(dataPage or [])
+		state.nextPageLink = nextPageLink
+		if not dataPage or not nextPageLink or None in nextPageLink:
+			state.lastPage = True
+
+	def record_error(self):
+		"""
+		Summary:
+			Adds the exception currently being handled to the planner's errors
+
+		Args:
+			None
+
+		Returns:
+			None
+		"""
+		etype, value, tb = sys.exc_info()
+		self.errors.add_error(etype, value, tb)
+
+	def active_sources(self) -> list:
+		"""
+		Summary:
+			Lists the sources that still have quota left to fill
+
+		Args:
+			None
+
+		Returns:
+			A list of SourceState instances
+		"""
+		return [state for state in self.states if not state.exhausted and state.collected < state.quota]
+
+	def reallocate(self) -> list:
+		"""
+		Summary:
+			Reassigns budget that was left unused by exhausted sources to sources that can
+			still produce data, weighted by their match rates.
+
+		Args:
+			None
+
+		Returns:
+			A list of SourceState instances that were given more quota
+		"""
+		budget = self.remaining()
+		openStates = [state for state in self.states if not state.exhausted and (state.dataPage or self.can_fetch(state))]
+		if budget <= 0 or not openStates:
+			return []
+		for state in openStates:
+			state.quota = state.collected
+		self.allocate(budget, openStates, [state.match_rate() for state in openStates])
+		return self.active_sources()
+
+	def report(self) -> dict:
+		"""
+		Summary:
+			Summarizes the crawl
+
+		Args:
+			None
+
+		Returns:
+			A dictionary with the budget, the remaining budget, and statistics for each source
+		"""
+		return {
+			"limit": self.limit,
+			"remaining": self.remaining(),
+			"sources": [state.to_dict() for state in self.states],
+			"errors": self.errors.errorInfo
+		}
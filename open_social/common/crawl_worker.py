@@ -0,0 +1,253 @@
+from .process_pool import crawl_options
+from .social_error import SocialError
+import json, os, socket, sys, threading, time, uuid
+
+class CrawlCoordinator(object):
+
+	"""
+	Summary:
+		Splits search jobs (terms x platforms x sources) into source level tasks and puts them
+		on a job queue, where they are picked up by CrawlWorker instances running in other
+		threads, processes or machines.
+	"""
+
+	def __init__(self, queue: object):
+		"""
+		Summary:
+			Initializes an instance of CrawlCoordinator
+
+		Args:
+			queue: an instance of SQLiteJobQueue, LocalJobQueue or another AbstractJobQueue
+
+		Returns:
+			An instance of the CrawlCoordinator class
+		"""
+		self.queue = queue
+
+	def submit_job(self, terms: list, sources: dict, limit: int, perSourceLimit: int = None, options: dict = None) -> str:
+		"""
+		Summary:
+			Creates one task for every search term and source. The limit of each platform is
+			split evenly across its sources unless perSourceLimit is given.
+
+		Args:
+			terms: a list of search terms
+			sources: a dictionary of platform -> list of sources, for example
+					 {"facebook": ["cnn"], "reddit": ["news", "politics"], "twitter": []}.
+					 Platforms without sources (twitter) get one task per term.
+			limit: the upper limit for the number of datapoints per term and platform
+			perSourceLimit: (optional) the upper limit for the number of datapoints per task
+			options: (optional) crawl options passed to every task, like maxPages and maxRequests
+
+		Returns:
+			The id of the job
+		"""
+		jobId = uuid.uuid4().hex
+		tasks = []
+		for term in terms:
+			for platform, platformSources in sources.items():
+				platformSources = platformSources or [None]
+				taskLimit = perSourceLimit or max(1, limit // len(platformSources))
+				for source in platformSources:
+					tasks.append({
+						"job_id": jobId,
+						"platform": platform,
+						"source": source,
+						"term": term,
+						"limit": taskLimit,
+						"options": options or {}})
+		self.queue.put(tasks)
+		return jobId
+
+	def status(self, jobId: str) -> dict:
+		"""
+		Summary:
+			Counts the tasks of a job by status
+
+		Args:
+			jobId: the id returned by submit_job
+
+		Returns:
+			A dictionary of status -> count
+		"""
+		return self.queue.counts(jobId)
+
+	def wait(self, jobId: str, pollInterval: float = 1.0, timeout: float = None) -> bool:
+		"""
+		Summary:
+			Blocks until every task of a job is done or failed
+
+		Args:
+			jobId: the id returned by submit_job
+			pollInterval: (optional) seconds between status checks
+			timeout: (optional) the maximum number of seconds to wait
+
+		Returns:
+			True if the job finished, False if the timeout was reached first
+		"""
+		start = time.time()
+		while True:
+			counts = self.status(jobId)
+			if counts["pending"] == 0 and counts["leased"] == 0:
+				return True
+			if timeout is not None and time.time() - start > timeout:
+				return False
+			time.sleep(pollInterval)
+
+class CrawlWorker(object):
+
+	"""
+	Summary:
+		Leases crawl tasks from a job queue, runs them with local clients, and writes the
+		results to a shared sink. While a task runs, a background thread renews the lease so
+		that the task is only reclaimed if the worker dies or hangs.
+
+		Delivery is at least once: results are written before the task is marked done, so a
+		worker that loses its lease between the two writes results that the worker taking
+		over the task writes again. Consumers should dedupe records by platform and id, as
+		ResultStore.ingest does.
+	"""
+
+	def __init__(self, clients: list, queue: object, sink: object, workerId: str = None, leaseSeconds: float = 300, heartbeatInterval: float = None):
+		"""
+		Summary:
+			Initializes an instance of CrawlWorker
+
+		Args:
+			clients: a list of client instances, for example OpenSocial().clients. Each worker
+					 can use its own credentials.
+			queue: an instance of SQLiteJobQueue, LocalJobQueue or another AbstractJobQueue
+			sink: an instance of JsonLinesSink, MemorySink or another AbstractSink
+			workerId: (optional) a unique name for the worker. Defaults to host, pid and a
+					  random suffix.
+			leaseSeconds: (optional) how long a task may run without a heartbeat before it is
+						  reclaimed
+			heartbeatInterval: (optional) seconds between heartbeats. Defaults to a third of
+							   leaseSeconds.
+
+		Returns:
+			An instance of the CrawlWorker class
+		"""
+		self.clients = {client.platform: client for client in clients if client is not None}
+		self.queue = queue
+		self.sink = sink
+		self.workerId = workerId or "{host}-{pid}-{suffix}".format(
+			host=socket.gethostname(),
+			pid=os.getpid(),
+			suffix=uuid.uuid4().hex[:8])
+		self.leaseSeconds = leaseSeconds
+		self.heartbeatInterval = heartbeatInterval or leaseSeconds / 3
+
+	def run(self, maxTasks: int = None, stopEvent: threading.Event = None, idleTimeout: float = 0, pollInterval: float = 1.0) -> int:
+		"""
+		Summary:
+			Leases and runs tasks until the queue is empty, maxTasks tasks have run, or
+			stopEvent is set.
+
+		Args:
+			maxTasks: (optional) the maximum number of tasks to run
+			stopEvent: (optional) an event that stops the worker between tasks
+			idleTimeout: (optional) seconds to keep polling an empty queue before returning
+			pollInterval: (optional) seconds between polls of an empty queue
+
+		Returns:
+			The number of tasks run
+		"""
+		taskCount, idleSince = 0, None
+		while maxTasks is None or taskCount < maxTasks:
+			if stopEvent is not None and stopEvent.is_set():
+				break
+			task = self.queue.lease(self.workerId, self.leaseSeconds)
+			if task is None:
+				idleSince = idleSince or time.time()
+				if time.time() - idleSince >= idleTimeout:
+					break
+				time.sleep(pollInterval)
+				continue
+			idleSince = None
+			self.run_task(task)
+			taskCount += 1
+		return taskCount
+
+	def run_task(self, task: dict) -> bool:
+		"""
+		Summary:
+			Runs a single leased task while renewing its lease in the background, then writes
+			the results to the sink and marks the task done. Clients report errors as list
+			entries in their results instead of raising, so results holding an error entry fail
+			the task like an exception does and are not written. Results are dropped if the
+			lease was lost while the task ran, since another worker owns the task by then.
+
+		Args:
+			task: a task returned by the queue's lease function
+
+		Returns:
+			True if the task was completed by this worker, else False
+		"""
+		stopHeartbeat = threading.Event()
+		leaseLost = threading.Event()
+
+		def heartbeat():
+			while not stopHeartbeat.wait(self.heartbeatInterval):
+				if not self.queue.heartbeat(task["id"], self.workerId, self.leaseSeconds):
+					leaseLost.set()
+					return
+
+		heartbeatThread = threading.Thread(target=heartbeat, daemon=True)
+		heartbeatThread.start()
+		records, error = None, SocialError()
+		try:
+			records = self.search(task)
+		except:
+			etype, value, tb = sys.exc_info()
+			error.add_error(etype, value, tb)
+		finally:
+			stopHeartbeat.set()
+			heartbeatThread.join()
+		errorEntries = [entry for entry in records if isinstance(entry, list)] if records is not None else []
+		if records is None or errorEntries:
+			self.queue.fail(task["id"], self.workerId, json.dumps(errorEntries, default=str) if errorEntries else str(error))
+			return False
+		if leaseLost.is_set() or not self.queue.heartbeat(task["id"], self.workerId, self.leaseSeconds):
+			return False
+		self.sink.write(task, records)
+		return self.queue.complete(task["id"], self.workerId, len(records))
+
+	def search(self, task: dict) -> list:
+		"""
+		Summary:
+			Runs the search described by a task with the worker's client for its platform
+
+		Args:
+			task: a task returned by the queue's lease function
+
+		Returns:
+			A list of parsed data points
+		"""
+		client = self.clients[task["platform"]]
+		if client.sourceKey is None:
+			return client.search(task["term"], task["limit"])
+		return client.search(task["term"], [task["source"]], task["limit"], **crawl_options(client, task["options"]))
+
+def run_worker(queuePath: str, sinkPath: str, clients: list = None, **kwargs) -> int:
+	"""
+	Summary:
+		Runs a CrawlWorker on a SQLite job queue and a json lines sink. Suitable as the target
+		of a multiprocessing.Process or as the entry point of a worker node.
+
+	Args:
+		queuePath: the path of the SQLite job queue database
+		sinkPath: the path of the json lines file results are appended to
+		clients: (optional) the names of the platforms this worker serves. Defaults to every
+				 platform in the node's credentials file.
+		kwargs: (optional) key word arguments passed to CrawlWorker.run
+
+	Returns:
+		The number of tasks run
+	"""
+	from ..open_social import OpenSocial
+	from .job_queue import SQLiteJobQueue
+	from .sinks import JsonLinesSink
+	opso = OpenSocial(clients) if clients else OpenSocial()
+	worker = CrawlWorker(opso.clients, SQLiteJobQueue(queuePath), JsonLinesSink(sinkPath))
+	return worker.run(**kwargs)
@@ -0,0 +1,309 @@
+from requests.adapters import HTTPAdapter
+import contextlib, threading, time
+
+class DeadlineExceeded(Exception):
+
+	"""
+	Summary:
+		Raised when work is started after its deadline passed or was cancelled
+	"""
+
+class Deadline(object):
+
+	"""
+	Summary:
+		A point in wall clock time by which a search must return, shared by every thread and
+		process working on it. The deadline is made active in the thread doing the work, so
+		request timeouts, pagination loops and enrichment calls can look it up with
+		current_deadline() instead of receiving it through every signature. Cancelling a
+		deadline expires it at once. Platforms whose crawl was cut short are recorded so the
+		caller can flag their results as partial.
+	"""
+
+	def __init__(self, seconds: float = None, at: float = None):
+		"""
+		Summary:
+			Initializes an instance of Deadline
+
+		Args:
+			seconds: (optional) the number of seconds from now until the deadline
+			at: (optional) the deadline in seconds since the epoch. Used instead of seconds.
+
+		Returns:
+			An instance of the Deadline class
+		"""
+		self.at = at if at is not None else time.time() + seconds
+		self.cancelEvent = threading.Event()
+		self.lock = threading.Lock()
+		self.partial = set()
+
+	def __reduce__(self):
+		"""
+		Summary:
+			Tells pickle to rebuild the deadline from its time, so it can be sent to worker
+			processes
+
+		Args:
+			None
+
+		Returns:
+			A tuple of the class and its arguments
+		"""
+		return (Deadline, (None, self.at))
+
+	def remaining(self) -> float:
+		"""
+		Summary:
+			The number of seconds left until the deadline
+
+		Args:
+			None
+
+		Returns:
+			The number of seconds left, or 0 if the deadline passed or was cancelled
+		"""
+		if self.cancelEvent.is_set():
+			return 0.0
+		return max(self.at - time.time(), 0.0)
+
+	def expired(self) -> bool:
+		"""
+		Summary:
+			Checks whether the deadline passed or was cancelled
+
+		Args:
+			None
+
+		Returns:
+			True if no more work should be started
+		"""
+		return self.remaining() <= 0
+
+	def cancel(self):
+		"""
+		Summary:
+			Expires the deadline immediately, so work still running stops at its next check
+
+		Args:
+			None
+
+		Returns:
+			None
+		"""
+		self.cancelEvent.set()
+
+	def check(self):
+		"""
+		Summary:
+			Raises DeadlineExceeded if the deadline passed or was cancelled
+
+		Args:
+			None
+
+		Returns:
+			None
+		"""
+		if self.expired():
+			raise DeadlineExceeded("the deadline passed before the work was started")
+
+	def timeout(self, default: float = None) -> float:
+		"""
+		Summary:
+			The timeout to use for a blocking call, so the call can not outlive the deadline
+
+		Args:
+			default: (optional) the timeout the call would use without a deadline
+
+		Returns:
+			The smaller of default and the number of seconds left
+		"""
+		self.check()
+		remaining = self.remaining()
+		return remaining if default is None else min(default, remaining)
+
+	def mark_partial(self, platform: str):
+		"""
+		Summary:
+			Records that the crawl of a platform stopped because of the deadline
+
+		Args:
+			platform: the name of the platform
+
+		Returns:
+			None
+		"""
+		with self.lock:
+			self.partial.add(platform)
+
+	def is_partial(self, platform: str) -> bool:
+		"""
+		Summary:
+			Checks whether the crawl of a platform stopped because of the deadline
+
+		Args:
+			platform: the name of the platform
+
+		Returns:
+			True if the platform's results are partial
+		"""
+		with self.lock:
+			return platform in self.partial
+
+	@contextlib.contextmanager
+	def activate(self):
+		"""
+		Summary:
+			Makes this deadline the active deadline of the current thread for the duration of
+			a with block
+
+		Args:
+			None
+
+		Returns:
+			A context manager
+		"""
+		previous = getattr(local, "deadline", None)
+		local.deadline = self
+		try:
+			yield self
+		finally:
+			local.deadline = previous
+
+local = threading.local()
+
+def as_deadline(deadline: object) -> Deadline:
+	"""
+	Summary:
+		Normalizes the deadline argument accepted by OpenSocial
+
+	Args:
+		deadline: None, a number of seconds from now, or an instance of Deadline
+
+	Returns:
+		An instance of Deadline, or None
+	"""
+	if deadline is None or isinstance(deadline, Deadline):
+		return deadline
+	return Deadline(seconds=deadline)
+
+def current_deadline() -> Deadline:
+	"""
+	Summary:
+		The deadline activated in the current thread
+
+	Args:
+		None
+
+	Returns:
+		An instance of Deadline, or None if no deadline is active
+	"""
+	return getattr(local, "deadline", None)
+
+@contextlib.contextmanager
+def activated(deadline: Deadline):
+	"""
+	Summary:
+		Activates a deadline for the duration of a with block, or does nothing if there is
+		none. Used to carry the deadline of a caller into worker threads and processes.
+
+	Args:
+		deadline: an instance of Deadline or None
+
+	Returns:
+		A context manager
+	"""
+	if deadline is None:
+		yield None
+		return
+	with deadline.activate():
+		yield deadline
+
+def expired(platform: str = None) -> bool:
+	"""
+	Summary:
+		Checks whether the active deadline passed. Loops call this before fetching another
+		page or enriching another data point, and stop with what they gathered if it did.
+
+	Args:
+		platform: (optional) the platform to mark as partial if the deadline passed
+
+	Returns:
+		True if the loop should stop
+	"""
+	deadline = current_deadline()
+	if deadline is None or not deadline.expired():
+		return False
+	if platform is not None:
+		deadline.mark_partial(platform)
+	return True
+
+def request_timeout(default: float = None) -> float:
+	"""
+	Summary:
+		The timeout for an http request made in the current thread
+
+	Args:
+		default: (optional) the timeout to use without an active deadline
+
+	Returns:
+		The smaller of default and the time left on the active deadline
+	"""
+	deadline = current_deadline()
+	return default if deadline is None else deadline.timeout(default)
+
+class DeadlineAdapter(HTTPAdapter):
+
+	"""
+	Summary:
+		requests adapter that caps the timeout of every request by the deadline active in the
+		sending thread. Mounting it on the session of an api wrapper bounds requests the
+		wrapper makes without a timeout of its own.
+	"""
+
+	def send(self, request: object, timeout: object = None, **kwargs) -> object:
+		if current_deadline() is not None and not isinstance(timeout, tuple):
+			timeout = request_timeout(timeout)
+		return super().send(request, timeout=timeout, **kwargs)
+
+def bound_session(session: object) -> object:
+	"""
+	Summary:
+		Mounts a DeadlineAdapter on a requests.Session
+
+	Args:
+		session: an instance of requests.Session
+
+	Returns:
+		The session
+	"""
+	adapter = DeadlineAdapter()
+	session.mount("https://", adapter)
+	session.mount("http://", adapter)
+	return session
+
+def partial_flag() -> list:
+	"""
+	Summary:
+		The entry appended to the results of a platform whose crawl stopped at the deadline,
+		in the same shape as the error entry appended by search functions
+
+	Args:
+		None
+
+	Returns:
+		A list holding the flag
+	"""
+	return [{"partial": "deadline exceeded"}]
+
+def is_partial(records: list) -> bool:
+	"""
+	Summary:
+		Checks whether a platform's results were flagged as partial
+
+	Args:
+		records: the list of results of a platform
+
+	Returns:
+		True if the results are partial
+	"""
+	return any(isinstance(entry, list) and entry and isinstance(entry[0], dict) and "partial" in entry[0] for entry in records)
@@ -0,0 +1,57 @@
+import threading
+
+try:
+	import fcntl
+except ImportError:
+	fcntl = None
+	import msvcrt
+
+class FileLock(object):
+
+	"""
+	Summary:
+		An exclusive lock on a file that is shared by threads and processes. Used as a context
+		manager around reads and writes of the instagram settings cache so that concurrent
+		worker startups wait for one login instead of racing to create their own.
+	"""
+
+	def __init__(self, path: str):
+		"""
+		Summary:
+			Initializes an instance of FileLock
+
+		Args:
+			path: the path of the lock file. It is created if it does not exist.
+
+		Returns:
+			An instance of the FileLock class
+		"""
+		self.path = path
+		self.threadLock = threading.RLock()
+		self.depth = 0
+		self.file = None
+
+	def __enter__(self):
+		self.threadLock.acquire()
+		if self.depth == 0:
+			self.file = open(self.path, "a+")
+			if fcntl is not None:
+				fcntl.flock(self.file.fileno(), fcntl.LOCK_EX)
+			else:
+				self.file.seek(0)
+				msvcrt.locking(self.file.fileno(), msvcrt.LK_LOCK, 1)
+		self.depth += 1
+		return self
+
+	def __exit__(self, etype, value, tb):
+		self.depth -= 1
+		if self.depth == 0:
+			if fcntl is not None:
+				fcntl.flock(self.file.fileno(), fcntl.LOCK_UN)
+			else:
+				self.file.seek(0)
+				msvcrt.locking(self.file.fileno(), msvcrt.LK_UNLCK, 1)
+			self.file.close()
+			self.file = None
+		self.threadLock.release()
+		return False
@@ -0,0 +1,258 @@
+from .deadline import activated, current_deadline
+from collections import deque
+import concurrent.futures, math, threading, time
+
+class LatencyTracker(object):
+
+	"""
+	Summary:
+		Keeps a sliding window of recent request latencies per key, like facebook:page or
+		instagram:comments, and reports a percentile of each window
+	"""
+
+	def __init__(self, window: int = 200, minSamples: int = 20):
+		"""
+		Summary:
+			Initializes an instance of LatencyTracker
+
+		Args:
+			window: (optional) the number of most recent latencies kept per key
+			minSamples: (optional) the number of latencies a key needs before percentiles are
+						reported for it
+
+		Returns:
+			An instance of the LatencyTracker class
+		"""
+		self.window = window
+		self.minSamples = minSamples
+		self.lock = threading.Lock()
+		self.samples = {}
+
+	def record(self, key: str, seconds: float):
+		"""
+		Summary:
+			Adds a latency to the window of a key
+
+		Args:
+			key: the platform and operation the request belongs to
+			seconds: the latency of the request
+
+		Returns:
+			None
+		"""
+		with self.lock:
+			samples = self.samples.get(key)
+			if samples is None:
+				samples = self.samples[key] = deque(maxlen=self.window)
+			samples.append(seconds)
+
+	def percentile(self, key: str, percentile: float) -> float:
+		"""
+		Summary:
+			Reports a percentile of the latencies of a key
+
+		Args:
+			key: the platform and operation the requests belong to
+			percentile: a number between 0 and 100
+
+		Returns:
+			The latency in seconds, or None if the key has fewer than minSamples latencies
+		"""
+		with self.lock:
+			samples = sorted(self.samples.get(key, []))
+		if len(samples) < self.minSamples:
+			return None
+		return samples[min(int(math.ceil(percentile / 100.0 * len(samples))) - 1, len(samples) - 1)]
+
+class Hedger(object):
+
+	"""
+	Summary:
+		Sends a duplicate of a slow idempotent request. Once a key has enough latencies the
+		request runs on the hedger's executor, and if it has not answered after the observed pN
+		latency of its platform and operation a copy is sent too. The first of the two to
+		answer is used, and the other one only if the first fails, for example on the request
+		timeout of the active deadline. At most
+		maxHedgeRate of the requests of a key are duplicated, so hedging adds a bounded share of
+		api quota. Only use it for GET requests that can safely be repeated, on api objects
+		that can be shared between threads.
+	"""
+
+	def __init__(self, percentile: float = 95, maxHedgeRate: float = 0.05, minDelay: float = 0.05, window: int = 200, minSamples: int = 20,
+			maxWorkers: int = 16):
+		"""
+		Summary:
+			Initializes an instance of Hedger
+
+		Args:
+			percentile: (optional) the latency percentile after which a request is duplicated
+			maxHedgeRate: (optional) the largest share of requests per key that are duplicated
+			minDelay: (optional) the shortest number of seconds waited before duplicating
+			window: (optional) the number of recent latencies kept per key
+			minSamples: (optional) the number of latencies needed before requests of a key are
+						hedged
+			maxWorkers: (optional) the number of threads running requests
+
+		Returns:
+			An instance of the Hedger class
+		"""
+		self.percentile = percentile
+		self.maxHedgeRate = maxHedgeRate
+		self.minDelay = minDelay
+		self.tracker = LatencyTracker(window, minSamples)
+		self.executor = concurrent.futures.ThreadPoolExecutor(max_workers=maxWorkers)
+		self.lock = threading.Lock()
+		self.counts = {}
+
+	def count(self, key: str, name: str):
+		"""
+		Summary:
+			Increments a counter of a key
+
+		Args:
+			key: the platform and operation of the request
+			name: requests, hedges or hedgeWins
+
+		Returns:
+			None
+		"""
+		with self.lock:
+			counts = self.counts.setdefault(key, {"requests": 0, "hedges": 0, "hedgeWins": 0})
+			counts[name] += 1
+
+	def may_hedge(self, key: str) -> bool:
+		"""
+		Summary:
+			Checks whether another duplicate stays within maxHedgeRate, and counts it if so
+
+		Args:
+			key: the platform and operation of the request
+
+		Returns:
+			True if the request may be duplicated
+		"""
+		with self.lock:
+			counts = self.counts[key]
+			if counts["hedges"] + 1 > self.maxHedgeRate * counts["requests"]:
+				return False
+			counts["hedges"] += 1
+			return True
+
+	def submit(self, key: str, function: object, args: tuple, kwargs: dict, deadline: object) -> concurrent.futures.Future:
+		"""
+		Summary:
+			Runs a copy of a request on the executor. The deadline of the caller is activated
+			in the worker and the latency of the copy is recorded when it finishes.
+
+		Args:
+			key: the platform and operation of the request
+			function: the function making the request
+			args: the positional arguments of function
+			kwargs: the keyword arguments of function
+			deadline: the deadline of the calling thread, or None
+
+		Returns:
+			An instance of concurrent.futures.Future
+		"""
+		def run() -> object:
+			started = time.monotonic()
+			with activated(deadline):
+				payload = function(*args, **kwargs)
+			self.tracker.record(key, time.monotonic() - started)
+			return payload
+
+		return self.executor.submit(run)
+
+	def call(self, key: str, function: object, *args, **kwargs) -> object:
+		"""
+		Summary:
+			Makes a request, duplicating it if it is slower than the pN latency of its key. Until
+			the key has minSamples latencies the request runs on the calling thread.
+
+		Args:
+			key: the platform and operation of the request, like facebook:page
+			function: the function making the request
+			args: the positional arguments of function
+			kwargs: the keyword arguments of function
+
+		Returns:
+			The response that came first. If it failed the response of the other copy is
+			returned, and if both failed the error of the request is raised.
+		"""
+		self.count(key, "requests")
+		threshold = self.tracker.percentile(key, self.percentile)
+		if threshold is None:
+			started = time.monotonic()
+			payload = function(*args, **kwargs)
+			self.tracker.record(key, time.monotonic() - started)
+			return payload
+
+		deadline = current_deadline()
+		request = self.submit(key, function, args, kwargs, deadline)
+		done, pending = concurrent.futures.wait([request], timeout=max(threshold, self.minDelay))
+		if done or not self.may_hedge(key):
+			return request.result()
+
+		copy = self.submit(key, function, args, kwargs, deadline)
+		pending = {request, copy}
+		while pending:
+			done, pending = concurrent.futures.wait(pending, return_when=concurrent.futures.FIRST_COMPLETED)
+			for future in done:
+				if future.exception() is None:
+					if future is copy:
+						self.count(key, "hedgeWins")
+					return future.result()
+		return request.result()
+
+	def report(self) -> dict:
+		"""
+		Summary:
+			Summarizes hedging per key
+
+		Args:
+			None
+
+		Returns:
+			A dictionary of key -> requests, hedges, hedgeWins, hedgeRate and threshold
+		"""
+		with self.lock:
+			payload = {key: dict(counts) for key, counts in self.counts.items()}
+		for key, counts in payload.items():
+			counts["hedgeRate"] = counts["hedges"] / counts["requests"] if counts["requests"] else 0.0
+			counts["threshold"] = self.tracker.percentile(key, self.percentile)
+		return payload
+
+	def close(self):
+		"""
+		Summary:
+			Stops the executor without waiting for duplicates that lost
+
+		Args:
+			None
+
+		Returns:
+			None
+		"""
+		self.executor.shutdown(wait=False)
+
+def hedged_call(client: object, operation: str, function: object, *args, **kwargs) -> object:
+	"""
+	Summary:
+		Makes a request for a client through its hedger. Clients without a hedger, and clients
+		whose hedgeable attribute is False because their api object is not thread safe, make
+		the request directly, so hedging stays opt-in.
+
+	Args:
+		client: an instance of a social client
+		operation: the name of the request, like page or comments
+		function: the function making the request
+		args: the positional arguments of function
+		kwargs: the keyword arguments of function
+
+	Returns:
+		The response of the request
+	"""
+	hedger = getattr(client, "hedger", None)
+	if hedger is None or not getattr(client, "hedgeable", True):
+		return function(*args, **kwargs)
+	return hedger.call("{platform}:{operation}".format(platform=client.platform, operation=operation), function, *args, **kwargs)
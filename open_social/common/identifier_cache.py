@@ -0,0 +1,276 @@
+import concurrent.futures, contextlib, os, sqlite3, threading, time
+
+defaultPath = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "source_identifiers.db")
+
+# graph api codes for unknown or inaccessible objects, and http statuses returned by instagram
+staleCodes = {10, 100, 200, 803, 400, 403, 404}
+
+def stale_identifier(error: Exception) -> bool:
+	"""
+	Summary:
+		Checks whether a failed request points at a stale identifier, like a page that was
+		renamed or a user that was deleted, as opposed to a transient network or rate limit
+		error
+
+	Args:
+		error: the exception raised by the request
+
+	Returns:
+		True if the identifier should be resolved again
+	"""
+	return getattr(error, "code", None) in staleCodes
+
+class SourceIdentifierCache(object):
+
+	"""
+	Summary:
+		Persistent cache of source name -> platform id lookups, like facebook page names to page
+		ids and instagram usernames to user pks. Entries live in memory and in a SQLite database
+		so they survive restarts and are shared by every process using the same file: entries
+		missing from memory are looked up in the database, so lookups made by other processes
+		after startup are reused. Entries expire after ttl seconds and are dropped when a
+		request made with them fails because the source could not be found.
+	"""
+
+	def __init__(self, path: str = None, ttl: float = 7 * 24 * 3600, clock: object = time.time):
+		"""
+		Summary:
+			Initializes an instance of SourceIdentifierCache and loads every stored entry
+
+		Args:
+			path: (optional) the path of the SQLite database. None keeps the cache in memory only.
+			ttl: (optional) the number of seconds an entry stays valid
+			clock: (optional) a function returning the current time in seconds
+
+		Returns:
+			An instance of the SourceIdentifierCache class
+		"""
+		self.path = path
+		self.ttl = ttl
+		self.clock = clock
+		self.lock = threading.Lock()
+		self.entries = {}
+		if self.path is not None:
+			with self.connect() as connection:
+				connection.execute("PRAGMA journal_mode=WAL")
+				connection.execute(
+					"CREATE TABLE IF NOT EXISTS identifiers ("
+					"platform TEXT NOT NULL, name TEXT NOT NULL, identifier TEXT NOT NULL, "
+					"resolved_at REAL NOT NULL, PRIMARY KEY (platform, name))")
+				for platform, name, identifier, resolvedAt in connection.execute("SELECT * FROM identifiers"):
+					self.entries[(platform, name)] = (identifier, resolvedAt)
+
+	@contextlib.contextmanager
+	def connect(self) -> sqlite3.Connection:
+		"""
+		Summary:
+			Opens a connection to the cache database for one transaction. The transaction is
+			committed if the block succeeds and the connection is closed either way.
+
+		Args:
+			None
+
+		Returns:
+			An instance of sqlite3.Connection
+		"""
+		connection = sqlite3.connect(self.path, timeout=30)
+		try:
+			with connection:
+				yield connection
+		finally:
+			connection.close()
+
+	def key(self, platform: str, name: str) -> tuple:
+		"""
+		Summary:
+			Normalizes a lookup key. Source names are case insensitive on both platforms.
+
+		Args:
+			platform: the name of the platform
+			name: the name of the source
+
+		Returns:
+			A tuple of platform and lower case name
+		"""
+		return (platform, name.strip().lower())
+
+	def get(self, platform: str, name: str) -> str:
+		"""
+		Summary:
+			Looks up a cached identifier in memory, then in the database
+
+		Args:
+			platform: the name of the platform
+			name: the name of the source
+
+		Returns:
+			The identifier, or None if it is not cached or has expired
+		"""
+		key = self.key(platform, name)
+		with self.lock:
+			entry = self.entries.get(key)
+		if entry is None and self.path is not None:
+			with self.connect() as connection:
+				entry = connection.execute("SELECT identifier, resolved_at FROM identifiers WHERE platform = ? AND name = ?", key).fetchone()
+			if entry is not None:
+				with self.lock:
+					self.entries[key] = entry
+		if entry is None or self.clock() - entry[1] > self.ttl:
+			return None
+		return entry[0]
+
+	def set(self, platform: str, name: str, identifier: object):
+		"""
+		Summary:
+			Stores an identifier
+
+		Args:
+			platform: the name of the platform
+			name: the name of the source
+			identifier: the identifier of the source. It is stored as a string.
+
+		Returns:
+			None
+		"""
+		self.set_many(platform, {name: identifier})
+
+	def set_many(self, platform: str, identifiers: dict):
+		"""
+		Summary:
+			Stores several identifiers in one transaction
+
+		Args:
+			platform: the name of the platform
+			identifiers: a dictionary of source name -> identifier
+
+		Returns:
+			None
+		"""
+		now = self.clock()
+		rows = [self.key(platform, name) + (str(identifier), now) for name, identifier in identifiers.items()]
+		with self.lock:
+			for platform, name, identifier, resolvedAt in rows:
+				self.entries[(platform, name)] = (identifier, resolvedAt)
+		if self.path is not None and rows:
+			with self.connect() as connection:
+				connection.executemany("INSERT OR REPLACE INTO identifiers VALUES (?, ?, ?, ?)", rows)
+
+	def invalidate(self, platform: str, name: str):
+		"""
+		Summary:
+			Drops a cached identifier, for example after a request made with it failed
+
+		Args:
+			platform: the name of the platform
+			name: the name of the source
+
+		Returns:
+			None
+		"""
+		key = self.key(platform, name)
+		with self.lock:
+			self.entries.pop(key, None)
+		if self.path is not None:
+			with self.connect() as connection:
+				connection.execute("DELETE FROM identifiers WHERE platform = ? AND name = ?", key)
+
+	def resolve(self, platform: str, name: str, resolver: object) -> str:
+		"""
+		Summary:
+			Returns the cached identifier of a source, calling resolver and caching its result on
+			a miss
+
+		Args:
+			platform: the name of the platform
+			name: the name of the source
+			resolver: a function that takes a source name and returns its identifier
+
+		Returns:
+			The identifier of the source
+		"""
+		identifier = self.get(platform, name)
+		if identifier is None:
+			identifier = resolver(name)
+			self.set(platform, name, identifier)
+		return str(identifier)
+
+	def warm(self, platform: str, names: list, resolver: object, maxWorkers: int = 8) -> dict:
+		"""
+		Summary:
+			Resolves every name that is not cached yet, concurrently, and stores the results in
+			one transaction. Names that can not be resolved are left out.
+
+		Args:
+			platform: the name of the platform
+			names: a list of source names
+			resolver: a function that takes a source name and returns its identifier
+			maxWorkers: (optional) the number of concurrent lookups
+
+		Returns:
+			A dictionary of source name -> identifier for every name that was resolved
+		"""
+		payload = {name: self.get(platform, name) for name in names}
+		missing = [name for name, identifier in payload.items() if identifier is None]
+		resolved = {}
+		if missing:
+			with concurrent.futures.ThreadPoolExecutor(max_workers=min(maxWorkers, len(missing))) as executor:
+				futureSet = {executor.submit(resolver, name): name for name in missing}
+				for future in concurrent.futures.as_completed(futureSet):
+					try:
+						resolved[futureSet[future]] = future.result()
+					except Exception as e:
+						print("Could not resolve {name}: {error!s}".format(name=futureSet[future], error=e))
+			self.set_many(platform, resolved)
+		payload.update({name: str(identifier) for name, identifier in resolved.items()})
+		return {name: identifier for name, identifier in payload.items() if identifier is not None}
+
+	def fetch(self, platform: str, name: str, resolver: object, request: object, isStale: object = stale_identifier) -> (str, object):
+		"""
+		Summary:
+			Runs a request that needs a source's identifier. If the request fails with an
+			identifier taken from the cache because the source could not be found, the entry is
+			invalidated and the request is retried once with a freshly resolved identifier.
+			Other errors, like timeouts, are raised without touching the cache.
+
+		Args:
+			platform: the name of the platform
+			name: the name of the source
+			resolver: a function that takes a source name and returns its identifier
+			request: a function that takes an identifier and returns the api response
+			isStale: (optional) a function that takes the exception raised by request and
+					 returns True if the identifier should be resolved again
+
+		Returns:
+			identifier: the identifier the request succeeded with
+			response: the result of request
+		"""
+		cached = self.get(platform, name)
+		identifier = self.resolve(platform, name, resolver)
+		try:
+			return identifier, request(identifier)
+		except Exception as e:
+			if cached is None or not isStale(e):
+				raise
+			self.invalidate(platform, name)
+			identifier = self.resolve(platform, name, resolver)
+			return identifier, request(identifier)
+
+sharedCaches = {}
+sharedCachesLock = threading.Lock()
+
+def shared_identifier_cache(path: str = defaultPath) -> SourceIdentifierCache:
+	"""
+	Summary:
+		Returns the process wide identifier cache stored at path, creating it on first use
+
+	Args:
+		path: (optional) the path of the SQLite database. Defaults to the data directory of
+			  open-social.
+
+	Returns:
+		An instance of SourceIdentifierCache
+	"""
+	with sharedCachesLock:
+		if path not in sharedCaches:
+			sharedCaches[path] = SourceIdentifierCache(path)
+		return sharedCaches[path]
@@ -0,0 +1,369 @@
+import json, sqlite3, threading, time
+
+class AbstractJobQueue(object):
+
+	"""
+	Summary:
+		Abstract class used to impose implementation guidelines for crawl task queues. Tasks
+		are leased by workers for a limited time. A worker keeps its lease alive with
+		heartbeats, and tasks whose lease runs out are handed to another worker.
+	"""
+
+	def put(self, tasks: list):
+		"""
+		Summary:
+			Adds tasks to the queue
+
+		Args:
+			tasks: a list of dictionaries with the keys job_id, platform, source, term, limit
+				   and options
+
+		Returns:
+			None
+		"""
+		pass
+
+	def lease(self, workerId: str, leaseSeconds: float) -> dict:
+		"""
+		Summary:
+			Reclaims expired leases and leases the oldest pending task to a worker
+
+		Args:
+			workerId: a unique name for the worker
+			leaseSeconds: how long the worker may hold the task without a heartbeat
+
+		Returns:
+			The leased task as a dictionary, or None if no task is pending
+		"""
+		pass
+
+	def heartbeat(self, taskId: int, workerId: str, leaseSeconds: float) -> bool:
+		"""
+		Summary:
+			Extends a worker's lease on a task
+
+		Args:
+			taskId: the id of the leased task
+			workerId: the name of the worker holding the lease
+			leaseSeconds: the new lease length, counted from now
+
+		Returns:
+			True if the worker still holds the lease, False if the task was reclaimed
+		"""
+		pass
+
+	def complete(self, taskId: int, workerId: str, resultCount: int) -> bool:
+		"""
+		Summary:
+			Marks a leased task as done
+
+		Args:
+			taskId: the id of the leased task
+			workerId: the name of the worker holding the lease
+			resultCount: the number of data points the task produced
+
+		Returns:
+			True if the worker still held the lease, else False
+		"""
+		pass
+
+	def fail(self, taskId: int, workerId: str, error: str) -> bool:
+		"""
+		Summary:
+			Releases a leased task after an error. The task is retried until it has been
+			attempted maxAttempts times, then it is marked as failed.
+
+		Args:
+			taskId: the id of the leased task
+			workerId: the name of the worker holding the lease
+			error: a description of the error
+
+		Returns:
+			True if the worker still held the lease, else False
+		"""
+		pass
+
+	def counts(self, jobId: str = None) -> dict:
+		"""
+		Summary:
+			Counts tasks by status
+
+		Args:
+			jobId: (optional) only count the tasks of this job
+
+		Returns:
+			A dictionary of status -> count. Statuses are pending, leased, done and failed.
+		"""
+		pass
+
+class SQLiteJobQueue(AbstractJobQueue):
+
+	"""
+	Summary:
+		A job queue stored in a SQLite database. Any process that can open the database file
+		can act as a coordinator or a worker. A connection is opened per operation so the queue
+		can be shared by threads, and leases are taken inside an immediate transaction so two
+		workers never lease the same task.
+	"""
+
+	def __init__(self, path: str, maxAttempts: int = 3):
+		"""
+		Summary:
+			Initializes an instance of SQLiteJobQueue and creates the task table if needed
+
+		Args:
+			path: the path of the database file
+			maxAttempts: (optional) how many times a task is leased before it is marked failed
+
+		Returns:
+			An instance of the SQLiteJobQueue class
+		"""
+		self.path = path
+		self.maxAttempts = maxAttempts
+		with self.connect() as connection:
+			connection.execute("PRAGMA journal_mode=WAL")
+			connection.execute(
+				"CREATE TABLE IF NOT EXISTS tasks ("
+				"id INTEGER PRIMARY KEY AUTOINCREMENT, job_id TEXT, platform TEXT, source TEXT, "
+				"term TEXT, task_limit INTEGER, options TEXT, status TEXT NOT NULL DEFAULT 'pending', "
+				"worker TEXT, lease_expires REAL, attempts INTEGER NOT NULL DEFAULT 0, "
+				"result_count INTEGER, error TEXT, updated_at REAL)")
+			connection.execute("CREATE INDEX IF NOT EXISTS tasks_status ON tasks (status, lease_expires)")
+
+	def connect(self) -> sqlite3.Connection:
+		"""
+		Summary:
+			Opens a connection to the queue database in autocommit mode
+
+		Args:
+			None
+
+		Returns:
+			An instance of sqlite3.Connection
+		"""
+		connection = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+		connection.row_factory = sqlite3.Row
+		return connection
+
+	def put(self, tasks: list):
+		now = time.time()
+		rows = [(task.get("job_id"), task["platform"], task.get("source"), task["term"], task["limit"],
+			json.dumps(task.get("options", {})), now) for task in tasks]
+		connection = self.connect()
+		try:
+			connection.execute("BEGIN IMMEDIATE")
+			connection.executemany(
+				"INSERT INTO tasks (job_id, platform, source, term, task_limit, options, updated_at) "
+				"VALUES (?, ?, ?, ?, ?, ?, ?)", rows)
+			connection.execute("COMMIT")
+		finally:
+			connection.close()
+
+	def reclaim_expired(self, connection: sqlite3.Connection, now: float):
+		"""
+		Summary:
+			Returns tasks whose lease has run out to the pending state, or marks them failed once
+			they have used all their attempts. Must be called inside a transaction.
+
+		Args:
+			connection: an open connection with a transaction in progress
+			now: the current time in seconds since the epoch
+
+		Returns:
+			None
+		"""
+		connection.execute(
+			"UPDATE tasks SET status = CASE WHEN attempts >= ? THEN 'failed' ELSE 'pending' END, "
+			"worker = NULL, error = 'lease expired', updated_at = ? "
+			"WHERE status = 'leased' AND lease_expires < ?", (self.maxAttempts, now, now))
+
+	def lease(self, workerId: str, leaseSeconds: float) -> dict:
+		now = time.time()
+		connection = self.connect()
+		try:
+			connection.execute("BEGIN IMMEDIATE")
+			self.reclaim_expired(connection, now)
+			row = connection.execute("SELECT * FROM tasks WHERE status = 'pending' ORDER BY id LIMIT 1").fetchone()
+			if row is not None:
+				connection.execute(
+					"UPDATE tasks SET status = 'leased', worker = ?, lease_expires = ?, attempts = attempts + 1, "
+					"updated_at = ? WHERE id = ?", (workerId, now + leaseSeconds, now, row["id"]))
+			connection.execute("COMMIT")
+		finally:
+			connection.close()
+		if row is None:
+			return None
+		return {
+			"id": row["id"],
+			"job_id": row["job_id"],
+			"platform": row["platform"],
+			"source": row["source"],
+			"term": row["term"],
+			"limit": row["task_limit"],
+			"options": json.loads(row["options"]),
+			"attempts": row["attempts"] + 1
+		}
+
+	def update_owned(self, sql: str, parameters: tuple, taskId: int, workerId: str) -> bool:
+		"""
+		Summary:
+			Runs an update on a task only if workerId still holds its lease
+
+		Args:
+			sql: an UPDATE statement ending in a WHERE clause on id, worker and status
+			parameters: the parameters of the SET clause
+			taskId: the id of the task
+			workerId: the name of the worker
+
+		Returns:
+			True if a row was updated, else False
+		"""
+		connection = self.connect()
+		try:
+			cursor = connection.execute(sql, parameters + (taskId, workerId))
+			return cursor.rowcount == 1
+		finally:
+			connection.close()
+
+	def heartbeat(self, taskId: int, workerId: str, leaseSeconds: float) -> bool:
+		now = time.time()
+		return self.update_owned(
+			"UPDATE tasks SET lease_expires = ?, updated_at = ? WHERE id = ? AND worker = ? AND status = 'leased'",
+			(now + leaseSeconds, now), taskId, workerId)
+
+	def complete(self, taskId: int, workerId: str, resultCount: int) -> bool:
+		return self.update_owned(
+			"UPDATE tasks SET status = 'done', result_count = ?, error = NULL, updated_at = ? "
+			"WHERE id = ? AND worker = ? AND status = 'leased'",
+			(resultCount, time.time()), taskId, workerId)
+
+	def fail(self, taskId: int, workerId: str, error: str) -> bool:
+		return self.update_owned(
+			"UPDATE tasks SET status = CASE WHEN attempts >= {maxAttempts} THEN 'failed' ELSE 'pending' END, "
+			"worker = NULL, error = ?, updated_at = ? WHERE id = ? AND worker = ? AND status = 'leased'".format(
+				maxAttempts=int(self.maxAttempts)),
+			(error, time.time()), taskId, workerId)
+
+	def counts(self, jobId: str = None) -> dict:
+		connection = self.connect()
+		try:
+			if jobId is None:
+				rows = connection.execute("SELECT status, COUNT(*) FROM tasks GROUP BY status").fetchall()
+			else:
+				rows = connection.execute("SELECT status, COUNT(*) FROM tasks WHERE job_id = ? GROUP BY status", (jobId,)).fetchall()
+		finally:
+			connection.close()
+		payload = {"pending": 0, "leased": 0, "done": 0, "failed": 0}
+		payload.update({row[0]: row[1] for row in rows})
+		return payload
+
+class LocalJobQueue(AbstractJobQueue):
+
+	"""
+	Summary:
+		An in memory job queue with the same leasing behavior as SQLiteJobQueue. It stands in
+		for a message broker when every worker runs as a thread of the same process.
+	"""
+
+	def __init__(self, maxAttempts: int = 3, clock: object = time.time):
+		"""
+		Summary:
+			Initializes an instance of LocalJobQueue
+
+		Args:
+			maxAttempts: (optional) how many times a task is leased before it is marked failed
+			clock: (optional) a function returning the current time in seconds
+
+		Returns:
+			An instance of the LocalJobQueue class
+		"""
+		self.maxAttempts = maxAttempts
+		self.clock = clock
+		self.lock = threading.Lock()
+		self.tasks = {}
+		self.nextId = 1
+
+	def put(self, tasks: list):
+		with self.lock:
+			for task in tasks:
+				self.tasks[self.nextId] = {
+					"id": self.nextId,
+					"job_id": task.get("job_id"),
+					"platform": task["platform"],
+					"source": task.get("source"),
+					"term": task["term"],
+					"limit": task["limit"],
+					"options": dict(task.get("options", {})),
+					"status": "pending",
+					"worker": None,
+					"lease_expires": None,
+					"attempts": 0,
+					"result_count": None,
+					"error": None
+				}
+				self.nextId += 1
+
+	def lease(self, workerId: str, leaseSeconds: float) -> dict:
+		with self.lock:
+			now = self.clock()
+			for task in self.tasks.values():
+				if task["status"] == "leased" and task["lease_expires"] < now:
+					task["status"] = "failed" if task["attempts"] >= self.maxAttempts else "pending"
+					task["worker"], task["error"] = None, "lease expired"
+			for task in self.tasks.values():
+				if task["status"] == "pending":
+					task["status"], task["worker"] = "leased", workerId
+					task["lease_expires"] = now + leaseSeconds
+					task["attempts"] += 1
+					return {key: task[key] for key in ["id", "job_id", "platform", "source", "term", "limit", "options", "attempts"]}
+			return None
+
+	def owned(self, taskId: int, workerId: str) -> dict:
+		"""
+		Summary:
+			Looks up a task that is leased by workerId. Must be called while holding self.lock.
+
+		Args:
+			taskId: the id of the task
+			workerId: the name of the worker
+
+		Returns:
+			The task's internal dictionary, or None if the worker does not hold the lease
+		"""
+		task = self.tasks.get(taskId)
+		if task is None or task["status"] != "leased" or task["worker"] != workerId:
+			return None
+		return task
+
+	def heartbeat(self, taskId: int, workerId: str, leaseSeconds: float) -> bool:
+		with self.lock:
+			task = self.owned(taskId, workerId)
+			if task is None:
+				return False
+			task["lease_expires"] = self.clock() + leaseSeconds
+			return True
+
+	def complete(self, taskId: int, workerId: str, resultCount: int) -> bool:
+		with self.lock:
+			task = self.owned(taskId, workerId)
+			if task is None:
+				return False
+			task["status"], task["result_count"], task["error"] = "done", resultCount, None
+			return True
+
+	def fail(self, taskId: int, workerId: str, error: str) -> bool:
+		with self.lock:
+			task = self.owned(taskId, workerId)
+			if task is None:
+				return False
+			task["status"] = "failed" if task["attempts"] >= self.maxAttempts else "pending"
+			task["worker"], task["error"] = None, error
+			return True
+
+	def counts(self, jobId: str = None) -> dict:
+		payload = {"pending": 0, "leased": 0, "done": 0, "failed": 0}
+		with self.lock:
+			for task in self.tasks.values():
+				if jobId is None or task["job_id"] == jobId:
+					payload[task["status"]] += 1
+		return payload
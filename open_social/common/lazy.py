@@ -0,0 +1,340 @@
+from .deadline import activated, current_deadline
+from .social_error import SocialError
+from collections import deque
+import concurrent.futures, sys, threading, weakref
+
+class LazySecondary(dict):
+
+	"""
+	Summary:
+		Stands in for the secondary_information dictionary of a data point. The comments are
+		fetched the first time the handle is read, so callers that only use captions or titles
+		never pay for them. Reading a handle also starts fetching the next pending handles of
+		the same resolver, so looping over results fetches comments in concurrent batches.
+		Serializers do not read dictionaries through their methods, so call resolve on data
+		before dumping it.
+	"""
+
+	def __init__(self, resolver: object, fetch: object):
+		"""
+		Summary:
+			Initializes an instance of LazySecondary. Use secondary_information to create one.
+
+		Args:
+			resolver: the SecondaryResolver that fetches this handle
+			fetch: a function without arguments returning the secondary information dictionary
+
+		Returns:
+			An instance of the LazySecondary class
+		"""
+		super().__init__()
+		self.resolver = resolver
+		self.fetch = fetch
+		self.claimed = False
+		self.lock = threading.Lock()
+		self.event = threading.Event()
+
+	def claim(self) -> bool:
+		"""
+		Summary:
+			Reserves the handle for one fetch
+
+		Args:
+			None
+
+		Returns:
+			True if the caller should fetch the handle
+		"""
+		with self.lock:
+			if self.claimed:
+				return False
+			self.claimed = True
+			return True
+
+	def load(self, deadline: object = None):
+		"""
+		Summary:
+			Fetches the secondary information. A failed fetch stores an error entry in place of
+			the comments.
+
+		Args:
+			deadline: (optional) the deadline of the thread that asked for the fetch, activated
+					  while fetching on a worker thread
+
+		Returns:
+			None
+		"""
+		try:
+			with activated(deadline):
+				dict.update(self, self.fetch())
+		except:
+			etype, value, tb = sys.exc_info()
+			error = SocialError()
+			error.add_error(etype, value, tb)
+			dict.update(self, {"error(s)": error.errorInfo})
+		finally:
+			self.fetch = None
+			self.event.set()
+
+	def resolved(self) -> bool:
+		"""
+		Summary:
+			Checks whether the secondary information was fetched
+
+		Args:
+			None
+
+		Returns:
+			True if the handle holds the secondary information
+		"""
+		return self.event.is_set()
+
+	def resolve(self) -> dict:
+		"""
+		Summary:
+			Fetches the secondary information if it was not fetched yet
+
+		Args:
+			None
+
+		Returns:
+			The handle, now holding the secondary information
+		"""
+		if not self.event.is_set():
+			self.resolver.resolve(self)
+		return self
+
+	def __getitem__(self, key: str) -> object:
+		return dict.__getitem__(self.resolve(), key)
+
+	def __contains__(self, key: str) -> bool:
+		return dict.__contains__(self.resolve(), key)
+
+	def __iter__(self):
+		return dict.__iter__(self.resolve())
+
+	def __len__(self) -> int:
+		return dict.__len__(self.resolve())
+
+	def __eq__(self, other: object) -> bool:
+		return dict.__eq__(self.resolve(), other)
+
+	def __repr__(self) -> str:
+		return dict.__repr__(self) if self.event.is_set() else "LazySecondary(unresolved)"
+
+	def get(self, key: str, default: object = None) -> object:
+		return dict.get(self.resolve(), key, default)
+
+	def keys(self):
+		return dict.keys(self.resolve())
+
+	def values(self):
+		return dict.values(self.resolve())
+
+	def items(self):
+		return dict.items(self.resolve())
+
+	def copy(self) -> dict:
+		return dict(self.items())
+
+	def __reduce__(self):
+		return (dict, (dict(self.items()),))
+
+class SecondaryResolver(object):
+
+	"""
+	Summary:
+		Fetches the secondary information of lazy handles on a thread pool. In lazy mode a
+		handle is fetched when it is first read, together with up to batchSize - 1 other
+		pending handles in the order they were created. In background mode every handle is
+		queued for fetching as soon as it is created, and reading one only waits for it. Workers
+	fetch under the deadline of the thread that created (background mode) or read (lazy
+	mode) the handle.
+	"""
+
+	# the smallest length of pending at which dropped and fetched handles are pruned
+	minPruneAt = 1024
+
+	def __init__(self, batchSize: int = 20, workers: int = 8, background: bool = False):
+		"""
+		Summary:
+			Initializes an instance of SecondaryResolver
+
+		Args:
+			batchSize: (optional) the number of handles fetched together when one is read
+			workers: (optional) the number of threads fetching secondary information
+			background: (optional) fetch every handle as soon as it is created
+
+		Returns:
+			An instance of the SecondaryResolver class
+		"""
+		self.batchSize = batchSize
+		self.background = background
+		self.executor = concurrent.futures.ThreadPoolExecutor(max_workers=workers)
+		self.lock = threading.Lock()
+		self.pending = deque()
+		self.pruneAt = self.minPruneAt
+
+	def handle(self, fetch: object) -> LazySecondary:
+		"""
+		Summary:
+			Creates a handle for a fetch
+
+		Args:
+			fetch: a function without arguments returning the secondary information dictionary
+
+		Returns:
+			An instance of LazySecondary
+		"""
+		handle = LazySecondary(self, fetch)
+		if self.background:
+			handle.claim()
+			self.executor.submit(handle.load, current_deadline())
+		else:
+			with self.lock:
+				self.pending.append(weakref.ref(handle))
+				if len(self.pending) > self.pruneAt:
+					self.prune()
+		return handle
+
+	def prune(self):
+		"""
+		Summary:
+			Drops the references to handles that were garbage collected or already claimed.
+			Pruning happens when pending doubles, so it costs a constant amount per handle.
+			Called with the lock held.
+
+		Args:
+			None
+
+		Returns:
+			None
+		"""
+		live = (reference() for reference in self.pending)
+		self.pending = deque(weakref.ref(handle) for handle in live if handle is not None and not handle.claimed)
+		self.pruneAt = max(2 * len(self.pending), self.minPruneAt)
+
+	def take_pending(self, count: int) -> list:
+		"""
+		Summary:
+			Claims the oldest handles that were not fetched yet
+
+		Args:
+			count: the maximum number of handles claimed
+
+		Returns:
+			A list of claimed handles
+		"""
+		payload = []
+		with self.lock:
+			while self.pending and len(payload) < count:
+				handle = self.pending.popleft()()
+				if handle is not None and handle.claim():
+					payload.append(handle)
+		return payload
+
+	def resolve(self, handle: LazySecondary):
+		"""
+		Summary:
+			Fetches a handle together with the next pending handles and waits for the handle
+
+		Args:
+			handle: an instance of LazySecondary
+
+		Returns:
+			None
+		"""
+		claimed, deadline = handle.claim(), current_deadline()
+		for other in self.take_pending(self.batchSize - 1):
+			self.executor.submit(other.load, deadline)
+		if claimed:
+			handle.load()
+		handle.event.wait()
+
+	def resolve_many(self, handles: list):
+		"""
+		Summary:
+			Fetches many handles concurrently and waits for all of them
+
+		Args:
+			handles: a list of LazySecondary instances
+
+		Returns:
+			None
+		"""
+		deadline = current_deadline()
+		for handle in handles:
+			if handle.claim():
+				self.executor.submit(handle.load, deadline)
+		for handle in handles:
+			handle.event.wait()
+
+	def close(self):
+		"""
+		Summary:
+			Stops the thread pool once queued fetches finish
+
+		Args:
+			None
+
+		Returns:
+			None
+		"""
+		self.executor.shutdown(wait=False)
+
+def secondary_information(client: object, fetch: object) -> dict:
+	"""
+	Summary:
+		Gets the secondary information of a data point the way the client is configured to.
+		Clients without a resolver fetch it right away.
+
+	Args:
+		client: an instance of a social client
+		fetch: a function without arguments returning the secondary information dictionary
+
+	Returns:
+		The secondary information dictionary, or a LazySecondary handle standing in for it
+	"""
+	resolver = getattr(client, "resolver", None)
+	if resolver is None:
+		return fetch()
+	return resolver.handle(fetch)
+
+def find_handles(data: object) -> list:
+	"""
+	Summary:
+		Collects the unresolved handles in search results
+
+	Args:
+		data: a parsed data point, a list of them, or a dictionary of platform -> list
+
+	Returns:
+		A list of LazySecondary instances
+	"""
+	if isinstance(data, LazySecondary):
+		return [] if data.resolved() else [data]
+	if isinstance(data, dict):
+		return [handle for value in dict.values(data) for handle in find_handles(value)]
+	if isinstance(data, list):
+		return [handle for value in data for handle in find_handles(value)]
+	return []
+
+def resolve(data: object) -> object:
+	"""
+	Summary:
+		Fetches every unresolved handle in search results concurrently, so the results can be
+		serialized
+
+	Args:
+		data: a parsed data point, a list of them, or a dictionary of platform -> list
+
+	Returns:
+		data
+	"""
+	handles = find_handles(data)
+	resolvers = {}
+	for handle in handles:
+		resolvers.setdefault(id(handle.resolver), (handle.resolver, []))[1].append(handle)
+	for resolver, group in resolvers.values():
+		resolver.resolve_many(group)
+	return data
@@ -0,0 +1,315 @@
+from .deadline import DeadlineAdapter, activated, current_deadline, expired, request_timeout
+from .social_error import SocialError
+import concurrent.futures, contextlib, hashlib, mimetypes, os, requests, sqlite3, sys, tempfile, threading, urllib.parse
+
+def instagram_media(item: dict) -> list:
+	"""
+	Summary:
+		Pulls the media of a raw instagram feed item, including every item of a carousel. The
+		largest candidate of every image and video is kept.
+
+	Args:
+		item: an item of an instagram user feed
+
+	Returns:
+		A list of dictionaries with the keys url, type, width and height
+	"""
+	payload = []
+	for media in item.get("carousel_media") or [item]:
+		if media.get("video_versions"):
+			video = media["video_versions"][0]
+			payload.append({"url": video["url"], "type": "video", "width": video.get("width"), "height": video.get("height")})
+		elif media.get("image_versions2", {}).get("candidates"):
+			image = media["image_versions2"]["candidates"][0]
+			payload.append({"url": image["url"], "type": "image", "width": image.get("width"), "height": image.get("height")})
+	return payload
+
+def tumblr_media(post: dict) -> list:
+	"""
+	Summary:
+		Pulls the photos and video of a raw tumblr post. The original size of every photo is
+		kept.
+
+	Args:
+		post: a post returned by the tumblr posts endpoint
+
+	Returns:
+		A list of dictionaries with the keys url, type, width and height
+	"""
+	payload = []
+	for photo in post.get("photos", []):
+		size = photo.get("original_size", {})
+		if size.get("url"):
+			payload.append({"url": size["url"], "type": "image", "width": size.get("width"), "height": size.get("height")})
+	if post.get("video_url"):
+		payload.append({"url": post["video_url"], "type": "video", "width": post.get("thumbnail_width"), "height": post.get("thumbnail_height")})
+	return payload
+
+class BudgetExceeded(Exception):
+
+	"""
+	Summary:
+		Raised when a download would exceed the byte budget of its job
+	"""
+
+class ByteBudget(object):
+
+	"""
+	Summary:
+		The number of bytes a download job may write, shared by its download threads
+	"""
+
+	def __init__(self, limit: int = None):
+		"""
+		Summary:
+			Initializes an instance of ByteBudget
+
+		Args:
+			limit: (optional) the number of bytes available. None is unlimited.
+
+		Returns:
+			An instance of the ByteBudget class
+		"""
+		self.limit = limit
+		self.used = 0
+		self.lock = threading.Lock()
+
+	def reserve(self, count: int):
+		"""
+		Summary:
+			Takes bytes from the budget
+
+		Args:
+			count: the number of bytes
+
+		Returns:
+			None
+		"""
+		with self.lock:
+			if self.limit is not None and self.used + count > self.limit:
+				raise BudgetExceeded("the download would exceed the budget of {limit} bytes".format(limit=self.limit))
+			self.used += count
+
+	def release(self, count: int):
+		"""
+		Summary:
+			Returns bytes to the budget, for example after a download failed
+
+		Args:
+			count: the number of bytes
+
+		Returns:
+			None
+		"""
+		with self.lock:
+			self.used -= count
+
+class MediaStore(object):
+
+	"""
+	Summary:
+		Downloads media concurrently into a content addressed directory. Files are streamed to
+		disk in chunks while they are hashed and are stored as <sha256[:2]>/<sha256><extension>,
+		so the same file reached through different urls is stored once. An index of url ->
+		file lets later jobs skip urls that were already downloaded, like reposts of the same
+		image. Connections are pooled across the download threads.
+	"""
+
+	def __init__(self, directory: str, workers: int = 8, chunkSize: int = 1 << 16, timeout: float = 30):
+		"""
+		Summary:
+			Initializes an instance of MediaStore
+
+		Args:
+			directory: the directory files are stored in. It is created if it does not exist.
+			workers: (optional) the number of concurrent downloads
+			chunkSize: (optional) the number of bytes read and written at a time
+			timeout: (optional) the number of seconds a connection may stay silent
+
+		Returns:
+			An instance of the MediaStore class
+		"""
+		self.directory = directory
+		self.workers = workers
+		self.chunkSize = chunkSize
+		self.timeout = timeout
+		os.makedirs(self.directory, exist_ok=True)
+		self.session = requests.Session()
+		adapter = DeadlineAdapter(pool_connections=workers, pool_maxsize=workers)
+		self.session.mount("https://", adapter)
+		self.session.mount("http://", adapter)
+		with self.connect() as connection:
+			connection.execute("PRAGMA journal_mode=WAL")
+			connection.execute("CREATE TABLE IF NOT EXISTS media (url TEXT PRIMARY KEY, sha256 TEXT NOT NULL, bytes INTEGER NOT NULL, path TEXT NOT NULL)")
+
+	@contextlib.contextmanager
+	def connect(self) -> sqlite3.Connection:
+		"""
+		Summary:
+			Opens a connection to the url index for one transaction. The transaction is
+			committed if the block succeeds and the connection is closed either way.
+
+		Args:
+			None
+
+		Returns:
+			An instance of sqlite3.Connection
+		"""
+		connection = sqlite3.connect(os.path.join(self.directory, "index.db"), timeout=30)
+		try:
+			with connection:
+				yield connection
+		finally:
+			connection.close()
+
+	def lookup(self, url: str) -> dict:
+		"""
+		Summary:
+			Looks up a url that was downloaded before
+
+		Args:
+			url: the url of the media
+
+		Returns:
+			A dictionary with the keys url, sha256, bytes and path, or None if the url was not
+			downloaded or its file is gone
+		"""
+		with self.connect() as connection:
+			row = connection.execute("SELECT sha256, bytes, path FROM media WHERE url = ?", (url,)).fetchone()
+		if row is None or not os.path.exists(os.path.join(self.directory, row[2])):
+			return None
+		return {"url": url, "sha256": row[0], "bytes": row[1], "path": os.path.join(self.directory, row[2])}
+
+	def extension(self, url: str, contentType: str) -> str:
+		"""
+		Summary:
+			Picks a file extension from the url path or the content type
+
+		Args:
+			url: the url of the media
+			contentType: the Content-Type header of the response
+
+		Returns:
+			An extension starting with a dot, or an empty string
+		"""
+		extension = os.path.splitext(urllib.parse.urlparse(url).path)[1].lower()
+		if 1 < len(extension) <= 5:
+			return extension
+		return mimetypes.guess_extension((contentType or "").split(";")[0].strip()) or ""
+
+	def download(self, url: str, budget: ByteBudget = None) -> dict:
+		"""
+		Summary:
+			Streams a url to a temporary file while hashing it, then moves the file to its
+			content address. Bytes are taken from the budget as they arrive, so a download that
+			runs over the budget stops without finishing.
+
+		Args:
+			url: the url of the media
+			budget: (optional) the ByteBudget of the job
+
+		Returns:
+			A dictionary with the keys url, sha256, bytes and path
+		"""
+		budget = budget or ByteBudget()
+		reserved, size = 0, 0
+		descriptor, temporary = tempfile.mkstemp(dir=self.directory, suffix=".part")
+		try:
+			with os.fdopen(descriptor, "wb") as file, self.session.get(url, stream=True, timeout=request_timeout(self.timeout)) as response:
+				response.raise_for_status()
+				length = int(response.headers.get("Content-Length") or 0)
+				if length:
+					budget.reserve(length)
+					reserved = length
+				digest = hashlib.sha256()
+				for chunk in response.iter_content(chunk_size=self.chunkSize):
+					size += len(chunk)
+					if size > reserved:
+						budget.reserve(size - reserved)
+						reserved = size
+					digest.update(chunk)
+					file.write(chunk)
+				if reserved > size:
+					# the body was shorter than its Content-Length
+					budget.release(reserved - size)
+					reserved = size
+				extension = self.extension(url, response.headers.get("Content-Type"))
+			sha256 = digest.hexdigest()
+			relativePath = os.path.join(sha256[:2], sha256 + extension)
+			path = os.path.join(self.directory, relativePath)
+			if os.path.exists(path):
+				os.remove(temporary)
+			else:
+				os.makedirs(os.path.dirname(path), exist_ok=True)
+				os.replace(temporary, path)
+		except:
+			budget.release(reserved)
+			if os.path.exists(temporary):
+				os.remove(temporary)
+			raise
+		with self.connect() as connection:
+			connection.execute("INSERT OR REPLACE INTO media VALUES (?, ?, ?, ?)", (url, sha256, size, relativePath))
+		return {"url": url, "sha256": sha256, "bytes": size, "path": path}
+
+	def download_all(self, urls: list, maxBytes: int = None) -> dict:
+		"""
+		Summary:
+			Downloads many urls concurrently as one job. Urls that were downloaded before are
+			not requested again. Download threads run under the active deadline of the caller
+			and stop once it passes.
+
+		Args:
+			urls: a list of urls. Repeated urls are downloaded once.
+			maxBytes: (optional) the byte budget of the job
+
+		Returns:
+			A dictionary of url -> result. Results have the keys url, sha256, bytes and path,
+			plus cached (True if the url was already stored). Failed downloads have the keys
+			url and error(s) instead.
+		"""
+		budget, payload, pending = ByteBudget(maxBytes), {}, []
+		for url in dict.fromkeys(urls):
+			stored = self.lookup(url)
+			if stored is not None:
+				payload[url] = dict(stored, cached=True)
+			else:
+				pending.append(url)
+
+		deadline = current_deadline()
+
+		def download(url: str) -> dict:
+			with activated(deadline):
+				if expired():
+					return {"url": url, "error(s)": "the deadline passed before the download started"}
+				try:
+					return dict(self.download(url, budget), cached=False)
+				except:
+					etype, value, tb = sys.exc_info()
+					error = SocialError()
+					error.add_error(etype, value, tb)
+					return {"url": url, "error(s)": error.errorInfo}
+
+		if pending:
+			with concurrent.futures.ThreadPoolExecutor(max_workers=min(self.workers, len(pending))) as executor:
+				for url, result in zip(pending, executor.map(download, pending)):
+					payload[url] = result
+		return payload
+
+def find_media(data: object) -> list:
+	"""
+	Summary:
+		Collects the media entries of parsed data points
+
+	Args:
+		data: a parsed data point, a list of them, or a dictionary of platform -> list
+
+	Returns:
+		A list of media dictionaries
+	"""
+	if isinstance(data, dict):
+		if isinstance(data.get("media"), list):
+			return [entry for entry in data["media"] if isinstance(entry, dict) and entry.get("url")]
+		return [entry for value in data.values() if isinstance(value, list) for entry in find_media(value)]
+	if isinstance(data, list):
+		return [entry for value in data for entry in find_media(value)]
+	return []
@@ -0,0 +1,390 @@
+from .social_error import SocialError
+from collections import OrderedDict
+import heapq, itertools, sys, threading, time
+
+class Subscription(object):
+
+	"""
+	Summary:
+		A (platform, source, term) combination that is polled repeatedly by SourceMonitor,
+		along with the statistics used to decide how often it is polled.
+	"""
+
+	maxErrors = 100
+
+	def __init__(self, platform: str, source: str, term: str, limit: int, interval: float, seenLimit: int):
+		"""
+		Summary:
+			Initializes an instance of Subscription
+
+		Args:
+			platform: the name of the platform to poll
+			source: the page, user, subreddit or blog to poll. None for twitter.
+			term: the search term to match against
+			limit: the upper limit for the number of data points returned per poll
+			interval: the initial number of seconds between polls
+			seenLimit: how many data point ids to remember when filtering out old posts
+
+		Returns:
+			An instance of the Subscription class
+		"""
+		self.platform = platform
+		self.source = source
+		self.term = term
+		self.limit = limit
+		self.interval = interval
+		self.seenLimit = seenLimit
+		self.seen = OrderedDict()
+		self.velocity = None
+		self.polls = 0
+		self.lastPoll = None
+		self.nextPoll = None
+		self.active = True
+		self.errors = SocialError()
+
+	def key(self) -> tuple:
+		"""
+		Summary:
+			The identity of the subscription
+
+		Args:
+			None
+
+		Returns:
+			A tuple of platform, source and term
+		"""
+		return (self.platform, self.source, self.term)
+
+	def task(self) -> dict:
+		"""
+		Summary:
+			Describes the subscription in the form sinks expect
+
+		Args:
+			None
+
+		Returns:
+			A dictionary with the keys platform, source and term
+		"""
+		return {"platform": self.platform, "source": self.source, "term": self.term}
+
+	def filter_new(self, records: list) -> list:
+		"""
+		Summary:
+			Drops records that were returned by an earlier poll. The new records are not
+			remembered until remember is called, so records that could not be written are
+			returned again by the next poll.
+
+		Args:
+			records: a list of parsed data points
+
+		Returns:
+			The data points whose ids have not been seen before
+		"""
+		newRecords, ids = [], set()
+		for record in records:
+			if not isinstance(record, dict) or "id" not in record:
+				continue
+			if record["id"] in self.seen or record["id"] in ids:
+				continue
+			ids.add(record["id"])
+			newRecords.append(record)
+		return newRecords
+
+	def remember(self, records: list):
+		"""
+		Summary:
+			Remembers the ids of records so later polls drop them
+
+		Args:
+			records: a list of parsed data points
+
+		Returns:
+			None
+		"""
+		for record in records:
+			self.seen[record["id"]] = True
+		while len(self.seen) > self.seenLimit:
+			self.seen.popitem(last=False)
+
+	def add_errors(self, records: list):
+		"""
+		Summary:
+			Collects the error entries clients append to their results. Only the latest
+			maxErrors errors are kept.
+
+		Args:
+			records: a list of parsed data points and error entries
+
+		Returns:
+			None
+		"""
+		for entry in records:
+			if not isinstance(entry, list):
+				continue
+			for item in entry:
+				if isinstance(item, dict) and "error(s)" in item:
+					errors = item["error(s)"]
+					self.errors.errorInfo.extend(errors if isinstance(errors, list) else [errors])
+		del self.errors.errorInfo[:-self.maxErrors]
+
+class SourceMonitor(object):
+
+	"""
+	Summary:
+		Long running monitor that re-polls a set of subscriptions and writes new data points to
+		a sink. The interval of every subscription follows the rate at which it produces new
+		posts: the monitor keeps an exponentially weighted average of new posts per second and
+		polls again when about targetNew posts are expected. Subscriptions that return nothing
+		back off until they reach maxInterval.
+	"""
+
+	def __init__(self, clients: list, sink: object, minInterval: float = 60, maxInterval: float = 86400, initialInterval: float = 900,
+			targetNew: float = 5, smoothing: float = 0.3, backoff: float = 2, seenLimit: int = 1000, clock: object = time.time):
+		"""
+		Summary:
+			Initializes an instance of SourceMonitor
+
+		Args:
+			clients: a list of client instances, for example OpenSocial().clients
+			sink: an instance of JsonLinesSink, MemorySink or another AbstractSink
+			minInterval: (optional) the shortest number of seconds between polls of a subscription
+			maxInterval: (optional) the longest number of seconds between polls of a subscription
+			initialInterval: (optional) the interval used until a subscription has a velocity
+			targetNew: (optional) the number of new posts a poll should find on average
+			smoothing: (optional) the weight of the latest poll in the velocity average
+			backoff: (optional) the factor the interval grows by after a poll finds nothing new
+			seenLimit: (optional) how many data point ids each subscription remembers
+			clock: (optional) a function returning the current time in seconds
+
+		Returns:
+			An instance of the SourceMonitor class
+		"""
+		self.clients = {client.platform: client for client in clients if client is not None}
+		self.sink = sink
+		self.minInterval = minInterval
+		self.maxInterval = maxInterval
+		self.initialInterval = initialInterval
+		self.targetNew = targetNew
+		self.smoothing = smoothing
+		self.backoff = backoff
+		self.seenLimit = seenLimit
+		self.clock = clock
+		self.lock = threading.Lock()
+		self.subscriptions = {}
+		self.schedule = []
+		self.counter = itertools.count()
+
+	def subscribe(self, platform: str, source: str, term: str, limit: int = 25) -> Subscription:
+		"""
+		Summary:
+			Registers a subscription. The first poll is due immediately.
+
+		Args:
+			platform: the name of the platform to poll
+			source: the page, user, subreddit or blog to poll. None for twitter.
+			term: the search term to match against
+			limit: (optional) the upper limit for the number of data points returned per poll
+
+		Returns:
+			The Subscription instance
+		"""
+		with self.lock:
+			subscription = Subscription(platform, source, term, limit, self.initialInterval, self.seenLimit)
+			if subscription.key() in self.subscriptions:
+				return self.subscriptions[subscription.key()]
+			self.subscriptions[subscription.key()] = subscription
+			self.push(subscription, self.clock())
+			return subscription
+
+	def unsubscribe(self, platform: str, source: str, term: str):
+		"""
+		Summary:
+			Removes a subscription. It is skipped when its next poll comes due.
+
+		Args:
+			platform: the name of the platform
+			source: the page, user, subreddit or blog
+			term: the search term
+
+		Returns:
+			None
+		"""
+		with self.lock:
+			subscription = self.subscriptions.pop((platform, source, term), None)
+			if subscription is not None:
+				subscription.active = False
+
+	def push(self, subscription: Subscription, dueAt: float):
+		"""
+		Summary:
+			Schedules the next poll of a subscription. Must be called while holding self.lock.
+
+		Args:
+			subscription: the Subscription to schedule
+			dueAt: the time the poll is due
+
+		Returns:
+			None
+		"""
+		subscription.nextPoll = dueAt
+		heapq.heappush(self.schedule, (dueAt, next(self.counter), subscription))
+
+	def poll(self, subscription: Subscription) -> list:
+		"""
+		Summary:
+			Runs one search for a subscription, writes new data points to the sink, and
+			reschedules the subscription according to its updated velocity. Errors raised by
+			the search or the sink, and error entries in the results, are recorded on the
+			subscription and the poll counts as finding nothing new. The subscription is
+			rescheduled either way.
+
+		Args:
+			subscription: the Subscription to poll
+
+		Returns:
+			A list of the new data points
+		"""
+		now = self.clock()
+		newRecords = []
+		try:
+			records = self.search(subscription)
+			subscription.add_errors(records)
+			newRecords = subscription.filter_new(records)
+			if newRecords:
+				self.sink.write(subscription.task(), newRecords)
+				subscription.remember(newRecords)
+		except:
+			etype, value, tb = sys.exc_info()
+			subscription.errors.add_error(etype, value, tb)
+			newRecords = []
+		finally:
+			self.update_interval(subscription, len(newRecords), now)
+			subscription.polls += 1
+			subscription.lastPoll = now
+			with self.lock:
+				if subscription.active:
+					self.push(subscription, now + subscription.interval)
+		return newRecords
+
+	def search(self, subscription: Subscription) -> list:
+		"""
+		Summary:
+			Runs the search for a subscription with the monitor's client for its platform
+
+		Args:
+			subscription: the Subscription to search for
+
+		Returns:
+			A list of parsed data points
+		"""
+		client = self.clients[subscription.platform]
+		if client.sourceKey is None:
+			return client.search(subscription.term, subscription.limit)
+		return client.search(subscription.term, [subscription.source], subscription.limit)
+
+	def update_interval(self, subscription: Subscription, newCount: int, now: float):
+		"""
+		Summary:
+			Updates the velocity of a subscription and derives its next interval. The first poll
+			only establishes a baseline, since posts found then may have built up over any span
+			of time.
+
+		Args:
+			subscription: the Subscription that was polled
+			newCount: the number of new data points found by the poll
+			now: the time the poll started
+
+		Returns:
+			None
+		"""
+		if subscription.lastPoll is None:
+			return
+		elapsed = max(now - subscription.lastPoll, 1e-6)
+		rate = newCount / elapsed
+		if subscription.velocity is None:
+			subscription.velocity = rate
+		else:
+			subscription.velocity = self.smoothing * rate + (1 - self.smoothing) * subscription.velocity
+		if newCount == 0 or subscription.velocity <= 0:
+			interval = subscription.interval * self.backoff
+		else:
+			interval = self.targetNew / subscription.velocity
+			if newCount >= subscription.limit:
+				# the poll was truncated, so the real rate is higher than measured
+				interval = min(interval, subscription.interval / self.backoff)
+		subscription.interval = min(max(interval, self.minInterval), self.maxInterval)
+
+	def next_due(self) -> Subscription:
+		"""
+		Summary:
+			Finds the subscription with the earliest scheduled poll, dropping entries of
+			subscriptions that were removed or rescheduled.
+
+		Args:
+			None
+
+		Returns:
+			The next Subscription to poll, or None if nothing is scheduled
+		"""
+		with self.lock:
+			while self.schedule:
+				dueAt, _, subscription = self.schedule[0]
+				if subscription.active and dueAt == subscription.nextPoll:
+					return subscription
+				heapq.heappop(self.schedule)
+			return None
+
+	def run(self, stopEvent: threading.Event = None, maxPolls: int = None, tick: float = 1.0) -> int:
+		"""
+		Summary:
+			Polls subscriptions as they come due until stopEvent is set, maxPolls polls have
+			run, or there are no subscriptions left.
+
+		Args:
+			stopEvent: (optional) an event that stops the monitor
+			maxPolls: (optional) the maximum number of polls to run
+			tick: (optional) the longest number of seconds to sleep before checking the
+				  schedule again, so subscriptions added while sleeping are picked up
+
+		Returns:
+			The number of polls run
+		"""
+		stopEvent = stopEvent or threading.Event()
+		pollCount = 0
+		while not stopEvent.is_set() and (maxPolls is None or pollCount < maxPolls):
+			subscription = self.next_due()
+			if subscription is None:
+				break
+			delay = subscription.nextPoll - self.clock()
+			if delay > 0:
+				stopEvent.wait(min(delay, tick))
+				continue
+			with self.lock:
+				heapq.heappop(self.schedule)
+			self.poll(subscription)
+			pollCount += 1
+		return pollCount
+
+	def report(self) -> list:
+		"""
+		Summary:
+			Summarizes every subscription
+
+		Args:
+			None
+
+		Returns:
+			A list of dictionaries with the polling statistics of each subscription
+		"""
+		with self.lock:
+			return [{
+				"platform": subscription.platform,
+				"source": subscription.source,
+				"term": subscription.term,
+				"interval": subscription.interval,
+				"velocity": subscription.velocity,
+				"polls": subscription.polls,
+				"next_poll": subscription.nextPoll,
+				"errors": subscription.errors.errorInfo
+			} for subscription in self.subscriptions.values()]
@@ -0,0 +1,209 @@
+from .lazy import resolve
+from datetime import datetime, timezone
+import json
+
+timeFormats = [
+	"%a %b %d %H:%M:%S %z %Y",	# twitter
+	"%Y-%m-%dT%H:%M:%S%z",		# facebook
+	"%Y-%m-%d %H:%M:%S GMT",	# tumblr
+	"%Y-%m-%d %H:%M:%S"
+]
+
+def parse_time(value: object) -> float:
+	"""
+	Summary:
+		Converts the timestamps used by the different platforms to seconds since the epoch
+
+	Args:
+		value: an epoch number or a date string in one of the platform formats
+
+	Returns:
+		Seconds since the epoch, or None if the value can not be parsed
+	"""
+	if value is None or isinstance(value, bool):
+		return None
+	if isinstance(value, (int, float)):
+		return float(value)
+	for timeFormat in timeFormats:
+		try:
+			parsed = datetime.strptime(value, timeFormat)
+		except (TypeError, ValueError):
+			continue
+		# every platform reports naive times in utc
+		return (parsed if parsed.tzinfo is not None else parsed.replace(tzinfo=timezone.utc)).timestamp()
+	return None
+
+def post_row(platform: str, postId: object, source: str, authorId: object, text: str, createdAt: object, url: str, term: str, record: dict) -> dict:
+	"""
+	Summary:
+		Builds the columns of a row of the posts table
+	"""
+	return {
+		"platform": platform,
+		"post_id": str(postId),
+		"source": source,
+		"author_id": None if authorId is None else str(authorId),
+		"text": text or "",
+		"created_at": parse_time(createdAt),
+		"url": url,
+		"term": term,
+		"raw": json.dumps(record, default=str)
+	}
+
+def author_row(platform: str, authorId: object, name: str, displayName: str = None, extra: dict = None) -> dict:
+	"""
+	Summary:
+		Builds the columns of a row of the authors table
+	"""
+	return {
+		"platform": platform,
+		"author_id": str(authorId),
+		"name": name,
+		"display_name": displayName,
+		"extra": json.dumps(extra or {}, default=str)
+	}
+
+def comment_row(platform: str, postId: object, commentId: object, parentId: object, authorId: object, text: str, createdAt: object) -> dict:
+	"""
+	Summary:
+		Builds the columns of a row of the comments table
+	"""
+	return {
+		"platform": platform,
+		"comment_id": str(commentId),
+		"post_id": str(postId),
+		"parent_id": None if parentId is None else str(parentId),
+		"author_id": None if authorId is None else str(authorId),
+		"text": text or "",
+		"created_at": parse_time(createdAt)
+	}
+
+# one normalizer per platform, each returning (post, authors, comments) for normalize_record
+def normalize_twitter(record: dict, source: str, term: str) -> (dict, list, list):
+	author = author_row("twitter", record["user_id"], record["user_screen_name"], record.get("user_name"), {
+		"followers_count": record.get("user_followers_count"),
+		"friends_count": record.get("user_friends_count"),
+		"statuses_count": record.get("user_statuses_count"),
+		"location": record.get("user_location")})
+	url = record.get("tweet_url") if record.get("tweet_url") != "no tweet url" else None
+	post = post_row("twitter", record["id"], source, record["user_id"], record["text"], record.get("created_at"), url, term, record)
+	return post, [author], []
+
+def normalize_reddit(record: dict, source: str, term: str) -> (dict, list, list):
+	authors = [author_row("reddit", record["user_screen_name"], record["user_screen_name"], None, {
+		"link_karma": record.get("user_link_karma"),
+		"comment_karma": record.get("user_comment_karma"),
+		"created_at": record.get("user_created_at")})]
+	url = "https://www.reddit.com" + record["permalink"] if record.get("permalink") else record.get("url")
+	post = post_row("reddit", record["id"], source or record.get("subreddit_name"), record["user_screen_name"], record["title"], record.get("created_utc"), url, term, record)
+	comments = []
+	for index, comment in enumerate(record.get("secondary_information", {}).get("comments", [])):
+		authorName = comment.get("user_screen_name")
+		if authorName is not None:
+			authors.append(author_row("reddit", authorName, authorName))
+		commentId = comment.get("id", "{post}:{index}".format(post=record["id"], index=index))
+		comments.append(comment_row("reddit", record["id"], commentId, comment.get("parent_id"), authorName, comment.get("body"), comment.get("created_utc")))
+	return post, authors, comments
+
+def normalize_instagram(record: dict, source: str, term: str) -> (dict, list, list):
+	authors = [author_row("instagram", source, source)] if source is not None else []
+	post = post_row("instagram", record["id"], source, source, record.get("caption"), record.get("date"), None, term, record)
+	comments = []
+	for comment in record.get("secondary_information", {}).get("comments", []):
+		authors.append(author_row("instagram", comment["owner_id"], comment["owner_username"], comment.get("full_name")))
+		comments.append(comment_row("instagram", record["id"], comment["id"], None, comment["owner_id"], comment["text"], comment.get("time")))
+	return post, authors, comments
+
+def normalize_facebook(record: dict, source: str, term: str) -> (dict, list, list):
+	authors = [author_row("facebook", source, source)] if source is not None else []
+	text = "\n".join([record[key] for key in ["name", "message"] if record.get(key)])
+	post = post_row("facebook", record["id"], source, source, text, record.get("created_time"), record.get("permalink_url"), term, record)
+	rawComments = record.get("secondary_information", {}).get("comments", [])
+	rawComments = rawComments.get("data", []) if isinstance(rawComments, dict) else rawComments
+	comments = []
+	for comment in rawComments:
+		author = comment.get("from") or {}
+		if "id" in author:
+			authors.append(author_row("facebook", author["id"], author.get("name")))
+		comments.append(comment_row("facebook", record["id"], comment["id"], (comment.get("parent") or {}).get("id"), author.get("id"), comment.get("message"), comment.get("created_time")))
+	return post, authors, comments
+
+def normalize_tumblr(record: dict, source: str, term: str) -> (dict, list, list):
+	authors = [author_row("tumblr", record["blog_name"], record["blog_name"])]
+	post = post_row("tumblr", record["id"], source or record["blog_name"], record["blog_name"], record.get("summary"), record.get("date"), record.get("post_url"), term, record)
+	comments = []
+	for index, note in enumerate(record.get("notes", [])):
+		text = note.get("added_text") or note.get("reply_text")
+		if not text:
+			continue
+		if note.get("blog_name"):
+			authors.append(author_row("tumblr", note["blog_name"], note["blog_name"]))
+		noteId = note.get("post_id", "{post}:{index}".format(post=record["id"], index=index))
+		comments.append(comment_row("tumblr", record["id"], noteId, None, note.get("blog_name"), text, note.get("timestamp")))
+	return post, authors, comments
+
+normalizers = {
+	"facebook": normalize_facebook,
+	"instagram": normalize_instagram,
+	"reddit": normalize_reddit,
+	"tumblr": normalize_tumblr,
+	"twitter": normalize_twitter
+}
+
+def normalize_record(platform: str, record: dict, source: str = None, term: str = None) -> (dict, list, list):
+	"""
+	Summary:
+		Splits a parsed data point into a post row, the rows of every author it mentions and the
+		rows of its comments (reddit comments, instagram and facebook comments, tumblr reblog
+		and reply notes). Posts without an explicit author (facebook pages, instagram users)
+		are attributed to the source they were crawled from.
+
+	Args:
+		platform: the name of the platform the record came from
+		record: a data point returned by the platform client's parse function
+		source: (optional) the page, user, subreddit or blog the record was crawled from
+		term: (optional) the search term the record matched
+
+	Returns:
+		post: a dictionary of post columns
+		authors: a list of dictionaries of author columns
+		comments: a list of dictionaries of comment columns
+	"""
+	return normalizers[platform](resolve(record), source, term)
+
+# the field holding the creation time of a post on each platform
+timeFields = {
+	"facebook": "created_time",
+	"instagram": "date",
+	"reddit": "created_utc",
+	"tumblr": "date",
+	"twitter": "created_at"
+}
+
+def created_at(platform: str, record: dict) -> float:
+	"""
+	Summary:
+		Reads the creation time of a parsed data point without normalizing the rest of it
+
+	Args:
+		platform: the name of the platform the record came from
+		record: a data point returned by the platform client's parse function
+
+	Returns:
+		Seconds since the epoch, or None if the record has no parsable time
+	"""
+	return parse_time(record.get(timeFields[platform]))
+
+def is_record(record: object) -> bool:
+	"""
+	Summary:
+		Checks whether an item of a search result is a data point rather than the error entry
+		that search functions append
+
+	Args:
+		record: an item of a search result list
+
+	Returns:
+		True if the item is a data point
+	"""
+	return isinstance(record, dict) and "id" in record
@@ -0,0 +1,436 @@
+from .social_error import SocialError
+import queue, sys, threading, time
+
+class Stage(object):
+
+	"""
+	Summary:
+		One step of a Pipeline. A stage runs its function on every item taken from its input
+		queue with its own number of worker threads and puts whatever the function returns on
+		the queue of the next stage. Functions may return a single item, None to drop the item,
+		or a generator to turn one item into many. Items are put with blocking calls on bounded
+		queues, so a slow stage makes the stages before it wait instead of growing memory.
+	"""
+
+	def __init__(self, name: str, function: object, workers: int = 1, queueSize: int = 100, many: bool = False, limit: int = None, close: object = None):
+		"""
+		Summary:
+			Initializes an instance of Stage
+
+		Args:
+			name: the name used in reports
+			function: a function that takes an item and returns the item to pass on, or None
+			workers: (optional) the number of threads running the function
+			queueSize: (optional) the maximum number of items waiting for this stage
+			many: (optional) the function returns an iterable of items to pass on
+			limit: (optional) the maximum number of items this stage passes on. Once it is
+				   reached this stage and every earlier stage stop taking input.
+			close: (optional) a function called once after the last item was processed, for
+				   example to flush buffered results
+
+		Returns:
+			An instance of the Stage class
+		"""
+		self.name = name
+		self.function = function
+		self.workers = workers
+		self.queue = queue.Queue(maxsize=queueSize)
+		self.many = many
+		self.limit = limit
+		self.close = close
+		self.lock = threading.Lock()
+		self.stopEvent = threading.Event()
+		self.running = 0
+		self.stats = {"in": 0, "out": 0, "dropped": 0, "errors": 0, "busy": 0.0}
+		self.errors = SocialError()
+
+	def admit(self) -> (bool, bool):
+		"""
+		Summary:
+			Counts an item this stage passes on
+
+		Args:
+			None
+
+		Returns:
+			admitted: False if the stage already passed on limit items
+			full: True if the stage has now passed on limit items
+		"""
+		with self.lock:
+			if self.limit is not None and self.stats["out"] >= self.limit:
+				return False, True
+			self.stats["out"] += 1
+			return True, self.limit is not None and self.stats["out"] >= self.limit
+
+	def report(self, elapsed: float) -> dict:
+		"""
+		Summary:
+			Summarizes the stage
+
+		Args:
+			elapsed: the number of seconds the pipeline has been running
+
+		Returns:
+			A dictionary with the queue depth, counts, utilization and throughput of the stage
+		"""
+		with self.lock:
+			payload = dict(self.stats)
+		payload["name"] = self.name
+		payload["workers"] = self.workers
+		payload["queued"] = self.queue.qsize()
+		payload["utilization"] = payload["busy"] / (elapsed * self.workers) if elapsed else 0.0
+		payload["throughput"] = payload["out"] / elapsed if elapsed else 0.0
+		return payload
+
+class Pipeline(object):
+
+	"""
+	Summary:
+		Runs a chain of stages connected by bounded queues. Each stage has its own thread
+		pool, so slow network stages can be given more workers than cheap filters, and memory
+		stays bounded by the queue sizes however many items flow through. The last stage's
+		outputs are discarded, so it should be the one that stores results. Stopped stages
+		keep draining their queues without processing items, so no put blocks forever.
+	"""
+
+	done = object()
+
+	def __init__(self, stages: list):
+		"""
+		Summary:
+			Initializes an instance of Pipeline
+
+		Args:
+			stages: a list of Stage instances in the order items flow through them
+
+		Returns:
+			An instance of the Pipeline class
+		"""
+		self.stages = stages
+		self.threads = []
+		self.started = None
+		self.finished = None
+
+	def put(self, index: int, item: object):
+		"""
+		Summary:
+			Puts an item on the queue of a stage, blocking while the queue is full
+
+		Args:
+			index: the index of the receiving stage
+			item: the item, or Pipeline.done
+
+		Returns:
+			None
+		"""
+		self.stages[index].queue.put(item)
+
+	def emit(self, index: int, output: object) -> bool:
+		"""
+		Summary:
+			Passes an output of a stage on to the next stage. Outputs of the last stage are
+			discarded.
+
+		Args:
+			index: the index of the stage that produced the output
+			output: the output
+
+		Returns:
+			False if the stage should stop producing outputs
+		"""
+		stage = self.stages[index]
+		if output is None:
+			return True
+		admitted, full = stage.admit()
+		if full:
+			self.stop_before(index + 1)
+		if not admitted:
+			return False
+		if index + 1 < len(self.stages):
+			self.put(index + 1, output)
+		return not full
+
+	def stop_before(self, index: int):
+		"""
+		Summary:
+			Stops every stage before an index, for example once a stage passed on its limit
+
+		Args:
+			index: the index of the first stage that keeps running
+
+		Returns:
+			None
+		"""
+		for stage in self.stages[:index]:
+			stage.stopEvent.set()
+
+	def work(self, index: int):
+		"""
+		Summary:
+			Body of a worker thread of a stage. The last worker of a stage to finish tells the
+			next stage there is no more input.
+
+		Args:
+			index: the index of the stage
+
+		Returns:
+			None
+		"""
+		stage = self.stages[index]
+		while True:
+			item = stage.queue.get()
+			if item is self.done:
+				break
+			if stage.stopEvent.is_set():
+				with stage.lock:
+					stage.stats["dropped"] += 1
+				continue
+			started = time.monotonic()
+			with stage.lock:
+				stage.stats["in"] += 1
+			try:
+				if stage.many:
+					for output in stage.function(item):
+						if stage.stopEvent.is_set() or not self.emit(index, output):
+							break
+				else:
+					self.emit(index, stage.function(item))
+			except:
+				etype, value, tb = sys.exc_info()
+				with stage.lock:
+					stage.stats["errors"] += 1
+					stage.errors.add_error(etype, value, tb)
+			with stage.lock:
+				stage.stats["busy"] += time.monotonic() - started
+		with stage.lock:
+			stage.running -= 1
+			last = stage.running == 0
+		if last and stage.close is not None:
+			try:
+				stage.close()
+			except:
+				etype, value, tb = sys.exc_info()
+				stage.errors.add_error(etype, value, tb)
+		if last and index + 1 < len(self.stages):
+			for _ in range(self.stages[index + 1].workers):
+				self.put(index + 1, self.done)
+
+	def start(self, items: object):
+		"""
+		Summary:
+			Starts every stage and feeds items to the first one from a background thread
+
+		Args:
+			items: an iterable of inputs for the first stage
+
+		Returns:
+			None
+		"""
+		self.started = time.monotonic()
+		for index, stage in enumerate(self.stages):
+			stage.running = stage.workers
+			for _ in range(stage.workers):
+				thread = threading.Thread(target=self.work, args=(index,), daemon=True)
+				thread.start()
+				self.threads.append(thread)
+		feeder = threading.Thread(target=self.feed, args=(items,), daemon=True)
+		feeder.start()
+		self.threads.append(feeder)
+
+	def feed(self, items: object):
+		"""
+		Summary:
+			Body of the feeder thread
+
+		Args:
+			items: an iterable of inputs for the first stage
+
+		Returns:
+			None
+		"""
+		for item in items:
+			if self.stages[0].stopEvent.is_set():
+				break
+			self.put(0, item)
+		for _ in range(self.stages[0].workers):
+			self.put(0, self.done)
+
+	def join(self, timeout: float = None) -> bool:
+		"""
+		Summary:
+			Waits for every stage to finish
+
+		Args:
+			timeout: (optional) the longest number of seconds to wait
+
+		Returns:
+			True if the pipeline finished
+		"""
+		deadline = None if timeout is None else time.monotonic() + timeout
+		for thread in self.threads:
+			thread.join(None if deadline is None else max(deadline - time.monotonic(), 0))
+			if thread.is_alive():
+				return False
+		if self.finished is None:
+			self.finished = time.monotonic()
+		return True
+
+	def stop(self):
+		"""
+		Summary:
+			Stops every stage. Items already queued are dropped.
+
+		Args:
+			None
+
+		Returns:
+			None
+		"""
+		self.stop_before(len(self.stages))
+
+	def run(self, items: object) -> list:
+		"""
+		Summary:
+			Runs the pipeline over items and waits for it to finish
+
+		Args:
+			items: an iterable of inputs for the first stage
+
+		Returns:
+			The report of every stage
+		"""
+		self.start(items)
+		self.join()
+		return self.report()
+
+	def report(self) -> list:
+		"""
+		Summary:
+			Summarizes every stage. Can be called while the pipeline is running to watch queue
+			depths and throughput.
+
+		Args:
+			None
+
+		Returns:
+			A list of stage reports in pipeline order
+		"""
+		if self.started is None:
+			return []
+		elapsed = (self.finished or time.monotonic()) - self.started
+		return [stage.report(elapsed) for stage in self.stages]
+
+def iter_pages(client: object, source: str, maxPages: int = None):
+	"""
+	Summary:
+		Pages through a source with the get_page / update_page protocol of AbstractSocialClient
+
+	Args:
+		client: a client implementing get_page and update_page
+		source: the page, user, subreddit, blog or query to page through
+		maxPages: (optional) the maximum number of pages fetched. Unbounded by default.
+
+	Returns:
+		A generator of (source, datum) tuples
+	"""
+	dataPage, nextPageLink = client.get_page(source)
+	pages = 1
+	while True:
+		for datum in dataPage:
+			yield (source, datum)
+		if not dataPage or (maxPages is not None and pages >= maxPages) or not nextPageLink or None in nextPageLink:
+			return
+		try:
+			dataPage, nextPageLink = client.update_page(nextPageLink)
+		except KeyError:
+			# the api response has no link to another page
+			return
+		pages += 1
+
+def record_key(datum: object) -> object:
+	"""
+	Summary:
+		The identity of a raw data point, used to drop duplicates
+
+	Args:
+		datum: a raw data point returned by get_page or update_page
+
+	Returns:
+		The id of the data point
+	"""
+	return datum["id"] if isinstance(datum, dict) else getattr(datum, "id", id(datum))
+
+def crawl_pipeline(client: object, searchTerm: str, sources: list, limit: int, sink: object, fetchWorkers: int = 4, matchWorkers: int = 1,
+		enrichWorkers: int = 8, queueSize: int = 100, maxPages: int = None, batchSize: int = 50) -> Pipeline:
+	"""
+	Summary:
+		Builds the fetch -> match -> dedupe -> enrich -> sink pipeline for a client that
+		implements get_page, update_page, match and parse. Fetching pages, matching and
+		parsing with secondary information run concurrently, deduplication stops the crawl
+		once limit data points are admitted so no secondary information is requested beyond
+		the limit, and parsed data points are written to the sink in batches as they arrive.
+
+	Args:
+		client: a client implementing the AbstractSocialClient protocol
+		searchTerm: the term to match against
+		sources: the pages, users, subreddits or blogs to crawl
+		limit: the upper limit for the number of data points written
+		sink: an instance of JsonLinesSink, ResultStore or another AbstractSink
+		fetchWorkers: (optional) the number of sources paged through at once
+		matchWorkers: (optional) the number of threads matching data points
+		enrichWorkers: (optional) the number of data points parsed at once. Clients whose api
+					   object is not thread safe (hedgeable is False, like InstagramClient)
+					   fetch and parse on one thread each.
+		queueSize: (optional) the capacity of every queue between stages
+		maxPages: (optional) the maximum number of pages fetched per source. Unbounded by
+				  default.
+		batchSize: (optional) the number of data points written to the sink at once
+
+	Returns:
+		An unstarted Pipeline. Call run(sources) to crawl and report() to inspect it.
+	"""
+	searchTerm = searchTerm.lower()
+	if not getattr(client, "hedgeable", True):
+		fetchWorkers, enrichWorkers = 1, 1
+	seen, seenLock = set(), threading.Lock()
+	batches, batchLock = {}, threading.Lock()
+
+	def match(item: tuple) -> tuple:
+		return item if client.match(searchTerm, item[1]) else None
+
+	def dedupe(item: tuple) -> tuple:
+		key = record_key(item[1])
+		with seenLock:
+			if key in seen:
+				return None
+			seen.add(key)
+		return item
+
+	def enrich(item: tuple) -> tuple:
+		return (item[0], client.parse(item[1]))
+
+	def write(item: tuple):
+		source, record = item
+		with batchLock:
+			batch = batches.setdefault(source, [])
+			batch.append(record)
+			if len(batch) < batchSize:
+				return None
+			batches[source] = []
+		sink.write({"platform": client.platform, "source": source, "term": searchTerm}, batch)
+
+	def flush():
+		with batchLock:
+			pending = [(source, batch) for source, batch in batches.items() if batch]
+			batches.clear()
+		for source, batch in pending:
+			sink.write({"platform": client.platform, "source": source, "term": searchTerm}, batch)
+
+	pipeline = Pipeline([
+		Stage("fetch", lambda source: iter_pages(client, source, maxPages), workers=fetchWorkers, queueSize=max(len(sources), 1), many=True),
+		Stage("match", match, workers=matchWorkers, queueSize=queueSize),
+		Stage("dedupe", dedupe, queueSize=queueSize, limit=limit),
+		Stage("enrich", enrich, workers=enrichWorkers, queueSize=queueSize),
+		Stage("sink", write, queueSize=queueSize, close=flush)
+	])
+	return pipeline
@@ -0,0 +1,174 @@
+from .deadline import activated, partial_flag
+from .lazy import resolve
+from .social_error import SocialError
+import concurrent.futures, inspect, json, os, sys, zlib
+
+class PicklableClient(object):
+
+	"""
+	Summary:
+		Mixin that makes a social client picklable. The wrapped api objects (sessions, oauth
+		handlers, cookie jars) can not be serialized, so the client is pickled as its class and
+		the configuration it was created with, and rebuilt from that configuration in the
+		receiving process. Clients that use this mixin must store their constructor arguments
+		in self.config.
+	"""
+
+	def __reduce__(self):
+		"""
+		Summary:
+			Tells pickle to rebuild the client from its class and configuration
+
+		Args:
+			None
+
+		Returns:
+			A tuple of the rebuild function and its arguments
+		"""
+		return (rebuild_client, (self.__class__, self.config))
+
+def rebuild_client(clientClass: type, config: dict) -> object:
+	"""
+	Summary:
+		Creates a new client from its class and configuration. Used when a client is
+		unpickled in a worker process.
+
+	Args:
+		clientClass: the class of the client
+		config: the keyword arguments the client was created with
+
+	Returns:
+		A new instance of clientClass
+	"""
+	return clientClass(**config)
+
+def encode_batch(data: list) -> bytes:
+	"""
+	Summary:
+		Serializes a list of parsed data points to compressed json so that results travel
+		between processes as one compact batch instead of many pickled dictionaries.
+
+	Args:
+		data: a list of parsed data points
+
+	Returns:
+		The compressed batch
+	"""
+	return zlib.compress(json.dumps(resolve(data), default=str, separators=(",", ":")).encode("utf-8"))
+
+def decode_batch(batch: bytes) -> list:
+	"""
+	Summary:
+		Deserializes a batch created by encode_batch
+
+	Args:
+		batch: the compressed batch
+
+	Returns:
+		A list of parsed data points
+	"""
+	return json.loads(zlib.decompress(batch).decode("utf-8"))
+
+def crawl_options(client: object, options: dict) -> dict:
+	"""
+	Summary:
+		Keeps the crawl options a client's search accepts. Clients that do not crawl with the
+		crawl planner, like RedditClient, take no maxPages or maxRequests.
+
+	Args:
+		client: an instance of FacebookClient, InstagramClient, RedditClient, or TumblrClient
+		options: crawl options, like maxPages and maxRequests
+
+	Returns:
+		The options accepted by client.search
+	"""
+	parameters = inspect.signature(client.search).parameters
+	return {key: value for key, value in options.items() if key in parameters}
+
+def search_client(client: object, searchTerm: str, limit: int, kwargs: dict, deadline: object = None) -> (str, bytes):
+	"""
+	Summary:
+		Runs a search for a single client. This is the unit of work submitted to a process pool
+		by OpenSocial.evaluate_all_clients, so it only uses information carried by the client.
+
+	Args:
+		client: an instance of FacebookClient, InstagramClient, RedditClient, TumblrClient, or
+				TwitterClient
+		searchTerm: the term to filter data on
+		limit: the upper limit for the number of datapoints returned by the search
+		kwargs: the source lists for all client types (pages, relevantUsers, subReddits, blogs)
+				and optional crawl bounds (maxPages, maxRequests)
+		deadline: (optional) an instance of Deadline activated while the client searches. Only
+				  its time reaches the worker process, so cancelling it in the parent does not.
+
+	Returns:
+		platform: the name of the client's platform
+		batch: the encoded list of parsed data points
+	"""
+	with activated(deadline):
+		try:
+			if client.sourceKey is None:
+				data = client.search(searchTerm, limit)
+			else:
+				crawlOptions = {key: kwargs[key] for key in ["maxPages", "maxRequests"] if key in kwargs.keys()}
+				data = client.search(searchTerm, kwargs[client.sourceKey], limit, **crawl_options(client, crawlOptions))
+		except:
+			etype, value, tb = sys.exc_info()
+			error = SocialError()
+			error.add_error(etype, value, tb)
+			data = [[{"error(s)": error.errorInfo}]]
+	if deadline is not None and deadline.is_partial(client.platform):
+		data.append(partial_flag())
+	return client.platform, encode_batch(data)
+
+def search_sources(client: object, searchTerm: str, sources: list, limit: int, maxWorkers: int = None, **crawlOptions) -> list:
+	"""
+	Summary:
+		Splits a crawl over many sources across a process pool. Sources are dealt round robin
+		into one group per worker, every group gets a share of limit proportional to its size,
+		and each worker runs a budgeted crawl over its group so quiet sources still hand their
+		quota to productive sources in the same group.
+
+	Args:
+		client: an instance of FacebookClient, InstagramClient, or TumblrClient
+		searchTerm: the term to filter data on
+		sources: a list of sources to search over
+		limit: the upper limit for the count of data points returned by the search
+		maxWorkers: (optional) the number of worker processes. Defaults to the cpu count.
+		crawlOptions: (optional) maxPages and maxRequests bounds passed to the crawl planner.
+					  Options the client's search does not accept are dropped.
+
+	Returns:
+		A list of relevant data points that has a count no greater than limit
+	"""
+	crawlOptions = crawl_options(client, crawlOptions)
+	workerCount = min(maxWorkers or os.cpu_count() or 1, len(sources), max(limit, 1))
+	if workerCount <= 1:
+		return client.search(searchTerm, sources, limit, **crawlOptions)
+	groups = [sources[i::workerCount] for i in range(workerCount)]
+	quotas = [limit * len(group) // len(sources) for group in groups]
+	for i in range(limit - sum(quotas)):
+		quotas[i] += 1
+	payload = []
+	with concurrent.futures.ProcessPoolExecutor(max_workers=workerCount) as executor:
+		futureSet = [executor.submit(search_group, client, searchTerm, group, quota, crawlOptions) for group, quota in zip(groups, quotas) if quota > 0]
+		for future in concurrent.futures.as_completed(futureSet):
+			payload.extend(decode_batch(future.result()))
+	return payload
+
+def search_group(client: object, searchTerm: str, sources: list, limit: int, crawlOptions: dict) -> bytes:
+	"""
+	Summary:
+		Runs a budgeted crawl over a group of sources inside a worker process
+
+	Args:
+		client: an instance of FacebookClient, InstagramClient, or TumblrClient
+		searchTerm: the term to filter data on
+		sources: the sources assigned to this worker
+		limit: the share of the budget assigned to this worker
+		crawlOptions: maxPages and maxRequests bounds passed to the crawl planner
+
+	Returns:
+		The encoded list of parsed data points
+	"""
+	return encode_batch(client.search(searchTerm, sources, limit, **crawlOptions))
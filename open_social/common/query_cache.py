@@ -0,0 +1,321 @@
+from .process_pool import decode_batch, encode_batch
+from collections import OrderedDict
+import concurrent.futures, contextlib, hashlib, json, sqlite3, threading, time
+
+# configuration keys of the clients that hold credentials rather than options changing results
+credentialKeys = {
+	"access_token", "username", "password", "settings", "client_id", "client_secret", "user_agent", "consumer_key",
+	"consumer_secret", "oauth_token", "oauth_secret", "app_key", "app_secret", "oauth_token_secret"
+}
+
+class QueryCache(object):
+
+	"""
+	Summary:
+		Caches search results by query: platform, search term, sources, limit and crawl
+		options. Results are kept as compressed json in an in-memory LRU and optionally in a
+		SQLite file shared by processes. Fresh results are returned as they are, results up to
+		staleTtl seconds past their ttl are returned while a background refresh replaces them,
+		and identical queries that miss at the same time under the same deadline share one
+		search. Results holding an error or partial entry are returned but not cached.
+	"""
+
+	def __init__(self, ttl: float = 300, staleTtl: float = 300, maxEntries: int = 256, path: str = None, workers: int = 2,
+			clock: object = time.time):
+		"""
+		Summary:
+			Initializes an instance of QueryCache
+
+		Args:
+			ttl: (optional) the number of seconds results are fresh
+			staleTtl: (optional) the number of seconds after ttl during which stale results are
+					  returned while they are refreshed
+			maxEntries: (optional) the number of results kept in memory
+			path: (optional) the path of a SQLite database used as the disk tier. None keeps
+				  results in memory only.
+			workers: (optional) the number of threads refreshing stale results
+			clock: (optional) a function returning the current time in seconds
+
+		Returns:
+			An instance of the QueryCache class
+		"""
+		self.ttl = ttl
+		self.staleTtl = staleTtl
+		self.maxEntries = maxEntries
+		self.path = path
+		self.clock = clock
+		self.lock = threading.Lock()
+		self.entries = OrderedDict()
+		self.inflight = {}
+		self.executor = concurrent.futures.ThreadPoolExecutor(max_workers=workers)
+		self.stats = {"hits": 0, "staleHits": 0, "misses": 0, "coalesced": 0, "refreshes": 0}
+		if self.path is not None:
+			with self.connect() as connection:
+				connection.execute("PRAGMA journal_mode=WAL")
+				connection.execute("CREATE TABLE IF NOT EXISTS query_results (key TEXT PRIMARY KEY, value BLOB NOT NULL, stored_at REAL NOT NULL)")
+
+	@contextlib.contextmanager
+	def connect(self) -> sqlite3.Connection:
+		"""
+		Summary:
+			Opens a connection to the cache database for one transaction. The transaction is
+			committed if the block succeeds and the connection is closed either way.
+
+		Args:
+			None
+
+		Returns:
+			An instance of sqlite3.Connection
+		"""
+		connection = sqlite3.connect(self.path, timeout=30)
+		try:
+			with connection:
+				yield connection
+		finally:
+			connection.close()
+
+	@staticmethod
+	def key(platform: str, searchTerm: str, sources: list = None, limit: int = None, options: dict = None) -> str:
+		"""
+		Summary:
+			Normalizes a query into a cache key. Terms and sources are case insensitive and the
+			order of sources does not matter.
+
+		Args:
+			platform: the name of the platform
+			searchTerm: the search term
+			sources: (optional) the pages, users, subreddits or blogs searched
+			limit: (optional) the upper limit for the number of results
+			options: (optional) other arguments that change the results, like maxPages and the
+					 client options returned by client_options
+
+		Returns:
+			A hex digest identifying the query
+		"""
+		query = {
+			"platform": platform,
+			"term": searchTerm.strip().lower(),
+			"sources": sorted({source.strip().lower() for source in sources}) if sources is not None else None,
+			"limit": limit,
+			"options": options or {}
+		}
+		return hashlib.sha1(json.dumps(query, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+	def get(self, key: str) -> (bytes, float):
+		"""
+		Summary:
+			Looks up a cached result in memory, then on disk
+
+		Args:
+			key: a key created by QueryCache.key
+
+		Returns:
+			batch: the compressed result, or None
+			storedAt: the time the result was stored, or None
+		"""
+		with self.lock:
+			entry = self.entries.get(key)
+			if entry is not None:
+				self.entries.move_to_end(key)
+				return entry
+		if self.path is None:
+			return None, None
+		with self.connect() as connection:
+			row = connection.execute("SELECT value, stored_at FROM query_results WHERE key = ?", (key,)).fetchone()
+		if row is None:
+			return None, None
+		self.remember(key, row[0], row[1])
+		return row[0], row[1]
+
+	def remember(self, key: str, batch: bytes, storedAt: float):
+		"""
+		Summary:
+			Stores a compressed result in memory, evicting the least recently used results
+
+		Args:
+			key: a key created by QueryCache.key
+			batch: the compressed result
+			storedAt: the time the result was stored
+
+		Returns:
+			None
+		"""
+		with self.lock:
+			self.entries[key] = (batch, storedAt)
+			self.entries.move_to_end(key)
+			while len(self.entries) > self.maxEntries:
+				self.entries.popitem(last=False)
+
+	def set(self, key: str, batch: bytes):
+		"""
+		Summary:
+			Stores a compressed result in memory and on disk, and drops expired rows from disk
+
+		Args:
+			key: a key created by QueryCache.key
+			batch: the compressed result
+
+		Returns:
+			None
+		"""
+		storedAt = self.clock()
+		self.remember(key, batch, storedAt)
+		if self.path is not None:
+			with self.connect() as connection:
+				connection.execute("INSERT OR REPLACE INTO query_results VALUES (?, ?, ?)", (key, batch, storedAt))
+				connection.execute("DELETE FROM query_results WHERE stored_at < ?", (storedAt - self.ttl - self.staleTtl,))
+
+	def invalidate(self, key: str):
+		"""
+		Summary:
+			Drops a cached result
+
+		Args:
+			key: a key created by QueryCache.key
+
+		Returns:
+			None
+		"""
+		with self.lock:
+			self.entries.pop(key, None)
+		if self.path is not None:
+			with self.connect() as connection:
+				connection.execute("DELETE FROM query_results WHERE key = ?", (key,))
+
+	def count(self, name: str):
+		"""
+		Summary:
+			Increments a counter reported by report()
+
+		Args:
+			name: the name of the counter
+
+		Returns:
+			None
+		"""
+		with self.lock:
+			self.stats[name] += 1
+
+	def load(self, key: str, compute: object, background: bool = False, deadline: object = None) -> concurrent.futures.Future:
+		"""
+		Summary:
+			Runs compute for a key unless it is already running under the same deadline, and
+			caches its result. Callers of the same key and deadline share one future, so a
+			caller never gets results cut short by the deadline of another caller.
+
+		Args:
+			key: a key created by QueryCache.key
+			compute: a function without arguments returning the search results
+			background: (optional) run compute on the refresh threads instead of the calling
+						thread
+			deadline: (optional) the instance of Deadline compute runs under, or None
+
+		Returns:
+			A future holding the compressed result
+		"""
+		slot = (key, None if deadline is None else id(deadline))
+		with self.lock:
+			future = self.inflight.get(slot)
+			if future is not None:
+				self.stats["coalesced"] += 1
+				return future
+			future = self.inflight[slot] = concurrent.futures.Future()
+
+		def run():
+			try:
+				value = compute()
+				batch = encode_batch(value)
+				if cacheable(value):
+					self.set(key, batch)
+				future.set_result(batch)
+			except BaseException as e:
+				future.set_exception(e)
+			finally:
+				with self.lock:
+					self.inflight.pop(slot, None)
+
+		if background:
+			self.executor.submit(run)
+		else:
+			run()
+		return future
+
+	def fetch(self, key: str, compute: object, refresh: object = None, deadline: object = None) -> object:
+		"""
+		Summary:
+			Returns the results of a query from the cache, computing them on a miss
+
+		Args:
+			key: a key created by QueryCache.key
+			compute: a function without arguments returning the search results
+			refresh: (optional) the function used to refresh stale results in the background,
+					 without a deadline. Defaults to compute.
+			deadline: (optional) the instance of Deadline compute runs under. Misses are only
+					  shared with callers of the same deadline.
+
+		Returns:
+			The search results. Cached results come back as a fresh copy decoded from json.
+		"""
+		batch, storedAt = self.get(key)
+		age = None if storedAt is None else self.clock() - storedAt
+		if age is not None and age <= self.ttl:
+			self.count("hits")
+			return decode_batch(batch)
+		if age is not None and age <= self.ttl + self.staleTtl:
+			self.count("staleHits")
+			with self.lock:
+				refreshing = (key, None) in self.inflight
+			if not refreshing:
+				self.count("refreshes")
+				self.load(key, refresh or compute, background=True)
+			return decode_batch(batch)
+		self.count("misses")
+		return decode_batch(self.load(key, compute, deadline=deadline).result())
+
+	def report(self) -> dict:
+		"""
+		Summary:
+			Summarizes the cache
+
+		Args:
+			None
+
+		Returns:
+			A dictionary with hit, stale hit, miss, coalesced and refresh counts and the number
+			of results in memory
+		"""
+		with self.lock:
+			payload = dict(self.stats)
+			payload["entries"] = len(self.entries)
+		return payload
+
+def cacheable(value: object) -> bool:
+	"""
+	Summary:
+		Checks whether search results are complete. Error and partial entries are appended to
+		results as lists, so results holding a list entry are not cached.
+
+	Args:
+		value: the results of get_data, a dictionary of platform -> list
+
+	Returns:
+		True if the results can be cached
+	"""
+	if not isinstance(value, dict):
+		return False
+	return not any(isinstance(entry, list) for records in value.values() if isinstance(records, list) for entry in records)
+
+def client_options(client: object) -> dict:
+	"""
+	Summary:
+		The configuration of a client that changes its results, like the comment bounds of a
+		RedditClient or the notes options of a TumblrClient. Credentials are left out.
+
+	Args:
+		client: an instance of a social client
+
+	Returns:
+		A dictionary of option name -> value
+	"""
+	config = getattr(client, "config", None) or {}
+	return {name: value for name, value in config.items() if name not in credentialKeys}
@@ -0,0 +1,427 @@
+from .lazy import resolve
+from .normalize import created_at, is_record
+import concurrent.futures, hashlib, json, mmap, os, threading, time
+import numpy
+
+indexFields = ["offsets", "lengths", "timestamps", "platforms", "hashes"]
+
+def id_hash(platform: str, recordId: object) -> int:
+	"""
+	Summary:
+		Hashes a platform and record id to the 64 bit key used by the offset index
+
+	Args:
+		platform: the name of the platform
+		recordId: the id of the record
+
+	Returns:
+		An unsigned 64 bit integer
+	"""
+	digest = hashlib.blake2b("{platform}:{id}".format(platform=platform, id=recordId).encode("utf-8"), digest_size=8).digest()
+	return int.from_bytes(digest, "little")
+
+def record_time(entry: dict) -> float:
+	"""
+	Summary:
+		The creation time of the record held by a line, falling back to the time it was written
+
+	Args:
+		entry: a decoded line of a record file
+
+	Returns:
+		Seconds since the epoch
+	"""
+	try:
+		createdAt = created_at(entry["platform"], entry["record"])
+	except (KeyError, AttributeError, TypeError):
+		createdAt = None
+	return createdAt if createdAt is not None else entry.get("written_at", numpy.nan)
+
+class RecordFileWriter(object):
+
+	"""
+	Summary:
+		Appends records to a line delimited json file, one line per record in the format
+		written by JsonLinesSink. Writes only append, so the cost of a write does not grow with
+		the file. The sidecar offset index is brought up to date when the writer is closed, and
+		readers index any lines appended since.
+	"""
+
+	def __init__(self, path: str):
+		"""
+		Summary:
+			Initializes an instance of RecordFileWriter
+
+		Args:
+			path: the path of the data file. The index is written next to it with the suffix .idx.npz
+
+		Returns:
+			An instance of the RecordFileWriter class
+		"""
+		self.path = path
+		self.lock = threading.Lock()
+
+	def write(self, task: dict, records: list):
+		"""
+		Summary:
+			Appends records. Implements the sink interface.
+
+		Args:
+			task: a dictionary with the keys platform, source and term
+			records: a list of parsed data points
+
+		Returns:
+			None
+		"""
+		records = resolve([record for record in records if is_record(record)])
+		if not records:
+			return
+		writtenAt = time.time()
+		lines = "".join(json.dumps({
+			"platform": task["platform"],
+			"source": task.get("source"),
+			"term": task.get("term"),
+			"job_id": task.get("job_id"),
+			"written_at": writtenAt,
+			"record": record}, default=str) + "\n" for record in records)
+		with self.lock:
+			with open(self.path, "a", encoding="utf-8") as file:
+				file.write(lines)
+
+	def close(self):
+		"""
+		Summary:
+			Indexes the lines written since the index was last built. Files are opened per
+			write, so there is nothing else to release.
+
+		Args:
+			None
+
+		Returns:
+			None
+		"""
+		with self.lock:
+			if os.path.exists(self.path):
+				build_index(self.path)
+
+def load_index(path: str) -> dict:
+	"""
+	Summary:
+		Loads the sidecar index of a data file
+
+	Args:
+		path: the path of the data file
+
+	Returns:
+		A dictionary of numpy arrays (offsets, lengths, timestamps, platforms, hashes), the list
+		of platform names and the number of bytes indexed. Empty if there is no index yet.
+	"""
+	try:
+		with numpy.load(path + ".idx.npz") as index:
+			payload = {field: index[field] for field in indexFields}
+			payload["platformNames"] = [str(name) for name in index["platformNames"]]
+			payload["indexedBytes"] = int(index["indexedBytes"])
+			return payload
+	except (IOError, ValueError, KeyError):
+		return empty_index()
+
+def empty_index() -> dict:
+	"""
+	Summary:
+		The index of a file with no lines
+
+	Args:
+		None
+
+	Returns:
+		A dictionary in the form returned by load_index
+	"""
+	payload = {field: numpy.array([], dtype=dtype) for field, dtype in zip(indexFields, [numpy.int64, numpy.int64, numpy.float64, numpy.int16, numpy.uint64])}
+	payload["platformNames"] = []
+	payload["indexedBytes"] = 0
+	return payload
+
+def build_index(path: str) -> dict:
+	"""
+	Summary:
+		Brings the sidecar index of a data file up to date. Only lines appended since the last
+		build are read, so indexing a file that grows by small batches stays cheap. A partial
+		last line is left for the next build. The index is replaced atomically.
+
+	Args:
+		path: the path of the data file
+
+	Returns:
+		The index, as returned by load_index
+	"""
+	index = load_index(path)
+	size = os.path.getsize(path)
+	if size < index["indexedBytes"]:
+		# the data file was replaced, start over
+		index = empty_index()
+	if size == index["indexedBytes"]:
+		return index
+	rows = {field: [] for field in indexFields}
+	platformCodes = {name: code for code, name in enumerate(index["platformNames"])}
+	offset = index["indexedBytes"]
+	with open(path, "rb") as file:
+		file.seek(offset)
+		for line in file:
+			if not line.endswith(b"\n"):
+				break
+			if line.strip():
+				entry = json.loads(line.decode("utf-8"))
+				platform = entry.get("platform") or ""
+				if platform not in platformCodes:
+					platformCodes[platform] = len(index["platformNames"])
+					index["platformNames"].append(platform)
+				record = entry.get("record")
+				recordId = record.get("id") if isinstance(record, dict) else None
+				rows["offsets"].append(offset)
+				rows["lengths"].append(len(line))
+				rows["timestamps"].append(record_time(entry))
+				rows["platforms"].append(platformCodes[platform])
+				rows["hashes"].append(id_hash(platform, recordId))
+			offset += len(line)
+	for field in indexFields:
+		index[field] = numpy.concatenate([index[field], numpy.array(rows[field], dtype=index[field].dtype)])
+	index["indexedBytes"] = offset
+	tmpPath = "{path}.{pid}.idx.npz".format(path=path, pid=os.getpid())
+	numpy.savez(tmpPath, platformNames=numpy.array(index["platformNames"], dtype=str), indexedBytes=offset,
+				**{field: index[field] for field in indexFields})
+	os.replace(tmpPath, path + ".idx.npz")
+	return index
+
+class RecordFileReader(object):
+
+	"""
+	Summary:
+		Random access to a line delimited record file. The data file is memory mapped and the
+		sidecar index gives the byte offset, length, timestamp, platform and id hash of every
+		line, so lookups by id, platform, time range or position decode only the lines they
+		return. Byte range scans let several processes split a file between them.
+	"""
+
+	def __init__(self, path: str, buildIndex: bool = True):
+		"""
+		Summary:
+			Initializes an instance of RecordFileReader
+
+		Args:
+			path: the path of the data file
+			buildIndex: (optional) index lines appended since the index was last built
+
+		Returns:
+			An instance of the RecordFileReader class
+		"""
+		self.path = path
+		self.index = build_index(path) if buildIndex else load_index(path)
+		self.file = open(path, "rb")
+		self.data = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ) if os.path.getsize(path) else b""
+		self.hashOrder = numpy.argsort(self.index["hashes"], kind="stable")
+
+	def __len__(self) -> int:
+		return len(self.index["offsets"])
+
+	def __enter__(self) -> object:
+		return self
+
+	def __exit__(self, etype: object, value: object, tb: object):
+		self.close()
+
+	def close(self):
+		"""
+		Summary:
+			Unmaps and closes the data file
+
+		Args:
+			None
+
+		Returns:
+			None
+		"""
+		if isinstance(self.data, mmap.mmap):
+			self.data.close()
+		self.file.close()
+
+	def entry(self, position: int) -> dict:
+		"""
+		Summary:
+			Decodes a single line
+
+		Args:
+			position: the position of the line in the index
+
+		Returns:
+			The decoded line, with the keys platform, source, term, written_at and record
+		"""
+		offset, length = int(self.index["offsets"][position]), int(self.index["lengths"][position])
+		return json.loads(self.data[offset:offset + length].decode("utf-8"))
+
+	def entries(self, positions: object) -> list:
+		"""
+		Summary:
+			Decodes several lines in file order
+
+		Args:
+			positions: an iterable of positions or a boolean mask over the index
+
+		Returns:
+			A list of decoded lines
+		"""
+		positions = numpy.asarray(positions)
+		if positions.dtype == bool:
+			positions = numpy.flatnonzero(positions)
+		return [self.entry(position) for position in numpy.sort(positions)]
+
+	def get(self, recordId: object, platform: str = None) -> list:
+		"""
+		Summary:
+			Finds the lines of a record id. A record crawled several times has several lines.
+
+		Args:
+			recordId: the id of the record
+			platform: (optional) the platform of the record. Every platform is tried if omitted.
+
+		Returns:
+			A list of decoded lines, oldest first
+		"""
+		platforms = [platform] if platform is not None else self.index["platformNames"]
+		sortedHashes = self.index["hashes"][self.hashOrder]
+		positions = []
+		for name in platforms:
+			key = numpy.uint64(id_hash(name, recordId))
+			start, stop = numpy.searchsorted(sortedHashes, key, "left"), numpy.searchsorted(sortedHashes, key, "right")
+			positions.extend(self.hashOrder[start:stop].tolist())
+		# hashes can collide, so check the decoded ids
+		return [entry for entry in self.entries(positions) if str(entry["record"].get("id")) == str(recordId)]
+
+	def slice(self, start: int = None, stop: int = None) -> list:
+		"""
+		Summary:
+			Decodes a range of lines by position
+
+		Args:
+			start: (optional) the first position
+			stop: (optional) the position after the last one
+
+		Returns:
+			A list of decoded lines
+		"""
+		return self.entries(numpy.arange(len(self))[start:stop])
+
+	def mask(self, platform: object = None, since: float = None, until: float = None) -> numpy.ndarray:
+		"""
+		Summary:
+			Selects lines by platform and record time using only the index
+
+		Args:
+			platform: (optional) a platform name or a list of them
+			since: (optional) the earliest time in seconds since the epoch
+			until: (optional) the time, in seconds since the epoch, records must be older than
+
+		Returns:
+			A boolean numpy array over the index
+		"""
+		mask = numpy.ones(len(self), dtype=bool)
+		if platform is not None:
+			platforms = [platform] if isinstance(platform, str) else platform
+			codes = [self.index["platformNames"].index(name) for name in platforms if name in self.index["platformNames"]]
+			mask &= numpy.isin(self.index["platforms"], codes)
+		if since is not None:
+			mask &= self.index["timestamps"] >= since
+		if until is not None:
+			mask &= self.index["timestamps"] < until
+		return mask
+
+	def where(self, platform: object = None, since: float = None, until: float = None, limit: int = None) -> list:
+		"""
+		Summary:
+			Decodes the lines of a platform and time range
+
+		Args:
+			platform: (optional) a platform name or a list of them
+			since: (optional) the earliest time in seconds since the epoch
+			until: (optional) the time, in seconds since the epoch, records must be older than
+			limit: (optional) the maximum number of lines decoded
+
+		Returns:
+			A list of decoded lines in file order
+		"""
+		return self.entries(numpy.flatnonzero(self.mask(platform, since, until))[:limit])
+
+	def byte_ranges(self, parts: int) -> list:
+		"""
+		Summary:
+			Splits the indexed part of the file into byte ranges holding about the same number
+			of bytes. Ranges start at line boundaries.
+
+		Args:
+			parts: the number of ranges
+
+		Returns:
+			A list of (start, end) byte offsets
+		"""
+		if not len(self):
+			return []
+		size = self.index["indexedBytes"]
+		positions = numpy.searchsorted(self.index["offsets"], numpy.linspace(0, size, parts + 1)[1:-1])
+		cuts = sorted({int(self.index["offsets"][position]) for position in positions if position < len(self)})
+		bounds = [0] + [cut for cut in cuts if cut > 0] + [size]
+		return list(zip(bounds[:-1], bounds[1:]))
+
+	def scan(self, start: int, end: int):
+		"""
+		Summary:
+			Decodes the lines that start within a byte range
+
+		Args:
+			start: the first byte of the range
+			end: the byte after the range
+
+		Returns:
+			A generator of decoded lines
+		"""
+		first, last = numpy.searchsorted(self.index["offsets"], [start, end])
+		for position in range(first, last):
+			yield self.entry(position)
+
+def scan_range(path: str, start: int, end: int, function: object) -> list:
+	"""
+	Summary:
+		Applies a function to every line that starts within a byte range of a file. Used by
+		parallel_scan in worker processes.
+
+	Args:
+		path: the path of the data file
+		start: the first byte of the range
+		end: the byte after the range
+		function: a picklable function taking a decoded line. None results are dropped.
+
+	Returns:
+		A list of the function's results
+	"""
+	with RecordFileReader(path, buildIndex=False) as reader:
+		return [result for result in map(function, reader.scan(start, end)) if result is not None]
+
+def parallel_scan(path: str, function: object, workers: int = None) -> list:
+	"""
+	Summary:
+		Scans a record file with several processes. The file is split into byte ranges and
+		every process maps and decodes only its own range.
+
+	Args:
+		path: the path of the data file
+		function: a picklable function taking a decoded line, for example a module level
+				  function. None results are dropped.
+		workers: (optional) the number of processes. Defaults to the number of cpus.
+
+	Returns:
+		A list of the function's results in file order
+	"""
+	workers = workers or os.cpu_count() or 1
+	with RecordFileReader(path) as reader:
+		ranges = reader.byte_ranges(workers)
+	with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as executor:
+		futures = [executor.submit(scan_range, path, start, end, function) for start, end in ranges]
+		return [result for future in futures for result in future.result()]
@@ -0,0 +1,433 @@
+from .lazy import LazySecondary
+from .normalize import created_at, is_record
+import numpy
+
+try:
+	import pyarrow
+	import pyarrow.parquet
+except ImportError:
+	pyarrow = None
+
+stringColumns = ["id", "platform", "source", "author", "text"]
+numberColumns = ["created_at", "likes", "shares", "comments", "engagement"]
+
+def engagement_counts(platform: str, record: dict) -> (int, int, int):
+	"""
+	Summary:
+		Maps the engagement fields of each platform onto likes, shares and comments. The
+		comment counts of the platforms are used where records have them, otherwise comments
+		are counted only if they were already fetched, so lazy handles are never resolved.
+
+	Args:
+		platform: the name of the platform
+		record: a parsed data point
+
+	Returns:
+		likes: likes, favorites or the score of a reddit post
+		shares: retweets or tumblr notes
+		comments: the number of comments
+	"""
+	secondary = record.get("secondary_information", {})
+	secondary = [] if isinstance(secondary, LazySecondary) and not secondary.resolved() else secondary.get("comments", [])
+	commentCount = len(secondary.get("data", [])) if isinstance(secondary, dict) else len(secondary)
+	if platform == "twitter":
+		return record.get("favorite_count", 0), record.get("retweet_count", 0), 0
+	if platform == "reddit":
+		return record.get("score", 0), 0, record.get("num_comments", commentCount)
+	if platform == "instagram":
+		return record.get("like_count", 0), 0, record.get("comment_count", commentCount)
+	if platform == "tumblr":
+		return 0, record.get("note_count", 0), 0
+	return 0, 0, commentCount
+
+def post_fields(platform: str, record: dict, source: str) -> (object, str, str, str):
+	"""
+	Summary:
+		Reads the identifying columns of a frame row straight from a parsed data point, with
+		the same meaning as the posts and authors columns of common.normalize
+
+	Args:
+		platform: the name of the platform
+		record: a parsed data point
+		source: the page, user, subreddit or blog the record came from, or None
+
+	Returns:
+		postId: the id of the post
+		source: the source, falling back to the subreddit or blog of the record
+		author: the screen name of the author, or the source for pages and instagram users
+		text: the text of the post
+	"""
+	if platform == "twitter":
+		return record["id"], source, record["user_screen_name"], record["text"]
+	if platform == "reddit":
+		return record["id"], source or record.get("subreddit_name"), record["user_screen_name"], record["title"]
+	if platform == "tumblr":
+		return record["id"], source or record["blog_name"], record["blog_name"], record.get("summary")
+	if platform == "instagram":
+		return record["id"], source, source, record.get("caption")
+	return record["id"], source, source, "\n".join([record[key] for key in ["name", "message"] if record.get(key)])
+
+class StringPool(object):
+
+	"""
+	Summary:
+		Stores every distinct string once. Columns keep int32 codes into the pool, so repeated
+		values like platforms, sources and authors cost four bytes per row, and string filters
+		only look at each distinct value once.
+	"""
+
+	def __init__(self, values: list = None):
+		"""
+		Summary:
+			Initializes an instance of StringPool
+
+		Args:
+			values: (optional) the distinct strings of the pool
+
+		Returns:
+			An instance of the StringPool class
+		"""
+		self.values = list(values or [])
+		self.codes = {value: code for code, value in enumerate(self.values)}
+
+	def encode(self, value: str) -> int:
+		"""
+		Summary:
+			Returns the code of a string, adding it to the pool if needed
+
+		Args:
+			value: a string
+
+		Returns:
+			The code of the string
+		"""
+		code = self.codes.get(value)
+		if code is None:
+			code = self.codes[value] = len(self.values)
+			self.values.append(value)
+		return code
+
+	def lookup(self, value: str) -> int:
+		"""
+		Summary:
+			Returns the code of a string without adding it
+
+		Args:
+			value: a string
+
+		Returns:
+			The code of the string, or -1 if it is not in the pool
+		"""
+		return self.codes.get(value, -1)
+
+	def array(self) -> numpy.ndarray:
+		"""
+		Summary:
+			The pool as a numpy array of objects, indexable by codes
+
+		Args:
+			None
+
+		Returns:
+			A numpy array of strings
+		"""
+		payload = numpy.empty(len(self.values), dtype=object)
+		payload[:] = self.values
+		return payload
+
+class ResultFrame(object):
+
+	"""
+	Summary:
+		Columnar container of search results from every platform in one schema: id, platform,
+		source, author, text, created_at and the engagement counts likes, shares, comments and
+		engagement (their sum). Numbers are numpy arrays and strings are int32 codes into
+		shared string pools, so filters, group-bys and top-K run as array operations without
+		building a dictionary per row. Frames derived from a frame share its pools.
+	"""
+
+	def __init__(self, columns: dict, pools: dict):
+		"""
+		Summary:
+			Initializes an instance of ResultFrame. Use from_results or from_records to build one.
+
+		Args:
+			columns: a dictionary of column name -> numpy array. String columns hold codes.
+			pools: a dictionary of string column name -> StringPool
+
+		Returns:
+			An instance of the ResultFrame class
+		"""
+		self.columns = columns
+		self.pools = pools
+
+	@classmethod
+	def from_records(cls, platform: str, records: list, source: str = None, pools: dict = None) -> object:
+		"""
+		Summary:
+			Builds a frame from the parsed data points of one platform. Error entries appended
+			by search functions are skipped.
+
+		Args:
+			platform: the name of the platform the records came from
+			records: a list of parsed data points
+			source: (optional) the page, user, subreddit or blog the records came from
+			pools: (optional) string pools to encode into, so frames can share them
+
+		Returns:
+			An instance of ResultFrame
+		"""
+		pools = pools if pools is not None else {name: StringPool() for name in stringColumns}
+		rows = {name: [] for name in stringColumns + numberColumns}
+		for record in records:
+			if not is_record(record):
+				continue
+			postId, recordSource, author, text = post_fields(platform, record, source)
+			likes, shares, commentCount = engagement_counts(platform, record)
+			for name, value in [("id", postId), ("platform", platform), ("source", recordSource), ("author", author), ("text", text)]:
+				rows[name].append(pools[name].encode("" if value is None else str(value)))
+			createdAt = created_at(platform, record)
+			rows["created_at"].append(numpy.nan if createdAt is None else createdAt)
+			rows["likes"].append(likes or 0)
+			rows["shares"].append(shares or 0)
+			rows["comments"].append(commentCount or 0)
+			rows["engagement"].append((likes or 0) + (shares or 0) + (commentCount or 0))
+		columns = {name: numpy.array(rows[name], dtype=numpy.int32) for name in stringColumns}
+		columns["created_at"] = numpy.array(rows["created_at"], dtype=numpy.float64)
+		columns.update({name: numpy.array(rows[name], dtype=numpy.int64) for name in ["likes", "shares", "comments", "engagement"]})
+		return cls(columns, pools)
+
+	@classmethod
+	def from_results(cls, results: dict) -> object:
+		"""
+		Summary:
+			Builds a frame from the output of OpenSocial.get_data or evaluate_all_clients
+
+		Args:
+			results: a dictionary of platform -> list of parsed data points
+
+		Returns:
+			An instance of ResultFrame
+		"""
+		pools = {name: StringPool() for name in stringColumns}
+		frames = [cls.from_records(platform, records, pools=pools) for platform, records in results.items() if isinstance(records, list)]
+		return cls.concat(frames) if frames else cls.from_records(None, [], pools=pools)
+
+	@classmethod
+	def concat(cls, frames: list) -> object:
+		"""
+		Summary:
+			Stacks frames. Frames with different pools are re-encoded into the pools of the
+			first frame.
+
+		Args:
+			frames: a list of ResultFrame instances
+
+		Returns:
+			An instance of ResultFrame
+		"""
+		pools = frames[0].pools
+		columns = {}
+		for name in stringColumns:
+			parts = []
+			for frame in frames:
+				codes = frame.columns[name]
+				if frame.pools[name] is not pools[name]:
+					remap = numpy.array([pools[name].encode(value) for value in frame.pools[name].values], dtype=numpy.int32)
+					codes = remap[codes] if len(remap) else codes
+				parts.append(codes)
+			columns[name] = numpy.concatenate(parts)
+		for name in numberColumns:
+			columns[name] = numpy.concatenate([frame.columns[name] for frame in frames])
+		return cls(columns, pools)
+
+	def __len__(self) -> int:
+		return len(self.columns["id"])
+
+	def column(self, name: str) -> numpy.ndarray:
+		"""
+		Summary:
+			Returns a column, decoding string codes
+
+		Args:
+			name: the name of the column
+
+		Returns:
+			A numpy array
+		"""
+		if name in self.pools:
+			return self.pools[name].array()[self.columns[name]]
+		return self.columns[name]
+
+	def take(self, selection: numpy.ndarray) -> object:
+		"""
+		Summary:
+			Returns the rows selected by a boolean mask or an array of row indices
+
+		Args:
+			selection: a boolean mask or an array of row indices
+
+		Returns:
+			A new ResultFrame sharing this frame's pools
+		"""
+		return ResultFrame({name: values[selection] for name, values in self.columns.items()}, self.pools)
+
+	def equals(self, name: str, values: object) -> numpy.ndarray:
+		"""
+		Summary:
+			Builds a mask of rows whose string column holds one of the given values
+
+		Args:
+			name: the name of a string column
+			values: a string or a list of strings
+
+		Returns:
+			A boolean numpy array
+		"""
+		values = [values] if isinstance(values, str) else values
+		codes = [self.pools[name].lookup(value) for value in values]
+		return numpy.isin(self.columns[name], [code for code in codes if code >= 0])
+
+	def contains(self, name: str, substring: str) -> numpy.ndarray:
+		"""
+		Summary:
+			Builds a mask of rows whose string column contains a substring, ignoring case. Each
+			distinct string is checked once.
+
+		Args:
+			name: the name of a string column
+			substring: the text to look for
+
+		Returns:
+			A boolean numpy array
+		"""
+		substring = substring.lower()
+		matches = numpy.array([substring in value.lower() for value in self.pools[name].values], dtype=bool)
+		return matches[self.columns[name]] if len(matches) else numpy.zeros(len(self), dtype=bool)
+
+	def where(self, platform: object = None, source: object = None, author: object = None, since: float = None, until: float = None,
+			text: str = None, minEngagement: int = None) -> object:
+		"""
+		Summary:
+			Filters rows. Every given condition must hold.
+
+		Args:
+			platform: (optional) a platform name or a list of them
+			source: (optional) a source name or a list of them
+			author: (optional) an author name or a list of them
+			since: (optional) the earliest created_at in seconds since the epoch
+			until: (optional) the created_at, in seconds since the epoch, rows must be older than
+			text: (optional) a substring the text must contain
+			minEngagement: (optional) the smallest engagement kept
+
+		Returns:
+			A new ResultFrame
+		"""
+		mask = numpy.ones(len(self), dtype=bool)
+		for name, value in [("platform", platform), ("source", source), ("author", author)]:
+			if value is not None:
+				mask &= self.equals(name, value)
+		if since is not None:
+			mask &= self.columns["created_at"] >= since
+		if until is not None:
+			mask &= self.columns["created_at"] < until
+		if text is not None:
+			mask &= self.contains("text", text)
+		if minEngagement is not None:
+			mask &= self.columns["engagement"] >= minEngagement
+		return self.take(mask)
+
+	def top_k(self, k: int, by: str = "engagement") -> object:
+		"""
+		Summary:
+			Returns the k rows with the largest values of a numeric column, largest first. Uses a
+			partial sort, so only the k selected rows are fully sorted.
+
+		Args:
+			k: the number of rows to return
+			by: (optional) the numeric column to rank by
+
+		Returns:
+			A new ResultFrame
+		"""
+		values = self.columns[by]
+		if k < len(values):
+			indices = numpy.argpartition(-values, k - 1)[:k]
+		else:
+			indices = numpy.arange(len(values))
+		return self.take(indices[numpy.argsort(-values[indices], kind="stable")])
+
+	def group_by(self, key: str, value: str = "engagement") -> dict:
+		"""
+		Summary:
+			Aggregates a numeric column per distinct value of a string column
+
+		Args:
+			key: the string column to group by, like platform, source or author
+			value: (optional) the numeric column to aggregate
+
+		Returns:
+			A dictionary of numpy arrays with the keys key, count, sum, mean and max, ordered by
+			descending sum
+		"""
+		groups, inverse = numpy.unique(self.columns[key], return_inverse=True)
+		values = self.columns[value].astype(numpy.float64)
+		counts = numpy.bincount(inverse, minlength=len(groups))
+		sums = numpy.bincount(inverse, weights=values, minlength=len(groups))
+		maxima = numpy.full(len(groups), -numpy.inf)
+		numpy.maximum.at(maxima, inverse, values)
+		order = numpy.argsort(-sums, kind="stable")
+		return {
+			key: self.pools[key].array()[groups][order],
+			"count": counts[order],
+			"sum": sums[order],
+			"mean": (sums / numpy.maximum(counts, 1))[order],
+			"max": maxima[order]
+		}
+
+	def to_records(self, limit: int = None) -> list:
+		"""
+		Summary:
+			Materializes rows as dictionaries, for example to print a top-K result
+
+		Args:
+			limit: (optional) the maximum number of rows returned
+
+		Returns:
+			A list of dictionaries
+		"""
+		columns = {name: self.column(name)[:limit].tolist() for name in stringColumns + numberColumns}
+		return [dict(zip(columns.keys(), row)) for row in zip(*columns.values())]
+
+	def to_arrow(self) -> object:
+		"""
+		Summary:
+			Converts the frame to a pyarrow Table. String columns become dictionary arrays that
+			reuse the pools, so nothing is decoded row by row.
+
+		Args:
+			None
+
+		Returns:
+			An instance of pyarrow.Table
+		"""
+		if pyarrow is None:
+			raise ImportError("to_arrow and to_parquet require pyarrow (pip install pyarrow)")
+		arrays = {name: pyarrow.DictionaryArray.from_arrays(self.columns[name], pyarrow.array(self.pools[name].values, type=pyarrow.string()))
+				  for name in stringColumns}
+		arrays.update({name: pyarrow.array(self.columns[name]) for name in numberColumns})
+		return pyarrow.table(arrays)
+
+	def to_parquet(self, path: str):
+		"""
+		Summary:
+			Writes the frame to a parquet file
+
+		Args:
+			path: the path of the file
+
+		Returns:
+			None
+		"""
+		table = self.to_arrow()
+		pyarrow.parquet.write_table(table, path)
@@ -0,0 +1,329 @@
+from .lazy import resolve
+from .normalize import is_record, normalize_record
+from .sinks import AbstractSink
+import contextlib, json, sqlite3, threading, time
+
+schema = [
+	"CREATE TABLE IF NOT EXISTS authors ("
+	"platform TEXT NOT NULL, author_id TEXT NOT NULL, name TEXT, display_name TEXT, extra TEXT, "
+	"PRIMARY KEY (platform, author_id))",
+	"CREATE TABLE IF NOT EXISTS posts ("
+	"platform TEXT NOT NULL, post_id TEXT NOT NULL, source TEXT, author_id TEXT, text TEXT, created_at REAL, "
+	"url TEXT, term TEXT, raw TEXT, stored_at REAL, PRIMARY KEY (platform, post_id))",
+	"CREATE TABLE IF NOT EXISTS comments ("
+	"platform TEXT NOT NULL, comment_id TEXT NOT NULL, post_id TEXT NOT NULL, parent_id TEXT, author_id TEXT, "
+	"text TEXT, created_at REAL, PRIMARY KEY (platform, comment_id))",
+	"CREATE TABLE IF NOT EXISTS post_terms ("
+	"platform TEXT NOT NULL, post_id TEXT NOT NULL, term TEXT NOT NULL, PRIMARY KEY (platform, post_id, term))",
+	"CREATE INDEX IF NOT EXISTS posts_created_at ON posts (created_at)",
+	"CREATE INDEX IF NOT EXISTS posts_source ON posts (platform, source)",
+	"CREATE INDEX IF NOT EXISTS comments_post ON comments (platform, post_id)"
+]
+
+# external content fts5 tables kept in sync with triggers, so text is stored only once
+fullTextSchema = [
+	"CREATE VIRTUAL TABLE IF NOT EXISTS posts_fts USING fts5(text, content='posts', content_rowid='rowid')",
+	"CREATE VIRTUAL TABLE IF NOT EXISTS comments_fts USING fts5(text, content='comments', content_rowid='rowid')"
+] + [statement for table in ["posts", "comments"] for statement in [
+	"CREATE TRIGGER IF NOT EXISTS {table}_ai AFTER INSERT ON {table} BEGIN "
+	"INSERT INTO {table}_fts (rowid, text) VALUES (new.rowid, new.text); END".format(table=table),
+	"CREATE TRIGGER IF NOT EXISTS {table}_ad AFTER DELETE ON {table} BEGIN "
+	"INSERT INTO {table}_fts ({table}_fts, rowid, text) VALUES ('delete', old.rowid, old.text); END".format(table=table),
+	"CREATE TRIGGER IF NOT EXISTS {table}_au AFTER UPDATE OF text ON {table} BEGIN "
+	"INSERT INTO {table}_fts ({table}_fts, rowid, text) VALUES ('delete', old.rowid, old.text); "
+	"INSERT INTO {table}_fts (rowid, text) VALUES (new.rowid, new.text); END".format(table=table)]]
+
+class ResultStore(AbstractSink):
+
+	"""
+	Summary:
+		Persistent SQLite store for parsed data points of every platform. Records are split into
+		normalized posts, authors and comments tables and written in bulk, one transaction per
+		batch, to a database in WAL mode so readers never block the crawl. Post and comment text
+		is indexed with FTS5 when the SQLite build supports it, and LIKE queries are used
+		otherwise. The store implements the sink interface, so crawl workers and monitors can
+		write to it directly.
+	"""
+
+	def __init__(self, path: str):
+		"""
+		Summary:
+			Initializes an instance of ResultStore, creating the database if needed
+
+		Args:
+			path: the path of the SQLite database
+
+		Returns:
+			An instance of the ResultStore class
+		"""
+		self.path = path
+		self.lock = threading.Lock()
+		self.fullText = True
+		with self.connect() as connection:
+			connection.execute("PRAGMA journal_mode=WAL")
+			for statement in schema:
+				connection.execute(statement)
+			try:
+				for statement in fullTextSchema:
+					connection.execute(statement)
+			except sqlite3.OperationalError:
+				self.fullText = False
+
+	@contextlib.contextmanager
+	def connect(self) -> sqlite3.Connection:
+		"""
+		Summary:
+			Opens a connection to the store for one transaction. Rows are returned as
+			sqlite3.Row. The transaction is committed if the block succeeds and the connection
+			is closed either way.
+
+		Args:
+			None
+
+		Returns:
+			An instance of sqlite3.Connection
+		"""
+		connection = sqlite3.connect(self.path, timeout=30)
+		try:
+			connection.row_factory = sqlite3.Row
+			connection.execute("PRAGMA synchronous=NORMAL")
+			with connection:
+				yield connection
+		finally:
+			connection.close()
+
+	def write(self, task: dict, records: list):
+		"""
+		Summary:
+			Stores the parsed data points produced for a task
+
+		Args:
+			task: a dictionary with the keys platform, source and term
+			records: a list of parsed data points
+
+		Returns:
+			None
+		"""
+		self.ingest(task["platform"], records, source=task.get("source"), term=task.get("term"))
+
+	def ingest(self, platform: str, records: list, source: str = None, term: str = None) -> int:
+		"""
+		Summary:
+			Normalizes records and upserts them in a single transaction. Error entries appended
+			by search functions are skipped. Posts seen again are updated in place, so repeated
+			crawls refresh counts and comments instead of duplicating rows. Every term a post
+			matched is kept in the post_terms table; the term column holds the first one.
+
+		Args:
+			platform: the name of the platform the records came from
+			records: a list of parsed data points
+			source: (optional) the page, user, subreddit or blog the records were crawled from
+			term: (optional) the search term the records matched
+
+		Returns:
+			The number of posts stored
+		"""
+		posts, authors, comments = [], {}, {}
+		storedAt = time.time()
+		for record in resolve(records):
+			if not is_record(record):
+				continue
+			post, recordAuthors, recordComments = normalize_record(platform, record, source, term)
+			post["stored_at"] = storedAt
+			posts.append(post)
+			authors.update({author["author_id"]: author for author in recordAuthors})
+			comments.update({comment["comment_id"]: comment for comment in recordComments})
+		if not posts:
+			return 0
+		with self.lock:
+			with self.connect() as connection:
+				connection.executemany(
+					"INSERT INTO authors VALUES (:platform, :author_id, :name, :display_name, :extra) "
+					"ON CONFLICT (platform, author_id) DO UPDATE SET name = excluded.name, "
+					"display_name = coalesce(excluded.display_name, display_name), "
+					"extra = CASE WHEN excluded.extra = '{}' THEN extra ELSE excluded.extra END",
+					list(authors.values()))
+				connection.executemany(
+					"INSERT INTO posts VALUES (:platform, :post_id, :source, :author_id, :text, :created_at, :url, :term, :raw, :stored_at) "
+					"ON CONFLICT (platform, post_id) DO UPDATE SET source = coalesce(excluded.source, source), "
+					"author_id = excluded.author_id, text = excluded.text, created_at = coalesce(excluded.created_at, created_at), "
+					"url = excluded.url, term = coalesce(term, excluded.term), raw = excluded.raw, stored_at = excluded.stored_at",
+					posts)
+				connection.executemany(
+					"INSERT INTO comments VALUES (:platform, :comment_id, :post_id, :parent_id, :author_id, :text, :created_at) "
+					"ON CONFLICT (platform, comment_id) DO UPDATE SET parent_id = excluded.parent_id, "
+					"author_id = excluded.author_id, text = excluded.text, created_at = excluded.created_at",
+					list(comments.values()))
+				connection.executemany(
+					"INSERT OR IGNORE INTO post_terms VALUES (:platform, :post_id, :term)",
+					[post for post in posts if post["term"] is not None])
+		return len(posts)
+
+	def ingest_results(self, results: dict, term: str = None) -> int:
+		"""
+		Summary:
+			Stores the output of OpenSocial.get_data or evaluate_all_clients
+
+		Args:
+			results: a dictionary of platform -> list of parsed data points
+			term: (optional) the search term the results matched
+
+		Returns:
+			The number of posts stored
+		"""
+		return sum(self.ingest(platform, records, term=term) for platform, records in results.items() if isinstance(records, list))
+
+	def filters(self, alias: str, platform: str, since: float, until: float, source: str = None) -> (list, list):
+		"""
+		Summary:
+			Builds the where clauses shared by the query functions
+
+		Args:
+			alias: the alias of the table the filters apply to
+			platform: a platform name or None
+			since: the earliest created_at or None
+			until: the latest created_at or None
+			source: (optional) a source name or None
+
+		Returns:
+			clauses: a list of sql conditions
+			params: a list of the parameters of the conditions
+		"""
+		clauses, params = [], []
+		for column, operator, value in [("platform", "=", platform), ("created_at", ">=", since), ("created_at", "<", until), ("source", "=", source)]:
+			if value is not None:
+				clauses.append("{alias}.{column} {operator} ?".format(alias=alias, column=column, operator=operator))
+				params.append(value)
+		return clauses, params
+
+	def text_filter(self, table: str, alias: str, query: str) -> (str, list):
+		"""
+		Summary:
+			Builds the condition matching rows of a table whose text matches a query
+
+		Args:
+			table: posts or comments
+			alias: the alias of the table in the query
+			query: an FTS5 query, like 'climate AND policy' or '"exact phrase"'. Without FTS5
+				   support it is matched as a substring.
+
+		Returns:
+			The sql condition and its parameters
+		"""
+		if self.fullText:
+			return "{alias}.rowid IN (SELECT rowid FROM {table}_fts WHERE {table}_fts MATCH ?)".format(alias=alias, table=table), [query]
+		return "{alias}.text LIKE ?".format(alias=alias), ["%" + query + "%"]
+
+	def search(self, query: str = None, platform: str = None, since: float = None, until: float = None, source: str = None,
+			includeComments: bool = True, limit: int = 100, term: str = None) -> list:
+		"""
+		Summary:
+			Finds stored posts by text and time range, newest first
+
+		Args:
+			query: (optional) the text to search for. None returns every post in the range.
+			platform: (optional) only return posts of this platform
+			since: (optional) the earliest creation time in seconds since the epoch
+			until: (optional) the creation time, in seconds since the epoch, posts must be older than
+			source: (optional) only return posts from this page, user, subreddit or blog
+			includeComments: (optional) also return posts whose comments match the query
+			limit: (optional) the maximum number of posts returned
+			term: (optional) only return posts that matched this search term in any crawl
+
+		Returns:
+			A list of post dictionaries. The original parsed record is under the key record.
+		"""
+		clauses, params = self.filters("p", platform, since, until, source)
+		if term is not None:
+			clauses.append("EXISTS (SELECT 1 FROM post_terms t WHERE t.platform = p.platform AND t.post_id = p.post_id AND t.term = ?)")
+			params.append(term)
+		if query is not None:
+			condition, conditionParams = self.text_filter("posts", "p", query)
+			if includeComments:
+				commentCondition, commentParams = self.text_filter("comments", "c", query)
+				condition = "({condition} OR EXISTS (SELECT 1 FROM comments c WHERE c.platform = p.platform "\
+					"AND c.post_id = p.post_id AND {commentCondition}))".format(condition=condition, commentCondition=commentCondition)
+				conditionParams = conditionParams + commentParams
+			clauses.append(condition)
+			params.extend(conditionParams)
+		sql = "SELECT p.* FROM posts p {where} ORDER BY p.created_at DESC LIMIT ?".format(
+			where="WHERE " + " AND ".join(clauses) if clauses else "")
+		with self.connect() as connection:
+			return [self.post_dict(row) for row in connection.execute(sql, params + [limit])]
+
+	def search_comments(self, query: str, platform: str = None, since: float = None, until: float = None, limit: int = 100) -> list:
+		"""
+		Summary:
+			Finds stored comments by text and time range, newest first
+
+		Args:
+			query: the text to search for
+			platform: (optional) only return comments of this platform
+			since: (optional) the earliest creation time in seconds since the epoch
+			until: (optional) the creation time, in seconds since the epoch, comments must be older than
+			limit: (optional) the maximum number of comments returned
+
+		Returns:
+			A list of comment dictionaries
+		"""
+		clauses, params = self.filters("c", platform, since, until)
+		condition, conditionParams = self.text_filter("comments", "c", query)
+		sql = "SELECT c.* FROM comments c WHERE {where} ORDER BY c.created_at DESC LIMIT ?".format(where=" AND ".join(clauses + [condition]))
+		with self.connect() as connection:
+			return [dict(row) for row in connection.execute(sql, params + conditionParams + [limit])]
+
+	def get_post(self, platform: str, postId: object) -> dict:
+		"""
+		Summary:
+			Looks up a stored post along with its author and comments
+
+		Args:
+			platform: the name of the platform
+			postId: the id of the post
+
+		Returns:
+			A post dictionary with the keys author, comments and terms added, or None if it is not stored
+		"""
+		with self.connect() as connection:
+			row = connection.execute("SELECT * FROM posts WHERE platform = ? AND post_id = ?", (platform, str(postId))).fetchone()
+			if row is None:
+				return None
+			payload = self.post_dict(row)
+			author = connection.execute("SELECT * FROM authors WHERE platform = ? AND author_id = ?", (platform, row["author_id"])).fetchone()
+			payload["author"] = dict(author) if author is not None else None
+			payload["comments"] = [dict(comment) for comment in connection.execute(
+				"SELECT * FROM comments WHERE platform = ? AND post_id = ? ORDER BY created_at", (platform, str(postId)))]
+			payload["terms"] = [term for (term,) in connection.execute(
+				"SELECT term FROM post_terms WHERE platform = ? AND post_id = ? ORDER BY term", (platform, str(postId)))]
+			return payload
+
+	def count(self, platform: str = None) -> dict:
+		"""
+		Summary:
+			Counts the stored rows
+
+		Args:
+			platform: (optional) only count rows of this platform
+
+		Returns:
+			A dictionary with the number of posts, authors and comments
+		"""
+		where, params = ("WHERE platform = ?", [platform]) if platform is not None else ("", [])
+		with self.connect() as connection:
+			return {table: connection.execute("SELECT count(*) FROM {table} {where}".format(table=table, where=where), params).fetchone()[0]
+					for table in ["posts", "authors", "comments"]}
+
+	def post_dict(self, row: sqlite3.Row) -> dict:
+		"""
+		Summary:
+			Converts a row of the posts table to a dictionary, decoding the stored record
+
+		Args:
+			row: a row of the posts table
+
+		Returns:
+			A post dictionary
+		"""
+		payload = dict(row)
+		payload["record"] = json.loads(payload.pop("raw"))
+		return payload
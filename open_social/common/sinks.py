@@ -0,0 +1,126 @@
+from .lazy import resolve
+import json, threading, time
+
+class AbstractSink(object):
+
+	"""
+	Summary:
+		Abstract class used to impose implementation guidelines for result sinks. A sink
+		receives the parsed data points produced for a task (a platform, source and search
+		term) and stores them somewhere that outlives the crawl.
+	"""
+
+	def write(self, task: dict, records: list):
+		"""
+		Summary:
+			Stores the parsed data points produced for a task
+
+		Args:
+			task: a dictionary describing where the records came from. It contains at least
+				  the keys platform, source and term.
+			records: a list of parsed data points
+
+		Returns:
+			None
+		"""
+		pass
+
+	def close(self):
+		"""
+		Summary:
+			Releases any resources held by the sink
+
+		Args:
+			None
+
+		Returns:
+			None
+		"""
+		pass
+
+class MemorySink(AbstractSink):
+
+	"""
+	Summary:
+		A sink that keeps results in memory grouped by platform. Useful for tests and for
+		crawls that run inside a single process.
+	"""
+
+	def __init__(self):
+		"""
+		Summary:
+			Initializes an instance of MemorySink
+
+		Args:
+			None
+
+		Returns:
+			An instance of the MemorySink class
+		"""
+		self.lock = threading.Lock()
+		self.data = {}
+
+	def write(self, task: dict, records: list):
+		"""
+		Summary:
+			Appends the records to the list kept for the task's platform
+
+		Args:
+			task: a dictionary with the keys platform, source and term
+			records: a list of parsed data points
+
+		Returns:
+			None
+		"""
+		with self.lock:
+			self.data.setdefault(task["platform"], []).extend(records)
+
+class JsonLinesSink(AbstractSink):
+
+	"""
+	Summary:
+		A sink that appends results to a line delimited json file. Every batch is written with
+		a single call on a file opened in append mode, so several worker processes can share the
+		same file.
+	"""
+
+	def __init__(self, path: str):
+		"""
+		Summary:
+			Initializes an instance of JsonLinesSink
+
+		Args:
+			path: the path of the file results are appended to
+
+		Returns:
+			An instance of the JsonLinesSink class
+		"""
+		self.path = path
+		self.lock = threading.Lock()
+
+	def write(self, task: dict, records: list):
+		"""
+		Summary:
+			Appends one line per record. Each line holds the record and the task it came from.
+
+		Args:
+			task: a dictionary with the keys platform, source and term
+			records: a list of parsed data points
+
+		Returns:
+			None
+		"""
+		if not records:
+			return
+		resolve(records)
+		writtenAt = time.time()
+		lines = "".join(json.dumps({
+			"platform": task["platform"],
+			"source": task.get("source"),
+			"term": task["term"],
+			"job_id": task.get("job_id"),
+			"written_at": writtenAt,
+			"record": record}, default=str) + "\n" for record in records)
+		with self.lock:
+			with open(self.path, "a", encoding="utf-8") as file:
+				file.write(lines)
@@ -1,7 +1,9 @@
+from .crawl_planner import CrawlPlanner
+from .deadline import expired
 from .social_error import SocialError
 import datetime, json, sys, traceback
 
-def search(client: object, searchTerm: str, sources: list, limit: int) -> list:
+def search(client: object, searchTerm: str, sources: list, limit: int, maxPages: int = None, maxRequests: int = None) -> list:
 	"""
 	Summary:
 		Facilitates search for FacebookClient, InstagramClient, and TumblrClient
@@ -13,31 +15,93 @@ def search(client: object, searchTerm: str, sources: list, limit: int) -> list:
 		sources: a list of sources to search over. This could be a list of subreddits,
 				 public facebook pages, or instagram usernames
 		limit: the upper limit for the count of data points returned by the search
+		maxPages: (optional) the maximum number of pages fetched per source. None pages until
+				  the source runs out of data.
+		maxRequests: (optional) the maximum number of requests issued per source
 
 	Returns:
 		A list of relevant data points that has a count no greater than limit
 	"""
+	planner = CrawlPlanner(sources, limit, maxPages=maxPages, maxRequests=maxRequests)
+	return plan_search(client, searchTerm, planner)
+
+def plan_search(client: object, searchTerm: str, planner: CrawlPlanner) -> list:
+	"""
+	Summary:
+		Runs a budgeted crawl described by planner. Each source is crawled until it fills its
+		quota or runs out of pages, then quota left by quiet sources is reassigned to open
+		sources until the budget is spent or every source is exhausted. The crawl stops early
+		with the data points gathered so far if the active deadline passes.
+
+	Args:
+		client: a valid instance of FacebookClient, InstagramClient, or TumblrClient
+		searchTerm: the searchTerm to match against
+		planner: an instance of CrawlPlanner. planner.report() can be used to inspect the
+				 crawl once this function returns.
+
+	Returns:
+		A list of relevant data points that has a count no greater than planner.limit
+	"""
 	payload = []
-	switch = limit // len(sources)
+	platform = getattr(client, "platform", None)
 	searchTerm = searchTerm.lower()
+	activeSources = planner.active_sources()
+	while activeSources and not expired(platform):
+		for state in activeSources:
+			payload.extend(crawl_source(client, searchTerm, state, planner))
+		activeSources = planner.reallocate()
+	if planner.errors.errorInfo:
+		payload.append([{"error(s)": planner.errors.errorInfo}])
+	return payload
+
+def crawl_source(client: object, searchTerm: str, state: object, planner: CrawlPlanner) -> list:
+	"""
+	Summary:
+		Crawls a single source until it fills its quota or is exhausted. The crawl resumes
+		from the last page and data point seen if the source was crawled before.
+
+	Args:
+		client: a valid instance of FacebookClient, InstagramClient, or TumblrClient
+		searchTerm: the lower case searchTerm to match against
+		state: the SourceState of the source to crawl
+		planner: the CrawlPlanner that owns state
+
+	Returns:
+		A list of parsed data points
+	"""
+	entries = []
+	platform = getattr(client, "platform", None)
 	try:
-		for source in sources:
-			count = 0
-			dataPage, nextPageLink = client.get_page(source)
-			while count < switch:	
-				for datum in dataPage:
-					if count == switch:
+		while state.collected < state.quota:
+			if expired(platform):
+				break
+			if not state.dataPage:
+				if not planner.can_fetch(state):
+					state.exhausted = True
+					break
+				if state.started:
+					try:
+						dataPage, nextPageLink = client.update_page(state.nextPageLink)
+					except KeyError:
+						# the api response has no link to another page
+						state.exhausted = True
 						break
-					else:
-						if client.match(searchTerm, datum):
-							entry = client.parse(datum)
-							payload.append(entry)
-							count += 1
-				dataPage, nextPageLink = client.update_page(nextPageLink)
+				else:
+					dataPage, nextPageLink = client.get_page(state.source)
+				planner.record_page(state, dataPage, nextPageLink)
+				continue
+			datum = state.dataPage.popleft()
+			state.scanned += 1
+			if client.match(searchTerm, datum):
+				state.matched += 1
+				if not planner.can_request(state):
+					state.exhausted = True
+					break
+				entries.append(client.parse(datum))
+				state.requests += 1
+				state.collected += 1
 	except:
-		etype, value, tb = sys.exc_info()
-		print(etype, value, tb)
-		error = SocialError(etype, value, tb)
-		payload.append([{"error(s)": error.errorInfo}])
-	finally:
-		return payload
\ No newline at end of file
+		state.exhausted = True
+		if not expired(platform):
+			planner.record_error()
+	return entries
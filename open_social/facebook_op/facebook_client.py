@@ -1,9 +1,14 @@
 from ..common.abstract_social_client import AbstractSocialClient
 from ..common.utils import search
+from ..common.process_pool import PicklableClient
+from ..common.identifier_cache import shared_identifier_cache
+from ..common.deadline import bound_session, request_timeout
+from ..common.hedging import hedged_call
+from ..common.lazy import secondary_information
 from facebook import GraphAPI
 import json, requests
 
-class FacebookClient(AbstractSocialClient):
+class FacebookClient(AbstractSocialClient, PicklableClient):
 
 	"""
 	Summary:
@@ -11,20 +16,29 @@ class FacebookClient(AbstractSocialClient):
 		has built in support for common tasks like pagination and keyword matching to extract 
 		relevant data points for the Facebook platform.
 	"""
+
+	platform = "facebook"
+	sourceKey = "pages"
+	requestTimeout = 30
 	
-	def __init__(self, access_token: str):
+	def __init__(self, access_token: str, identifierCache: object = None):
 		"""
 		Summary:
 			Creates an instance of FacebookClient
 
 		Args:
 			access_token: your facebook graph api access token
+			identifierCache: (optional) an instance of SourceIdentifierCache used to map page
+							 names to page ids. Defaults to the process wide cache.
 
 		Returns:
 			An instance of the FacebookClient class
 		"""
+		self.config = {"access_token": access_token}
+		self.identifierCache = identifierCache or shared_identifier_cache()
 		self.facebook = GraphAPI(
-			access_token = access_token)
+			access_token = access_token,
+			session = bound_session(requests.Session()))
 
 	def get_page(self, sourceName: str) -> (list, list):
 
@@ -40,12 +54,43 @@ class FacebookClient(AbstractSocialClient):
 			dataPage: a list of individual data points taken from the api response
 			nextPageLink: a list with info needed to link to the next page of data
 		"""
-		sourceId = self.facebook.get_object(sourceName)["id"]
-		rawData = self.facebook.get_connections(sourceId, "posts", fields="permalink_url,message,name,id", limit=100)
+		sourceId, rawData = self.identifierCache.fetch(
+			self.platform,
+			sourceName,
+			self.resolve_source,
+			lambda sourceId: hedged_call(self, "page", self.facebook.get_connections, sourceId, "posts", fields="permalink_url,message,name,id,created_time", limit=100))
 		dataPage = rawData["data"] 
-		nextPageLink = [rawData["paging"]["next"]]
+		nextPageLink = [rawData.get("paging", {}).get("next")]
 		return dataPage, nextPageLink
 
+	def resolve_source(self, sourceName: str) -> str:
+
+		"""
+		Summary:
+			Looks up the id of a public page. Used by the identifier cache on a miss.
+
+		Args:
+			sourceName: the name of the facebook page
+
+		Returns:
+			The id of the page
+		"""
+		return self.facebook.get_object(sourceName)["id"]
+
+	def warm_identifiers(self, sourceNames: list) -> dict:
+
+		"""
+		Summary:
+			Resolves the ids of many pages at once and stores them in the identifier cache
+
+		Args:
+			sourceNames: a list of names of public facebook pages
+
+		Returns:
+			A dictionary of page name -> page id
+		"""
+		return self.identifierCache.warm(self.platform, sourceNames, self.resolve_source)
+
 	def update_page(self, nextPageLink: list) -> (list, list):
 
 		"""
@@ -60,9 +105,9 @@ class FacebookClient(AbstractSocialClient):
 			dataPage: a list of individual data points taken from the api response
 			nextPageLink: a string linking to the next page of data
 		"""
-		rawData = requests.get(nextPageLink[0]).json()
+		rawData = hedged_call(self, "page", lambda: requests.get(nextPageLink[0], timeout=request_timeout(self.requestTimeout)).json())
 		dataPage = rawData["data"]
-		nextPageLink = [rawData["paging"]["next"]]
+		nextPageLink = [rawData.get("paging", {}).get("next")]
 		return dataPage, nextPageLink
 
 	def match(self, searchTerm: str, datum: dict) -> bool:
@@ -111,7 +156,8 @@ class FacebookClient(AbstractSocialClient):
 		Summary:
 			Gathers any secondary information that is relevant to the 
 			social data point and updates the data point with that 
-			information.
+			information. If the client has a resolver the comments are fetched
+			lazily, see common.lazy.
 
 		Args:
 			datum: the data point to be updated with secondary information
@@ -119,9 +165,8 @@ class FacebookClient(AbstractSocialClient):
 		Returns:
 			datum: the data point updated with secondary information
 		"""
-		datum["secondary_information"] = {}
-		datum["secondary_information"].update({"comments" : self.facebook.get_connections(datum["id"], "comments")})
+		datum["secondary_information"] = secondary_information(self, lambda: {"comments" : hedged_call(self, "comments", self.facebook.get_connections, datum["id"], "comments")})
 		return datum
 
-	def search(self, searchTerm: str, sources: list, limit: int) -> list:
-		return search(client=self, searchTerm=searchTerm, sources=sources, limit=limit)
\ No newline at end of file
+	def search(self, searchTerm: str, sources: list, limit: int, maxPages: int = None, maxRequests: int = None) -> list:
+		return search(client=self, searchTerm=searchTerm, sources=sources, limit=limit, maxPages=maxPages, maxRequests=maxRequests)
\ No newline at end of file
@@ -1,9 +1,15 @@
 from . import instagram_login_helper
+from .instagram_session_manager import shared_session_manager
 from ..common.abstract_social_client import AbstractSocialClient
 from ..common.utils import search
+from ..common.process_pool import PicklableClient
+from ..common.identifier_cache import shared_identifier_cache
+from ..common.hedging import hedged_call
+from ..common.lazy import secondary_information
+from ..common.media import instagram_media
 import codecs, json, os, requests
 
-class InstagramClient(AbstractSocialClient):
+class InstagramClient(AbstractSocialClient, PicklableClient):
 
 	"""
 	Summary:
@@ -12,29 +18,56 @@ class InstagramClient(AbstractSocialClient):
 		to extract relevant data points for the Instagram platform.
 	"""
 
-	def __init__(self, username: str, password: str, settings: dict = None):
+	platform = "instagram"
+	sourceKey = "relevantUsers"
+	# the instagram_private_api session is not thread safe
+	hedgeable = False
+
+	def __init__(self, username: str, password: str, settings: dict = None, sessionManager: object = None, identifierCache: object = None):
 		"""
 		Summary: 
-			Initializes an instance of the InstagramClient. The current working directory
-			is switched so that the file can locate supporting modules in the same diectory
-			given relative paths. The path is restored after the client is created.
+			Initializes an instance of the InstagramClient. Sessions are provided by an
+			InstagramSessionManager. Unless one is given, every InstagramClient of the process
+			with the same username shares one session whose settings are cached next to this
+			module, and the session is renewed in the background before its cookie expires.
 
 		Args:
 			username: your instagram username
 			password: your instagram password
-			settings: (optional) settings that override the client cache. See documentation for instagram private api.
+			settings: (optional) settings used when there is no client cache yet. See documentation for instagram private api.
+			sessionManager: (optional) an instance of InstagramSessionManager, for example one
+							that rotates across several accounts
+			identifierCache: (optional) an instance of SourceIdentifierCache used to map
+							 usernames to user ids. Defaults to the process wide cache.
 
 		Returns:
 			An instance of the InstagramClient class
 		"""
-		currpath = os.getcwd()
-		abspath = os.path.abspath(__file__)
-		dname = os.path.dirname(abspath)
-		os.chdir(dname)
-		self.instagram = instagram_login_helper.generate_client_from_cache(
-			username = username, 
-			password = password)
-		os.chdir(currpath)
+		self.config = {"username": username, "password": password, "settings": settings}
+		if sessionManager is None:
+			sessionManager = shared_session_manager(
+				username = username,
+				password = password,
+				cacheDir = os.path.dirname(os.path.abspath(__file__)),
+				settings = settings)
+		self.sessionManager = sessionManager
+		self.identifierCache = identifierCache or shared_identifier_cache()
+		self.sessionManager.get_client()
+
+	@property
+	def instagram(self) -> object:
+		"""
+		Summary:
+			The current shared session. Looked up on every access so that renewed or rotated
+			sessions are picked up.
+
+		Args:
+			None
+
+		Returns:
+			An instance of instagram_private_api.Client
+		"""
+		return self.sessionManager.get_client()
 
 	def get_page(self, sourceName: str) -> (list, list):
 
@@ -50,12 +83,43 @@ class InstagramClient(AbstractSocialClient):
 			dataPage: a list of individual data points taken from the api response
 			nextPageLink: a list with info needed to link to the next page of data
 		"""
-		sourceId = self.instagram.username_info(sourceName)["user"]["pk"]
-		rawData = self.instagram.user_feed(sourceId)
+		sourceId, rawData = self.identifierCache.fetch(
+			self.platform,
+			sourceName,
+			self.resolve_source,
+			lambda sourceId: hedged_call(self, "page", self.instagram.user_feed, sourceId))
 		dataPage = rawData["items"] 
-		nextPageLink = [sourceId, rawData["next_max_id"]]
+		nextPageLink = [sourceId, rawData.get("next_max_id")]
 		return dataPage, nextPageLink
 
+	def resolve_source(self, sourceName: str) -> str:
+
+		"""
+		Summary:
+			Looks up the user id of an instagram user. Used by the identifier cache on a miss.
+
+		Args:
+			sourceName: the instagram username
+
+		Returns:
+			The user's pk
+		"""
+		return self.instagram.username_info(sourceName)["user"]["pk"]
+
+	def warm_identifiers(self, sourceNames: list) -> dict:
+
+		"""
+		Summary:
+			Resolves the user ids of many users at once and stores them in the identifier cache
+
+		Args:
+			sourceNames: a list of instagram usernames
+
+		Returns:
+			A dictionary of username -> user id
+		"""
+		return self.identifierCache.warm(self.platform, sourceNames, self.resolve_source)
+
 	def update_page(self, nextPageLink: list) -> (list, list):
 
 		"""
@@ -70,9 +134,9 @@ class InstagramClient(AbstractSocialClient):
 			dataPage: a list of individual data points taken from the api response
 			nextPageLink: a list with info needed to link to the next page of data
 		"""
-		rawData      = self.instagram.user_feed(nextPageLink[0], max_id=nextPageLink[1])
+		rawData      = hedged_call(self, "page", self.instagram.user_feed, nextPageLink[0], max_id=nextPageLink[1])
 		dataPage     = rawData["items"]
-		nextPageLink = [nextPageLink[0], rawData["next_max_id"]]
+		nextPageLink = [nextPageLink[0], rawData.get("next_max_id")]
 		return dataPage, nextPageLink
 
 	def match(self, searchTerm: str, datum: dict) -> bool:
@@ -118,7 +182,8 @@ class InstagramClient(AbstractSocialClient):
 			"date": datum["taken_at"],
 			"like_count": datum["like_count"],
 			"comment_count": datum["comment_count"],
-			"pkId": datum["pk"] 
+			"pkId": datum["pk"],
+			"media": instagram_media(datum)
 		}
 		try:
 			parsedDatum["location"] = datum["location"]
@@ -133,7 +198,8 @@ class InstagramClient(AbstractSocialClient):
 		Summary:
 			Gathers any secondary information that is relevant to the 
 			social data point and updates the data point with that 
-			information.
+			information. If the client has a resolver the comments are fetched
+			lazily, see common.lazy.
 
 		Args:
 			datum: the data point to be updated with secondary information
@@ -141,9 +207,23 @@ class InstagramClient(AbstractSocialClient):
 		Returns:
 			datum: the data point updated with secondary information
 		"""
-		datum["secondary_information"] = {}
+		datum["secondary_information"] = secondary_information(self, lambda: {"comments": self.get_comments(datum["media_id"])})
+		return datum
+
+	def get_comments(self, mediaId: str) -> list:
+
+		"""
+		Summary:
+			Gets the first page of comments of a post
+
+		Args:
+			mediaId: the media id of the post
+
+		Returns:
+			A list of comment dictionaries
+		"""
 		comments   = []
-		firstPage  = self.instagram.media_comments(datum["media_id"])
+		firstPage  = hedged_call(self, "comments", self.instagram.media_comments, mediaId)
 		for comment in firstPage["comments"]:
 			comments.append({
 				"id": comment["pk"],
@@ -153,8 +233,7 @@ class InstagramClient(AbstractSocialClient):
 				"owner_username": comment["user"]["username"],
 				"full_name": comment["user"]["full_name"]
 			})
-		datum["secondary_information"].update({"comments": comments})
-		return datum
+		return comments
 
-	def search(self, searchTerm: str, sources: list, limit: int):
-		return search(client=self, searchTerm=searchTerm, sources=sources, limit=limit)
\ No newline at end of file
+	def search(self, searchTerm: str, sources: list, limit: int, maxPages: int = None, maxRequests: int = None):
+		return search(client=self, searchTerm=searchTerm, sources=sources, limit=limit, maxPages=maxPages, maxRequests=maxRequests)
\ No newline at end of file
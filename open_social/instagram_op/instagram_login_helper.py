@@ -1,4 +1,5 @@
 # CREDIT: https://github.com/ping/instagram_private_api
+from ..common.file_lock import FileLock
 import codecs, datetime, json, os.path, sys
 
 try:
@@ -69,7 +70,8 @@ def generate_client_from_cache(username: str, password: str, settingsFilePath: s
 	Summary:
 		Generates an instance of instagram_private_api.Client that reuses saved settings,
 		like cookies, to minimize login attempts. If no file exists, then a settings file
-		will be generated.
+		will be generated. The settings file is read and written while holding a file lock,
+		so concurrent processes do not race on it. Errors are raised to the caller.
 		CREDIT: https://github.com/ping/instagram_private_api
 
 	Args:
@@ -80,44 +82,38 @@ def generate_client_from_cache(username: str, password: str, settingsFilePath: s
 	Returns:
 		An instance of instagram_private_api.Client
 	"""
-	try:
-		if settingsFilePath == None:
-			settingsFile = "instagram_client_cache.json"
-		else:
-			settingsFile = settingsFilePath
-		if not os.path.isfile(settingsFile):
-			# settings file does not exist
-			print('Unable to find file: {0!s}'.format(settingsFile))
-			# login new
-			api = Client(
+	settingsFile = "instagram_client_cache.json" if settingsFilePath == None else settingsFilePath
+	with FileLock(settingsFile + ".lock"):
+		try:
+			if not os.path.isfile(settingsFile):
+				# settings file does not exist
+				print('Unable to find file: {0!s}'.format(settingsFile))
+				# login new
+				api = Client(
+					username, password,
+					on_login=lambda x: onlogin_callback(x, settingsFile))
+			else:
+				with open(settingsFile) as fileData:
+					cachedSettings = json.load(fileData, object_hook=from_json)
+				print('Reusing settings: {0!s}'.format(settingsFile))
+				# reuse auth settings
+				api = Client(
+					username, password,
+					settings=cachedSettings)
+			return api
+		except (ClientCookieExpiredError, ClientLoginRequiredError) as e:
+			print('ClientCookieExpiredError/ClientLoginRequiredError: {0!s}'.format(e))
+			# Login expired
+			# Do relogin but use default ua, keys and such
+			return Client(
 				username, password,
 				on_login=lambda x: onlogin_callback(x, settingsFile))
-		else:
-			with open(settingsFile) as fileData:
-				cachedSettings = json.load(fileData, object_hook=from_json)
-			print('Reusing settings: {0!s}'.format(settingsFile))
-			#deviceId = cachedSettings.get('device_id')
-			# reuse auth settings
-			api = Client(
-				username, password,
-				settings=cachedSettings)
-		return api
-	except (ClientCookieExpiredError, ClientLoginRequiredError) as e:
-		print('ClientCookieExpiredError/ClientLoginRequiredError: {0!s}'.format(e))
-		# Login expired
-		# Do relogin but use default ua, keys and such
-		api = Client(
-			username, password,
-			on_login=lambda x: onlogin_callback(x, settingsFilePath))
-	except ClientLoginError as e:
-		print('ClientLoginError {0!s}'.format(e))
-		exit(9)
-	except ClientError as e:
-		print('ClientError {0!s} (Code: {1:d}, Response: {2!s})'.format(e.msg, e.code, e.error_response))
-		exit(9)
-	except Exception as e:
-		print('Unexpected Exception: {0!s}'.format(e))
-		exit(99)
+		except ClientLoginError as e:
+			print('ClientLoginError {0!s}'.format(e))
+			raise
+		except ClientError as e:
+			print('ClientError {0!s} (Code: {1:d}, Response: {2!s})'.format(e.msg, e.code, e.error_response))
+			raise
 
 def show_cookie_expiry(api: object) -> str:
 	"""
@@ -0,0 +1,357 @@
+from ..common.file_lock import FileLock
+from .instagram_login_helper import Client, ClientCookieExpiredError, ClientLoginRequiredError, from_json, to_json
+import json, os, threading, time
+
+class InstagramSessionManager(object):
+
+	"""
+	Summary:
+		Shares authenticated instagram_private_api.Client sessions across threads and processes.
+		Settings are cached per account in a json file guarded by a file lock, so a login done by
+		one process is reused by every other process. A background thread logs in again shortly
+		before the session cookie expires, and sessions can rotate across several accounts.
+	"""
+
+	legacyCacheName = "instagram_client_cache.json"
+
+	def __init__(self, accounts: list, cacheDir: str = ".", refreshMargin: float = 3600, checkInterval: float = 300, settings: dict = None):
+		"""
+		Summary:
+			Initializes an instance of InstagramSessionManager. No login happens until a client
+			is requested.
+
+		Args:
+			accounts: a list of (username, password) tuples
+			cacheDir: (optional) the directory holding the settings cache and lock files
+			refreshMargin: (optional) seconds before cookie expiry at which the session is renewed
+			checkInterval: (optional) the longest number of seconds the refresh thread sleeps. A
+						   session is not renewed again within checkInterval seconds of a login,
+						   even if its cookie expires sooner than refreshMargin.
+			settings: (optional) settings used for the first account when it has no cache yet
+
+		Returns:
+			An instance of the InstagramSessionManager class
+		"""
+		if not accounts:
+			raise ValueError("InstagramSessionManager needs at least one account")
+		self.accounts = list(accounts)
+		self.cacheDir = cacheDir
+		self.refreshMargin = refreshMargin
+		self.checkInterval = checkInterval
+		self.settings = settings
+		self.current = 0
+		self.clients = {}
+		self.loginTimes = {}
+		self.locks = {}
+		self.lock = threading.RLock()
+		self.stopEvent = threading.Event()
+		self.refreshThread = None
+
+	def cache_path(self, username: str) -> str:
+		"""
+		Summary:
+			The path of the settings cache for an account
+
+		Args:
+			username: an instagram username
+
+		Returns:
+			The path of the cache file
+		"""
+		return os.path.join(self.cacheDir, "instagram_client_cache_{username}.json".format(username=username))
+
+	def legacy_cache_path(self) -> str:
+		"""
+		Summary:
+			The path of the single account cache written by earlier versions. It is read for the
+			first account when that account has no cache of its own yet.
+
+		Args:
+			None
+
+		Returns:
+			The path of the legacy cache file
+		"""
+		return os.path.join(self.cacheDir, self.legacyCacheName)
+
+	def file_lock(self, username: str) -> FileLock:
+		"""
+		Summary:
+			The file lock guarding the settings cache of an account
+
+		Args:
+			username: an instagram username
+
+		Returns:
+			An instance of FileLock
+		"""
+		with self.lock:
+			if username not in self.locks:
+				self.locks[username] = FileLock(self.cache_path(username) + ".lock")
+			return self.locks[username]
+
+	def get_client(self) -> object:
+		"""
+		Summary:
+			Returns the shared session of the current account, creating it from the cache or by
+			logging in if needed
+
+		Args:
+			None
+
+		Returns:
+			An instance of instagram_private_api.Client
+		"""
+		with self.lock:
+			username, password = self.accounts[self.current]
+			if username not in self.clients:
+				self.clients[username] = self.load_or_login(username, password)
+			return self.clients[username]
+
+	def rotate(self) -> object:
+		"""
+		Summary:
+			Switches to the next account, for example after the current one was throttled
+
+		Args:
+			None
+
+		Returns:
+			The session of the next account
+		"""
+		with self.lock:
+			self.current = (self.current + 1) % len(self.accounts)
+			return self.get_client()
+
+	def expires_at(self, api: object) -> float:
+		"""
+		Summary:
+			The time the session cookie of a client expires
+
+		Args:
+			api: an instance of instagram_private_api.Client
+
+		Returns:
+			Seconds since the epoch, or None if the cookie has no expiry
+		"""
+		try:
+			return api.cookie_jar.expires_earliest
+		except Exception:
+			return None
+
+	def recently_logged_in(self, username: str) -> bool:
+		"""
+		Summary:
+			Checks whether this process logged in to an account less than checkInterval seconds
+			ago. Used to avoid logging in over and over when sessions live shorter than
+			refreshMargin.
+
+		Args:
+			username: an instagram username
+
+		Returns:
+			True if the last login is newer than checkInterval seconds
+		"""
+		return time.time() - self.loginTimes.get(username, float("-inf")) < self.checkInterval
+
+	def is_fresh(self, api: object) -> bool:
+		"""
+		Summary:
+			Checks whether a session is valid for longer than the refresh margin
+
+		Args:
+			api: an instance of instagram_private_api.Client
+
+		Returns:
+			True if the session does not need to be renewed yet
+		"""
+		expiresAt = self.expires_at(api)
+		return expiresAt is None or expiresAt - time.time() > self.refreshMargin
+
+	def read_cache(self, username: str) -> dict:
+		"""
+		Summary:
+			Reads the cached settings of an account. Must be called while holding its file lock.
+			The first account falls back to the legacy cache file.
+
+		Args:
+			username: an instagram username
+
+		Returns:
+			The cached settings, or None if there is no readable cache
+		"""
+		paths = [self.cache_path(username)]
+		if username == self.accounts[0][0]:
+			paths.append(self.legacy_cache_path())
+		for path in paths:
+			try:
+				with open(path) as fileData:
+					return json.load(fileData, object_hook=from_json)
+			except (IOError, ValueError):
+				continue
+		return None
+
+	def write_cache(self, username: str, api: object):
+		"""
+		Summary:
+			Atomically replaces the cached settings of an account. Must be called while holding
+			its file lock.
+
+		Args:
+			username: an instagram username
+			api: the instance of instagram_private_api.Client to save
+
+		Returns:
+			None
+		"""
+		cachePath = self.cache_path(username)
+		tmpPath = "{path}.{pid}.tmp".format(path=cachePath, pid=os.getpid())
+		with open(tmpPath, "w") as outfile:
+			json.dump(api.settings, outfile, default=to_json)
+		os.replace(tmpPath, cachePath)
+
+	def load_or_login(self, username: str, password: str, force: bool = False) -> object:
+		"""
+		Summary:
+			Builds a session for an account while holding its file lock. The cache is reused
+			when it holds a session that is not about to expire, which covers the case where
+			another process logged in while this one waited for the lock. Otherwise a new login
+			is done and written to the cache.
+
+		Args:
+			username: an instagram username
+			password: an instagram password
+			force: (optional) ignore sessions that are no newer than the one held in memory
+
+		Returns:
+			An instance of instagram_private_api.Client
+		"""
+		with self.file_lock(username):
+			current = self.clients.get(username)
+			cachedSettings = self.read_cache(username)
+			if cachedSettings is None and self.settings is not None and username == self.accounts[0][0]:
+				cachedSettings = self.settings
+			if cachedSettings is not None:
+				try:
+					api = Client(username, password, settings=cachedSettings)
+					newer = current is None or (self.expires_at(api) or 0) > (self.expires_at(current) or 0)
+					if self.is_fresh(api) and (newer or not force):
+						if not os.path.exists(self.cache_path(username)):
+							self.write_cache(username, api)
+						return api
+				except (ClientCookieExpiredError, ClientLoginRequiredError):
+					pass
+			api = Client(username, password)
+			self.loginTimes[username] = time.time()
+			self.write_cache(username, api)
+			return api
+
+	def refresh(self, force: bool = False) -> object:
+		"""
+		Summary:
+			Renews the session of the current account if it is about to expire and was not
+			logged in within the last checkInterval seconds
+
+		Args:
+			force: (optional) renew the session even if it is still fresh
+
+		Returns:
+			The current session
+		"""
+		with self.lock:
+			username, password = self.accounts[self.current]
+			api = self.clients.get(username)
+		if api is not None and not force and (self.is_fresh(api) or self.recently_logged_in(username)):
+			return api
+		# log in without holding self.lock so threads keep using the old session meanwhile
+		api = self.load_or_login(username, password, force=True)
+		with self.lock:
+			self.clients[username] = api
+		return api
+
+	def start(self):
+		"""
+		Summary:
+			Starts the background thread that renews sessions before their cookies expire
+
+		Args:
+			None
+
+		Returns:
+			None
+		"""
+		with self.lock:
+			if self.refreshThread is not None and self.refreshThread.is_alive():
+				return
+			self.stopEvent.clear()
+			self.refreshThread = threading.Thread(target=self.refresh_loop, daemon=True)
+			self.refreshThread.start()
+
+	def stop(self):
+		"""
+		Summary:
+			Stops the background refresh thread
+
+		Args:
+			None
+
+		Returns:
+			None
+		"""
+		self.stopEvent.set()
+		if self.refreshThread is not None:
+			self.refreshThread.join()
+
+	def refresh_loop(self):
+		"""
+		Summary:
+			Body of the background refresh thread. Sleeps until refreshMargin seconds before the
+			current session expires (at most checkInterval seconds), then renews it.
+
+		Args:
+			None
+
+		Returns:
+			None
+		"""
+		while not self.stopEvent.is_set():
+			with self.lock:
+				username = self.accounts[self.current][0]
+				api = self.clients.get(username)
+			delay = self.checkInterval
+			if api is not None and self.expires_at(api) is not None and not self.recently_logged_in(username):
+				delay = min(delay, max(self.expires_at(api) - self.refreshMargin - time.time(), 0))
+			if self.stopEvent.wait(delay):
+				return
+			try:
+				if api is not None:
+					self.refresh()
+			except Exception as e:
+				print("Instagram session refresh failed: {error!s}".format(error=e))
+				self.stopEvent.wait(self.checkInterval)
+
+sharedManagers = {}
+sharedManagersLock = threading.Lock()
+
+def shared_session_manager(username: str, password: str, cacheDir: str, settings: dict = None) -> InstagramSessionManager:
+	"""
+	Summary:
+		Returns the process wide session manager for an account, creating it and starting its
+		refresh thread on first use, so every InstagramClient of the process shares one session.
+
+	Args:
+		username: an instagram username
+		password: an instagram password
+		cacheDir: the directory holding the settings cache and lock files
+		settings: (optional) settings used when the account has no cache yet
+
+	Returns:
+		An instance of InstagramSessionManager
+	"""
+	with sharedManagersLock:
+		key = (os.path.abspath(cacheDir), username)
+		if key not in sharedManagers:
+			manager = InstagramSessionManager([(username, password)], cacheDir=cacheDir, settings=settings)
+			manager.start()
+			sharedManagers[key] = manager
+		return sharedManagers[key]
@@ -1,3 +1,14 @@
+from .common import process_pool
+from .common.deadline import as_deadline, partial_flag
+from .common.hedging import Hedger
+from .common.lazy import SecondaryResolver, resolve
+from .common.media import MediaStore, find_media
+from .common.query_cache import QueryCache, client_options
+from .common.monitor import SourceMonitor
+from .common.pipeline import crawl_pipeline
+from .common.record_file import RecordFileWriter
+from .common.result_frame import ResultFrame
+from .common.result_store import ResultStore
 from .common.social_error import SocialError 
 from .facebook_op.facebook_client import FacebookClient 
 from .instagram_op.instagram_client import InstagramClient 
@@ -15,6 +26,8 @@ class OpenSocial(object):
 		generation, containment, and command execution so that data can be gathered from each social
 		media platform with ease. 
 	"""
+
+	queryCache = None
 	
 	def __init__(self, clients: str = ["facebook","twitter","reddit","tumblr","instagram"]):
 		"""
@@ -92,7 +105,7 @@ class OpenSocial(object):
 					clientFlag=clientFlag,
 					details=str(error)))
 
-	def get_data(self, client: object, searchTerm: str, limit: int, **kwargs) -> dict:
+	def get_data(self, client: object, searchTerm: str, limit: int, deadline: object = None, **kwargs) -> dict:
 		"""
 		Summary:
 			Runs the search function related to a given social media client object.
@@ -105,34 +118,86 @@ class OpenSocial(object):
 						contains the search term, then the datapoint will be included in
 						the results.
 			limit: the upper limit for the number of search results returned
+			deadline: (optional) a number of seconds or an instance of common.deadline.Deadline.
+					  Request timeouts, pagination and secondary information requests are
+					  bounded by it, and once it passes the search returns the data points
+					  gathered so far with a {"partial": ...} entry appended.
 			kwargs:
 				- pages: names of public facebook pages to include in your search
 				- relevantUsers: names of instagram users to include in your search
 				- subReddits: names of subreddits to include in your search
 				- blogs: names of tumblr blogs to include in your search
+				- maxPages: (optional) the maximum number of pages fetched per page, user or blog.
+						    Unbounded by default.
+				- maxRequests: (optional) the maximum number of requests issued per page, user or blog
+				- resultType: (optional) the twitter result type, "popular", "recent" or "mixed".
+							  Defaults to "popular".
 
 		Returns:
 			A dict of parsed search results from the social media platform related to the 
 			client type given as client. None is returned if the client type is sunsupported.
+			With a query cache (see enable_query_cache) cached results are returned when the
+			same query was run recently by a client with the same options.
 			dict -> {source: [data]}
 		"""
 		kwargs = kwargs["kwargs"] if "kwargs" in kwargs.keys() else kwargs
+		deadline = as_deadline(deadline)
+		if self.queryCache is not None:
+			sourceKey = getattr(client, "sourceKey", None)
+			key = self.queryCache.key(
+				getattr(client, "platform", type(client).__name__),
+				searchTerm,
+				kwargs.get(sourceKey) if sourceKey is not None else None,
+				limit,
+				dict({key: kwargs[key] for key in ["maxPages", "maxRequests", "resultType"] if key in kwargs.keys()}, client=client_options(client)))
+			return self.queryCache.fetch(
+				key,
+				lambda: self.run_search(client, searchTerm, limit, deadline, kwargs),
+				lambda: self.run_search(client, searchTerm, limit, None, kwargs),
+				deadline)
+		return self.run_search(client, searchTerm, limit, deadline, kwargs)
+
+	def run_search(self, client: object, searchTerm: str, limit: int, deadline: object, kwargs: dict) -> dict:
+		"""
+		Summary:
+			Runs the search function related to a given social media client object, bypassing
+			the query cache. See get_data.
+
+		Args:
+			client: an instance of FacebookClient, InstagramClient, RedditClient, TumblrClient, or
+					TwitterClient.
+			searchTerm: the search term to match data points against
+			limit: the upper limit for the number of search results returned
+			deadline: an instance of common.deadline.Deadline, or None
+			kwargs: the key word arguments accepted by get_data
+
+		Returns:
+			A dict of parsed search results, or None if the client type is unsupported
+		"""
+		if deadline is not None:
+			with deadline.activate():
+				payload = self.run_search(client, searchTerm, limit, None, kwargs)
+			for platform, records in (payload or {}).items():
+				if deadline.is_partial(platform):
+					records.append(partial_flag())
+			return payload
+		crawlOptions = {key: kwargs[key] for key in ["maxPages", "maxRequests"] if key in kwargs.keys()}
 		if isinstance(client, FacebookClient):
 			print("@Starting Facebook Search...")
 			print("START TIME: ", str(time.time()))
-			payload = self.search_facebook(client, searchTerm, pages=kwargs["pages"], limit=limit)
+			payload = self.search_facebook(client, searchTerm, pages=kwargs["pages"], limit=limit, **crawlOptions)
 			print("END TIME: ", str(time.time()))
 			return payload
 		elif isinstance(client, InstagramClient):
 			print("@Starting Instagram Search...")
 			print("START TIME: ", str(time.time()))
-			payload = self.search_instagram(client, searchTerm, relevantUsers=kwargs["relevantUsers"], limit=limit)
+			payload = self.search_instagram(client, searchTerm, relevantUsers=kwargs["relevantUsers"], limit=limit, **crawlOptions)
 			print("END TIME: ", str(time.time()))
 			return payload
 		elif isinstance(client, TwitterClient):
 			print("@Starting Twitter Search...")
 			print("START TIME: ", str(time.time()))
-			payload = self.search_twitter(client, searchTerm, limit)
+			payload = self.search_twitter(client, searchTerm, limit, kwargs.get("resultType", "popular"))
 			print("END TIME: ", str(time.time()))
 			return payload
 		elif isinstance(client, RedditClient):
@@ -144,24 +209,31 @@ class OpenSocial(object):
 		elif isinstance(client, TumblrClient):
 			print("@Starting Tumblr Search...")
 			print("START TIME: ", str(time.time()))
-			payload = self.search_tumblr(client, searchTerm, blogs=kwargs["blogs"], limit=limit)
+			payload = self.search_tumblr(client, searchTerm, blogs=kwargs["blogs"], limit=limit, **crawlOptions)
 			print("END TIME: ", str(time.time()))
 			return payload
 		else:
 			print("Unsupported client type...")
 
-	def evaluate_all_clients(self, searchTerm: str, limit: int, **kwargs) -> dict:
+	def evaluate_all_clients(self, searchTerm: str, limit: int, executor: str = "thread", deadline: object = None, grace: float = 0.25, **kwargs) -> dict:
 		"""
 		Summary:
-			*|* This is a temporary work around until serialization issues for *|*
-			*|* the multiprocessing library are worked out.                    *|*
-
 			Executes a search on all available clients contained in self.clients. You
 			must define all possible key word arguments for all client types in **kwargs.
+			With executor="process" every client is pickled as its configuration, rebuilt in
+			a worker process, and its results come back as one compressed batch, so parsing
+			and matching for different platforms run on separate cores.
 
 		Args:
 			searchTerm: the term to filter data on
 			limit: the upper limit for the number of datapoints returned by the search
+			executor: (optional) "thread" to search in a thread pool or "process" to search in
+					  a process pool
+			deadline: (optional) a number of seconds or an instance of common.deadline.Deadline
+					  shared by every client. Once it passes, clients stop at their next request,
+					  page or data point and hand back what they gathered, and clients that are
+					  still running grace seconds later are cancelled and left behind.
+			grace: (optional) the number of seconds clients get after the deadline to return
 			kwargs:
 				- pages: names of public facebook pages to include in your search
 				- relevantUsers: names of instagram users to include in your search
@@ -170,21 +242,196 @@ class OpenSocial(object):
 
 		Returns:
 			A dictionary containing search results for all clients. The keys of this dictionary
-			consist of 
+			consist of the platform names of the clients that returned data. With a deadline,
+			the results of platforms cut short end with a {"partial": ...} entry, and platforms
+			that did not return in time map to a list holding only that entry.
 		"""
 		results = {}
 		workerSize = len(self.clients)
-		with concurrent.futures.ThreadPoolExecutor(max_workers=workerSize) as executor:
-			future_set = {executor.submit(self.get_data, client, searchTerm, limit, kwargs=kwargs["kwargs"]): client for client in self.clients}
-			for future in concurrent.futures.as_completed(future_set):
+		kwargs = kwargs["kwargs"] if "kwargs" in kwargs.keys() else kwargs
+		deadline = as_deadline(deadline)
+		if executor == "process":
+			pool = concurrent.futures.ProcessPoolExecutor(max_workers=workerSize)
+			future_set = {pool.submit(process_pool.search_client, client, searchTerm, limit, kwargs, deadline): client for client in self.clients}
+		else:
+			pool = concurrent.futures.ThreadPoolExecutor(max_workers=workerSize)
+			future_set = {pool.submit(self.get_data, client, searchTerm, limit, deadline=deadline, kwargs=kwargs): client for client in self.clients}
+		try:
+			done, pending = concurrent.futures.wait(future_set, timeout=None if deadline is None else deadline.remaining() + grace)
+			for future in done:
 				try:
-					data = future.result()
-					results.update(data)
+					if executor == "process":
+						platform, batch = future.result()
+						results[platform] = process_pool.decode_batch(batch)
+					else:
+						results.update(future.result())
 				except Exception as e:
-					print("Error during search: {error!s}".format({"error": str(e)}))
+					print("Error during search: {error!s}".format(error=str(e)))
+			if pending:
+				deadline.cancel()
+				for future in pending:
+					future.cancel()
+					results[future_set[future].platform] = [partial_flag()]
+		finally:
+			# shutdown(cancel_futures=True) needs python 3.9
+			for future in future_set:
+				future.cancel()
+			pool.shutdown(wait=deadline is None)
 		return results
 
-	def search_facebook(self, client: object, searchTerm: str, pages: list, limit: int) -> dict:
+	def search_sources(self, client: object, searchTerm: str, limit: int, maxWorkers: int = None, **kwargs) -> dict:
+		"""
+		Summary:
+			Executes a search for a single client with its sources split across a process pool.
+			Use this for crawls over many pages, users, subreddits or blogs where parsing and
+			matching keep a single core busy.
+
+		Args:
+			client: an instance of FacebookClient, InstagramClient, RedditClient, or TumblrClient
+			searchTerm: the term to filter data on
+			limit: the upper limit for the number of datapoints returned by the search
+			maxWorkers: (optional) the number of worker processes. Defaults to the cpu count.
+			kwargs: the same key word arguments accepted by get_data
+
+		Returns:
+			A dict of parsed search results from the client's platform.
+			dict -> {source: [data]}
+		"""
+		kwargs = kwargs["kwargs"] if "kwargs" in kwargs.keys() else kwargs
+		if client.sourceKey is None:
+			return self.get_data(client, searchTerm, limit, kwargs=kwargs)
+		crawlOptions = {key: kwargs[key] for key in ["maxPages", "maxRequests"] if key in kwargs.keys()}
+		return {client.platform: process_pool.search_sources(client, searchTerm, kwargs[client.sourceKey], limit, maxWorkers, **crawlOptions)}
+
+	def warm_identifiers(self, **kwargs) -> dict:
+		"""
+		Summary:
+			Resolves the ids of facebook pages and instagram users in bulk so that later
+			searches skip the name -> id lookups. Ids are kept in a persistent cache shared by
+			the facebook and instagram clients.
+
+		Args:
+			kwargs:
+				- pages: names of public facebook pages
+				- relevantUsers: names of instagram users
+
+		Returns:
+			A dictionary of platform -> {name: id}
+		"""
+		kwargs = kwargs["kwargs"] if "kwargs" in kwargs.keys() else kwargs
+		payload = {}
+		for client in self.clients:
+			if hasattr(client, "warm_identifiers") and client.sourceKey in kwargs.keys():
+				payload[client.platform] = client.warm_identifiers(kwargs[client.sourceKey])
+		return payload
+
+	def enable_hedging(self, hedger: object = None, **options) -> object:
+		"""
+		Summary:
+			Turns on request hedging for every client whose api object can be shared between
+			threads. Page requests and secondary information requests slower than the observed
+			pN latency of their platform are sent a second time. Reddit and Instagram clients
+			and clients rebuilt in worker processes do not hedge.
+
+		Args:
+			hedger: (optional) an instance of common.hedging.Hedger to share
+			options: (optional) percentile, maxHedgeRate, minDelay, window, minSamples and
+					 maxWorkers used to create a Hedger when hedger is not given
+
+		Returns:
+			The Hedger. Call its report() to see hedge rates and thresholds per platform.
+		"""
+		hedger = hedger or Hedger(**options)
+		for client in self.clients:
+			if getattr(client, "hedgeable", True):
+				client.hedger = hedger
+		return hedger
+
+	def enable_query_cache(self, cache: object = None, **options) -> object:
+		"""
+		Summary:
+			Turns on the query cache used by get_data and evaluate_all_clients. Repeated
+			searches for the same platform, term, sources, limit and crawl options return
+			cached results, stale results are refreshed in the background, and identical
+			searches running at the same time share one crawl.
+
+		Args:
+			cache: (optional) an instance of common.query_cache.QueryCache to share
+			options: (optional) ttl, staleTtl, maxEntries, path and workers used to create a
+					 QueryCache when cache is not given
+
+		Returns:
+			The QueryCache. Call its report() to see hit rates.
+		"""
+		self.queryCache = cache or QueryCache(**options)
+		return self.queryCache
+
+	def set_secondary_mode(self, mode: str = "lazy", **options) -> object:
+		"""
+		Summary:
+			Chooses when clients fetch secondary information like comments. "eager" fetches it
+			before a data point is returned. "lazy" returns data points right away with a
+			handle in secondary_information that fetches on first access, together with the
+			next pending handles. "background" starts fetching every handle as soon as the data
+			point is returned. Tumblr notes are deferred with the deferNotes client option
+			instead.
+
+		Args:
+			mode: (optional) "eager", "lazy" or "background"
+			options: (optional) batchSize and workers of the SecondaryResolver
+
+		Returns:
+			The SecondaryResolver shared by the clients, or None in eager mode
+		"""
+		resolver = None if mode == "eager" else SecondaryResolver(background=mode == "background", **options)
+		for client in self.clients:
+			client.resolver = resolver
+		return resolver
+
+	def create_monitor(self, sink: object, **kwargs) -> object:
+		"""
+		Summary:
+			Creates a long running monitor that re-polls (platform, source, term) subscriptions
+			with this instance's clients. Register subscriptions with monitor.subscribe and
+			start polling with monitor.run.
+
+		Args:
+			sink: an instance of JsonLinesSink, MemorySink or another AbstractSink that receives
+				  new data points
+			kwargs: (optional) scheduling options accepted by SourceMonitor, like minInterval,
+					maxInterval and targetNew
+
+		Returns:
+			An instance of SourceMonitor
+		"""
+		return SourceMonitor(self.clients, sink, **kwargs)
+
+	def crawl_pipeline(self, client: object, searchTerm: str, limit: int, sink: object, **kwargs) -> list:
+		"""
+		Summary:
+			Crawls with the staged fetch -> match -> dedupe -> enrich -> sink pipeline, writing
+			data points to sink as they are parsed instead of collecting them in memory.
+
+		Args:
+			client: an instance of any of the five clients
+			searchTerm: the term to match against
+			limit: the upper limit for the number of data points written
+			sink: an instance of JsonLinesSink, ResultStore or another AbstractSink
+			kwargs:
+				- pages, relevantUsers, subReddits or blogs: the sources of the client. Twitter
+				  is searched with searchTerm as its only source.
+				- fetchWorkers, matchWorkers, enrichWorkers, queueSize, maxPages, batchSize:
+				  (optional) pipeline settings, see common.pipeline.crawl_pipeline
+
+		Returns:
+			The report of every pipeline stage
+		"""
+		kwargs = kwargs["kwargs"] if "kwargs" in kwargs.keys() else dict(kwargs)
+		sources = kwargs.pop(client.sourceKey) if client.sourceKey is not None else [searchTerm]
+		kwargs = {key: value for key, value in kwargs.items() if key not in ["pages", "relevantUsers", "subReddits", "blogs"]}
+		return crawl_pipeline(client, searchTerm, sources, limit, sink, **kwargs).run(sources)
+
+	def search_facebook(self, client: object, searchTerm: str, pages: list, limit: int, **crawlOptions) -> dict:
 		"""
 		Summary:
 			Executes a search on public facebook pages. Loops through results and extracts
@@ -195,18 +442,19 @@ class OpenSocial(object):
 			searchTerm: the term to filter data on
 			pages: a list of names of public pages on facebook
 			limit: the upper limit for the number of datapoints returned by the search
+			crawlOptions: (optional) maxPages and maxRequests bounds passed to the crawl planner
 
 		Returns:
 			A dictionary of processed datapoints from public facebook pages.
 			dict -> {source: [data]}
 		"""
 		try:
-			return {"facebook": client.search(searchTerm, pages, limit)}
+			return {"facebook": client.search(searchTerm, pages, limit, **crawlOptions)}
 		except Exception as e:
 			print("Could not complete facebook search...")
 			print("ERROR: {error!s}".format({"error": str(e)}))
 
-	def search_instagram(self, client: object, searchTerm: str, relevantUsers: list, limit: int) -> dict:
+	def search_instagram(self, client: object, searchTerm: str, relevantUsers: list, limit: int, **crawlOptions) -> dict:
 		"""
 		Summary:
 			Executes a search on public instagram profiles. Loops through results and extracts
@@ -217,18 +465,19 @@ class OpenSocial(object):
 			searchTerm: the term to filter data on
 			relevantUsers: a list of names of public profiles on Instagram
 			limit: the upper limit for the number of datapoints returned by the search
+			crawlOptions: (optional) maxPages and maxRequests bounds passed to the crawl planner
 
 		Returns:
 			A dictionary of processed datapoints from public instagram profiles.
 			dict -> {source: [data]}
 		"""
 		try:
-			return {"instagram": client.search(searchTerm, relevantUsers, limit)}
+			return {"instagram": client.search(searchTerm, relevantUsers, limit, **crawlOptions)}
 		except Exception as e:
 			print("Could not complete instagram search...")
 			print("ERROR: {error!s}".format({"error": str(e)}))
 
-	def search_twitter(self, client: object, searchTerm: str, limit: int) -> dict:
+	def search_twitter(self, client: object, searchTerm: str, limit: int, resultType: str = "popular") -> dict:
 		"""
 		Summary:
 			Executes a search on "popular" tweets. Filters tweets based on the search term
@@ -238,13 +487,14 @@ class OpenSocial(object):
 			client: an instance of TwitterClient
 			searchTerm: the term to filter data on
 			limit: the upper limit for the number of datapoints returned by the search
+			resultType: (optional) "popular", "recent" or "mixed"
 
 		Returns:
 			A dictionary of processed datapoints from twitter's "popular" tweet dataset.
 			dict -> {source: [data]}
 		"""
 		try:
-			return {"twitter": client.search(searchTerm, limit)}
+			return {"twitter": client.search(searchTerm, limit, resultType=resultType)}
 		except Exception as e:
 			print("Could not complete twitter search...")
 			print("ERROR: {error!s}".format({"error": str(e)}))
@@ -271,7 +521,7 @@ class OpenSocial(object):
 			print("Could not complete reddit search...")
 			print("ERROR: {error!s}".format({"error": str(e)}))
 
-	def search_tumblr(self, client: object, searchTerm: str, blogs: list, limit: int) -> dict:
+	def search_tumblr(self, client: object, searchTerm: str, blogs: list, limit: int, **crawlOptions) -> dict:
 		"""
 		Summary:
 			Executes a search on public tumblr blogs. Loops through results and extracts
@@ -282,18 +532,19 @@ class OpenSocial(object):
 			searchTerm: the term to filter data on
 			blogs: a list of names of public blogs
 			limit: the upper limit for the number of datapoints returned by the search
+			crawlOptions: (optional) maxPages and maxRequests bounds passed to the crawl planner
 
 		Returns:
 			A dict of processed datapoints from blogs.
 			dict -> {source: [data]}
 		"""
 		try:
-			return {"tumblr": client.search(searchTerm, blogs, limit)}
+			return {"tumblr": client.search(searchTerm, blogs, limit, **crawlOptions)}
 		except Exception as e:
 			print("Could not complete twitter search...")
 			print("ERROR: {error!s}".format({"error": str(e)}))
 
-	def to_file(self, source: str, searchTerm: str, data: list):
+	def to_file(self, source: str, searchTerm: str, data: list, fileFormat: str = "json") -> str:
 		"""
 		Summary:
 			Dumps a list of datapoints returned from search functions. This function will
@@ -305,22 +556,104 @@ class OpenSocial(object):
 			source: the social media platform code related to the data to
 					be dumped to the file.
 			searchTerm: the search term that was used to filter the data
-			data: a list of search results
+			data: a list of search results, or the dictionary of platform -> list returned by
+				  get_data. Lazy secondary information is fetched first.
+			fileFormat: (optional) "json" writes a single json document. "jsonl" writes one
+						record per line with a sidecar offset index, which RecordFileReader
+						reads without loading the whole file. Records of a dictionary are
+						written under their own platform.
 
 		Returns:
-			None
+			The path of the file written
 		"""
+		resolve(data)
 		currpath = os.getcwd()
 		abspath = os.path.abspath(__file__)
 		dname = os.path.dirname(abspath)
 		os.chdir(dname)
-		fileName = "data{slash}{source}_{searchTerm}_{time}.json".format(
+		fileName = "data{slash}{source}_{searchTerm}_{time}.{extension}".format(
 			slash=self.slash, 
 			source=source, 
 			searchTerm=searchTerm, 
 			time=datetime
 				.now()
-				.strftime("%Y-%m-%d_%H-%M-%S"))
-		with open(fileName, "w") as file:
-			json.dump({"data": data}, file)
-		os.chdir(currpath)
\ No newline at end of file
+				.strftime("%Y-%m-%d_%H-%M-%S"),
+			extension=fileFormat)
+		if fileFormat == "jsonl":
+			writer = RecordFileWriter(fileName)
+			results = data if isinstance(data, dict) else {source: data}
+			for platform, records in results.items():
+				if isinstance(records, list):
+					writer.write({"platform": platform, "source": None, "term": searchTerm}, records)
+			writer.close()
+		else:
+			with open(fileName, "w") as file:
+				json.dump({"data": data}, file)
+		os.chdir(currpath)
+		return os.path.join(dname, fileName)
+
+	def download_media(self, data: object, directory: str = None, maxBytes: int = None, workers: int = 8) -> dict:
+		"""
+		Summary:
+			Downloads the media of instagram and tumblr search results concurrently into a
+			content addressed directory. Every media entry of the results gets the keys path
+			and sha256 of its file, or error(s) if it could not be downloaded.
+
+		Args:
+			data: the results of get_data or evaluate_all_clients, or a list of data points
+			directory: (optional) the directory files are stored in. Defaults to data/media.
+			maxBytes: (optional) the number of bytes this job may download
+			workers: (optional) the number of concurrent downloads
+
+		Returns:
+			A dictionary with the number of files downloaded, files already stored, bytes
+			downloaded and errors
+		"""
+		directory = directory or os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "media")
+		media = find_media(data)
+		results = MediaStore(directory, workers=workers).download_all([entry["url"] for entry in media], maxBytes=maxBytes)
+		for entry in media:
+			result = results[entry["url"]]
+			entry.update({key: result[key] for key in ["path", "sha256", "error(s)"] if key in result})
+		downloaded = [result for result in results.values() if result.get("cached") is False]
+		return {
+			"downloaded": len(downloaded),
+			"cached": len([result for result in results.values() if result.get("cached")]),
+			"bytes": sum(result["bytes"] for result in downloaded),
+			"errors": len([result for result in results.values() if "error(s)" in result])
+		}
+
+	def to_store(self, searchTerm: str, data: dict, path: str = None) -> int:
+		"""
+		Summary:
+			Saves search results to the SQLite result store, where they can be queried later
+			with ResultStore.search instead of crawling again.
+
+		Args:
+			searchTerm: the search term that was used to filter the data
+			data: a dictionary of platform -> search results, as returned by get_data and
+				  evaluate_all_clients
+			path: (optional) the path of the store. Defaults to results.db in the data
+				  directory of open-social.
+
+		Returns:
+			The number of posts stored
+		"""
+		if path is None:
+			path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "results.db")
+		return ResultStore(path).ingest_results(data, term=searchTerm)
+
+	def to_frame(self, data: dict) -> ResultFrame:
+		"""
+		Summary:
+			Converts search results of every platform to one columnar ResultFrame for filtering,
+			grouping and ranking, or for export to arrow and parquet.
+
+		Args:
+			data: a dictionary of platform -> search results, as returned by get_data and
+				  evaluate_all_clients
+
+		Returns:
+			An instance of ResultFrame
+		"""
+		return ResultFrame.from_results(data)
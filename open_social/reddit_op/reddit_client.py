@@ -1,8 +1,14 @@
 from ..common.social_error import SocialError
+from ..common.process_pool import PicklableClient
+from ..common.deadline import activated, bound_session, current_deadline, expired
+from ..common.hedging import hedged_call
+from ..common.lazy import secondary_information
 from praw import Reddit
-import datetime, json, sys, traceback  
+from praw.models import MoreComments
+from collections import deque
+import concurrent.futures, datetime, json, requests, sys, threading, traceback  
 
-class RedditClient(object):
+class RedditClient(PicklableClient):
 
 	"""
 	Summary:
@@ -10,8 +16,15 @@ class RedditClient(object):
 		has built in support for common tasks like keyword matching to extract 
 		relevant data points for the Reddit platform.
 	"""
+
+	platform = "reddit"
+	sourceKey = "subReddits"
+	maxQueryPath = 1800
+	# praw.Reddit is not thread safe and a repeated comment fetch repeats replace_more
+	hedgeable = False
 	
-	def __init__(self, client_id: str, client_secret: str, user_agent: str):
+	def __init__(self, client_id: str, client_secret: str, user_agent: str, maxDepth: int = None, maxComments: int = None, replaceMore: int = 0,
+			commentWorkers: int = 1, combinedSearch: bool = False):
 		"""
 		Summary:
 			Creates an instance of RedditClient
@@ -20,17 +33,81 @@ class RedditClient(object):
 			client_id: a valid reddit application's client_id
 			client_secret: a valid reddit application's client secret
 			user_agent: a vaild reddit application's useragent
+			maxDepth: (optional) the deepest comment level kept. 0 keeps top level comments only.
+					  Defaults to every level.
+			maxComments: (optional) the maximum number of comments kept per submission
+			replaceMore: (optional) the number of "load more comments" placeholders expanded per
+						 submission. Each expansion is one request. None expands all of them.
+			commentWorkers: (optional) the number of submissions whose comments are expanded at
+							once during a search. praw.Reddit is not thread safe, so every
+							thread other than the one creating the client uses its own
+							instance, with its own session and rate limiter, see api
+			combinedSearch: (optional) search many subreddits with one combined query per
+							chunk of subreddits instead of one query per subreddit, see
+							search_combined
 
 		Returns:
 			An instance of the RedditClient class
 		"""
-		self.reddit = Reddit(
-			client_id = client_id, 
-			client_secret = client_secret, 
-			user_agent = user_agent
+		self.config = {
+			"client_id": client_id,
+			"client_secret": client_secret,
+			"user_agent": user_agent,
+			"maxDepth": maxDepth,
+			"maxComments": maxComments,
+			"replaceMore": replaceMore,
+			"commentWorkers": commentWorkers,
+			"combinedSearch": combinedSearch}
+		self.maxDepth = maxDepth
+		self.maxComments = maxComments
+		self.replaceMore = replaceMore
+		self.commentWorkers = commentWorkers
+		self.combinedSearch = combinedSearch
+		self.ownerThread = threading.get_ident()
+		self.local = threading.local()
+		self.reddit = self.build_reddit()
+
+	def build_reddit(self) -> Reddit:
+		"""
+		Summary:
+			Creates a praw.Reddit instance from the configuration of the client
+
+		Args:
+			None
+
+		Returns:
+			An instance of praw.Reddit whose requests are bounded by the active deadline
+		"""
+		return Reddit(
+			client_id = self.config["client_id"], 
+			client_secret = self.config["client_secret"], 
+			user_agent = self.config["user_agent"],
+			requestor_kwargs = {"session": bound_session(requests.Session())}
 		)
 
-	def search(self, searchTerm: str, subreddits: list, limit: int = 10) -> list:
+	def api(self) -> Reddit:
+		"""
+		Summary:
+			The praw.Reddit instance of the calling thread. praw.Reddit is not thread safe, so
+			the thread that created the client uses self.reddit and every other thread, like
+			the comment workers of parse_all and the workers of a lazy resolver, creates its own
+			instance the first time it makes a request. Instances rate limit themselves
+			separately, so keep commentWorkers small.
+
+		Args:
+			None
+
+		Returns:
+			An instance of praw.Reddit
+		"""
+		if threading.get_ident() == self.ownerThread:
+			return self.reddit
+		reddit = getattr(self.local, "reddit", None)
+		if reddit is None:
+			reddit = self.local.reddit = self.build_reddit()
+		return reddit
+
+	def search(self, searchTerm: str, subreddits: list, limit: int = 10, combined: bool = None) -> list:
 		"""
 		Summary:
 			Drives data extraction on the reddit platform. Loops through posts in 
@@ -44,34 +121,128 @@ class RedditClient(object):
 						equally from each subreddit.
 			limit: (optional) the total number of data points to extract. The real count of data
 				   points returned from this function may be less than limit.
+			combined: (optional) use search_combined. Defaults to the combinedSearch option of
+					  the client.
 
 		Returns:
 			payload: a list of parsed data points
 		"""
+		if self.combinedSearch if combined is None else combined:
+			return self.search_combined(searchTerm, subreddits, limit)
 		payload = []
 		switch  = limit // len(subreddits)
 		try:
 			for subreddit in subreddits:
-				count = 0
-				submissionIds = self.reddit.subreddit(subreddit).search(searchTerm, limit=switch)
+				entries = []
+				submissionIds = self.api().subreddit(subreddit).search(searchTerm, limit=switch)
 				for submissionId in submissionIds:
-					entry = self.reddit.submission(id=submissionId)
-					payload.append(self.parse(entry))
-					count += 1
+					if expired(self.platform):
+						break
+					entries.append(self.api().submission(id=submissionId))
+				payload.extend(self.parse_all(entries))
+				if expired(self.platform):
+					break
 		except:
-			etype, value, tb = sys.exc_info()
-			error = SocialError(etype, value, tb)
-			payload.append([{"error(s)": error.errorInfo}])
+			if not expired(self.platform):
+				etype, value, tb = sys.exc_info()
+				error = SocialError(etype, value, tb)
+				payload.append([{"error(s)": error.errorInfo}])
 		finally:
 			return payload
 
+	def search_combined(self, searchTerm: str, subreddits: list, limit: int = 10) -> list:
+		"""
+		Summary:
+			Searches many subreddits with one combined query per chunk of subreddits (a+b+c),
+			chunked so the query path stays under maxQueryPath characters. The merged results
+			are balanced across subreddits on the client: every subreddit gets an equal share
+			of limit, and the share of subreddits with fewer matches goes to the others.
+			Submissions come back from the listing loaded, so they are parsed without being
+			requested again.
+
+		Args:
+			searchTerm: the string to match against post titles
+			subreddits: the names of subreddits to extract data from
+			limit: (optional) the total number of data points to extract
+
+		Returns:
+			payload: a list of parsed data points
+		"""
+		payload, groups = [], {}
+		try:
+			for chunk in chunk_subreddits(subreddits, self.maxQueryPath):
+				if expired(self.platform):
+					break
+				fetchLimit = min(max(limit * len(chunk) // len(subreddits) * 2, 100), 1000)
+				for submission in self.api().subreddit("+".join(chunk)).search(searchTerm, limit=fetchLimit):
+					groups.setdefault(submission.subreddit.display_name.lower(), []).append(submission)
+			order = [subreddit.lower() for subreddit in subreddits]
+			payload.extend(self.parse_all(balance_quotas(groups, order, limit)))
+		except:
+			if not expired(self.platform):
+				etype, value, tb = sys.exc_info()
+				error = SocialError()
+				error.add_error(etype, value, tb)
+				payload.append([{"error(s)": error.errorInfo}])
+		finally:
+			return payload
+
+	def get_page(self, sourceName: str) -> (list, list):
+		"""
+		Summary:
+			Gets the newest submissions of a subreddit and a link to the next page, so
+			RedditClient can be crawled with the get_page / update_page protocol used by
+			common.pipeline.
+
+		Args:
+			sourceName: the name of a subreddit
+
+		Returns:
+			dataPage: a list of praw submissions
+			nextPageLink: a list with the subreddit name and the fullname of the last submission
+		"""
+		return self.update_page([sourceName, None])
+
+	def update_page(self, nextPageLink: list) -> (list, list):
+		"""
+		Summary:
+			Gets the page of submissions that follows the one described by nextPageLink
+
+		Args:
+			nextPageLink: a list with the subreddit name and the fullname of the last submission
+						  seen, or None for the first page
+
+		Returns:
+			dataPage: a list of praw submissions
+			nextPageLink: a list with info needed to link to the next page of data
+		"""
+		params = {"after": nextPageLink[1]} if nextPageLink[1] is not None else {}
+		dataPage = hedged_call(self, "page", lambda: list(self.api().subreddit(nextPageLink[0]).new(limit=100, params=params)))
+		nextPageLink = [nextPageLink[0], dataPage[-1].fullname] if dataPage else [None]
+		return dataPage, nextPageLink
+
+	def match(self, searchTerm: str, datum: object) -> bool:
+		"""
+		Summary:
+			Checks whether the title of a submission contains the search term
+
+		Args:
+			searchTerm: the term to match against
+			datum: a praw submission
+
+		Returns:
+			True if the submission is relevant
+		"""
+		return searchTerm.lower() in datum.title.lower()
+
 	def parse(self, response: object) -> dict:
 		"""
 		Summary: 
 			Parses a reddit api response to extracgt relevant data. Praw responses
 			are lazy, so this function evaluates the lazy response. The same
 			proccess occurs for comments from the parent post. A parsed data point
-			with comments is returned.
+			with comments is returned. If the client has a resolver the comments
+			are fetched lazily, see common.lazy.
 		
 		Args:
 			response: a reddit api response extracted using praw.
@@ -80,7 +251,8 @@ class RedditClient(object):
 			payload: a parsed data point that includes relevant fields from the
 					 api response and comment text.
 		"""
-		payload, redditor = {}, response.author
+		# the author is read through the instance of this thread, not the one that listed the submission
+		payload, redditor = {}, self.api().redditor(response.author.name)
 		payload["title"] = response.title
 		payload["id"] = response.id
 		payload["domain"] = response.domain
@@ -96,14 +268,146 @@ class RedditClient(object):
 		payload["created_utc"] = response.created_utc
 		payload["upvote_ratio"] = response.upvote_ratio
 		payload["score"] = response.score
-		payload["secondary_information"] = {"comments": []}
-		for comment in self.reddit.submission(id=payload["id"]).comments:
-			try:
-				payload["secondary_information"]["comments"].append(
-					{
-						"body": comment.body, 
-						"user_screen_name": comment.author.name
-					})
-			except:
-				continue
-		return payload
\ No newline at end of file
+		payload["num_comments"] = response.num_comments
+		payload["secondary_information"] = secondary_information(self, lambda: {"comments": self.get_comments(payload["id"])})
+		return payload
+
+	def parse_all(self, responses: list) -> list:
+		"""
+		Summary:
+			Parses many submissions, expanding the comments of commentWorkers submissions at
+			once. Workers run under the deadline of the caller, and submissions not parsed
+			before it passes are left out. Only ids cross to the workers, which load each
+			submission again through their own praw.Reddit instance, see api.
+
+		Args:
+			responses: a list of praw submissions
+
+		Returns:
+			A list of parsed data points in the order of responses
+		"""
+		if self.commentWorkers <= 1 or len(responses) <= 1:
+			payload = []
+			for response in responses:
+				if expired(self.platform):
+					break
+				payload.append(self.parse(response))
+			return payload
+
+		deadline = current_deadline()
+
+		def parse(submissionId: str) -> dict:
+			with activated(deadline):
+				return None if expired(self.platform) else self.parse(self.api().submission(id=submissionId))
+
+		with concurrent.futures.ThreadPoolExecutor(max_workers=self.commentWorkers) as executor:
+			return [entry for entry in executor.map(parse, [response.id for response in responses]) if entry is not None]
+
+	def get_comments(self, submissionId: str) -> list:
+		"""
+		Summary:
+			Gets the comment tree of a submission. At most replaceMore "load more comments"
+			placeholders are expanded, and the tree is flattened breadth first, so every top
+			level comment is kept before any reply when maxComments cuts the tree short.
+
+		Args:
+			submissionId: the id of the submission
+
+		Returns:
+			A list of comment dictionaries, see flatten_comments
+		"""
+		def fetch() -> object:
+			submission = self.api().submission(id=submissionId)
+			if self.maxComments is not None:
+				submission.comment_limit = self.maxComments
+			forest = submission.comments
+			forest.replace_more(limit=self.replaceMore)
+			return forest
+
+		return flatten_comments(hedged_call(self, "comments", fetch), self.maxDepth, self.maxComments)
+
+def flatten_comments(comments: list, maxDepth: int = None, maxComments: int = None) -> list:
+	"""
+	Summary:
+		Flattens a praw comment tree breadth first. Placeholders for comments that were not
+		loaded are skipped, and comments by deleted accounts are kept without an author.
+
+	Args:
+		comments: the top level comments of a submission
+		maxDepth: (optional) the deepest level kept. 0 keeps top level comments only.
+		maxComments: (optional) the maximum number of comments returned
+
+	Returns:
+		A list of dictionaries with the keys id, parent_id (None for top level comments),
+		depth, body, user_screen_name, score and created_utc
+	"""
+	payload = []
+	queue = deque((comment, 0) for comment in comments)
+	while queue and (maxComments is None or len(payload) < maxComments):
+		comment, depth = queue.popleft()
+		if isinstance(comment, MoreComments):
+			continue
+		parentId = comment.parent_id
+		payload.append({
+			"id": comment.id,
+			"parent_id": parentId[3:] if parentId.startswith("t1_") else None,
+			"depth": depth,
+			"body": comment.body,
+			"user_screen_name": comment.author.name if comment.author is not None else None,
+			"score": comment.score,
+			"created_utc": comment.created_utc
+		})
+		if maxDepth is None or depth < maxDepth:
+			queue.extend((reply, depth + 1) for reply in comment.replies)
+	return payload
+
+def chunk_subreddits(subreddits: list, maxLength: int) -> list:
+	"""
+	Summary:
+		Splits subreddit names into groups whose combined names (a+b+c) are at most maxLength
+		characters long
+
+	Args:
+		subreddits: a list of subreddit names
+		maxLength: the longest combined name allowed
+
+	Returns:
+		A list of lists of subreddit names
+	"""
+	chunks, chunk, length = [], [], 0
+	for subreddit in subreddits:
+		added = len(subreddit) + (1 if chunk else 0)
+		if chunk and length + added > maxLength:
+			chunks.append(chunk)
+			chunk, length, added = [], 0, len(subreddit)
+		chunk.append(subreddit)
+		length += added
+	if chunk:
+		chunks.append(chunk)
+	return chunks
+
+def balance_quotas(groups: dict, order: list, limit: int) -> list:
+	"""
+	Summary:
+		Picks up to limit items from per-subreddit groups round robin, so every subreddit gets
+		an equal share and shares left by small groups go to larger ones
+
+	Args:
+		groups: a dictionary of subreddit name -> list of items in ranking order
+		order: the subreddit names in the order they take turns
+		limit: the number of items picked
+
+	Returns:
+		A list of picked items, grouped by subreddit in the order of order
+	"""
+	counts = {name: 0 for name in order}
+	total, active = 0, [name for name in order if groups.get(name)]
+	while total < limit and active:
+		for name in list(active):
+			if total >= limit:
+				break
+			counts[name] += 1
+			total += 1
+			if counts[name] >= len(groups[name]):
+				active.remove(name)
+	return [item for name in order for item in groups.get(name, [])[:counts[name]]]
@@ -1,8 +1,12 @@
 from ..common.abstract_social_client import AbstractSocialClient
 from ..common.utils import search
+from ..common.process_pool import PicklableClient
+from ..common.deadline import expired
+from ..common.hedging import hedged_call
+from ..common.media import tumblr_media
 from pytumblr import TumblrRestClient
 
-class TumblrClient(AbstractSocialClient):
+class TumblrClient(AbstractSocialClient, PicklableClient):
 
 	"""
 	Summary:
@@ -11,7 +15,10 @@ class TumblrClient(AbstractSocialClient):
 		relevant data points for the Tumblr platform.
 	"""
 
-	def __init__(self, consumer_key: str, consumer_secret: str, oauth_token: str, oauth_secret: str):
+	platform = "tumblr"
+	sourceKey = "blogs"
+
+	def __init__(self, consumer_key: str, consumer_secret: str, oauth_token: str, oauth_secret: str, deferNotes: bool = False, maxNotes: int = None):
 		"""
 		Summary:
 			Initializes and instance of TumblrClient
@@ -21,10 +28,22 @@ class TumblrClient(AbstractSocialClient):
 			consumer_secret: a valid tumblr rest api application's consumer secret
 			oauth_token: a valid tumblr rest api application's oauth token
 			oauth_secret: a valid tumblr rest api application's oauth_secret
+			deferNotes: (optional) scan pages without notes and fetch notes only for posts that
+						match the search term
+			maxNotes: (optional) the maximum number of notes kept per post
 
 		Returns:
 			An instance of the TumblrClient class
 		"""
+		self.config = {
+			"consumer_key": consumer_key,
+			"consumer_secret": consumer_secret,
+			"oauth_token": oauth_token,
+			"oauth_secret": oauth_secret,
+			"deferNotes": deferNotes,
+			"maxNotes": maxNotes}
+		self.deferNotes = deferNotes
+		self.maxNotes = maxNotes
 		self.tumblr = TumblrRestClient(
 			consumer_key = consumer_key,
 			consumer_secret = consumer_secret,
@@ -46,7 +65,7 @@ class TumblrClient(AbstractSocialClient):
 			dataPage: a list of individual data points taken from the api response
 			nextPageLink: a list with info needed to link to the next page of data
 		"""
-		rawData = self.tumblr.posts(sourceName, limit=50, offset=0, notes_info=True)
+		rawData = hedged_call(self, "page", self.tumblr.posts, sourceName, limit=50, offset=0, notes_info=not self.deferNotes)
 		dataPage = rawData['posts']
 		nextPageLink = [sourceName, 50]
 		return dataPage, nextPageLink
@@ -65,7 +84,7 @@ class TumblrClient(AbstractSocialClient):
 			dataPage: a list of individual data points taken from the api response
 			nextPageLink: a list with info needed to link to the next page of data
 		"""
-		rawData = self.tumblr.posts(nextPageLink[0], limit=50, offset=nextPageLink[1], notes_info=True)
+		rawData = hedged_call(self, "page", self.tumblr.posts, nextPageLink[0], limit=50, offset=nextPageLink[1], notes_info=not self.deferNotes)
 		dataPage = rawData['posts']
 		nextPageLink = [nextPageLink[0], nextPageLink[1] + 50]
 		return dataPage, nextPageLink
@@ -115,9 +134,11 @@ class TumblrClient(AbstractSocialClient):
 			"post_url": datum["post_url"],
 			"summary": datum["summary"],
 			"note_count": datum["note_count"],
-			"notes": datum["notes"]
-
+			"notes": datum.get("notes", [])[:self.maxNotes],
+			"media": tumblr_media(datum)
 		}
+		if self.deferNotes:
+			datum = self.get_secondary_information(datum)
 		return datum
 
 	def get_secondary_information(self, datum: dict) -> dict:
@@ -126,7 +147,8 @@ class TumblrClient(AbstractSocialClient):
 		Summary:
 			Gathers any secondary information that is relevant to the 
 			social data point and updates the data point with that 
-			information.
+			information. Used when notes are deferred, so notes are only 
+			downloaded for posts that matched the search term.
 
 		Args:
 			datum: the data point to be updated with secondary information
@@ -134,7 +156,40 @@ class TumblrClient(AbstractSocialClient):
 		Returns:
 			datum: the data point updated with secondary information
 		"""
-		pass
+		datum["notes"] = list(self.iter_notes(datum["blog_name"], datum["id"]))
+		return datum
+
+	def iter_notes(self, blogName: str, postId: int):
 
-	def search(self, searchTerm: str, sources: list, limit: int) -> list:
-		return search(client=self, searchTerm=searchTerm, sources=sources, limit=limit)
\ No newline at end of file
+		"""
+		Summary:
+			Streams the notes of a post page by page, following the before_timestamp links
+			returned by the notes endpoint. Stops after maxNotes notes, once the active deadline
+			passes so later pages are never requested, or when the endpoint hands back a cursor
+			it returned before.
+
+		Args:
+			blogName: the name of the blog that holds the post
+			postId: the id of the post
+
+		Returns:
+			A generator of note dictionaries
+		"""
+		count, params, cursors = 0, {}, set()
+		while (self.maxNotes is None or count < self.maxNotes) and not expired(self.platform):
+			rawData = hedged_call(self, "notes", self.tumblr.notes, blogName, id=postId, **params)
+			notes = rawData.get("notes", [])
+			for note in notes:
+				if self.maxNotes is not None and count >= self.maxNotes:
+					return
+				yield note
+				count += 1
+			params = rawData.get("_links", {}).get("next", {}).get("query_params", {})
+			params.pop("id", None)
+			cursor = tuple(sorted(params.items()))
+			if not notes or not params or cursor in cursors:
+				return
+			cursors.add(cursor)
+
+	def search(self, searchTerm: str, sources: list, limit: int, maxPages: int = None, maxRequests: int = None) -> list:
+		return search(client=self, searchTerm=searchTerm, sources=sources, limit=limit, maxPages=maxPages, maxRequests=maxRequests)
\ No newline at end of file
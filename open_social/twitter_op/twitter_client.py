@@ -1,8 +1,14 @@
 from ..common.social_error import SocialError
+from ..common.process_pool import PicklableClient
+from ..common.deadline import bound_session, expired
+from ..common.hedging import hedged_call
+from .twitter_stream import TwitterStream
+from requests_oauthlib import OAuth1
 from twython import Twython
-import datetime, json, sys, traceback 
+from collections import OrderedDict
+import datetime, json, sys, threading, traceback 
 
-class TwitterClient(object):
+class TwitterClient(PicklableClient):
 
 	"""
 	Summary:
@@ -10,6 +16,10 @@ class TwitterClient(object):
 		searching the twitter rest api for data relevant to a search term.
 	"""
 
+	platform = "twitter"
+	sourceKey = None
+	maxUsers = 10000
+
 	def __init__(self, app_key: str, app_secret: str, oauth_token: str, oauth_token_secret: str):
 
 		"""
@@ -25,13 +35,21 @@ class TwitterClient(object):
 		Returns:
 			An instance of the TwitterClient class
 		"""
+		self.config = {
+			"app_key": app_key,
+			"app_secret": app_secret,
+			"oauth_token": oauth_token,
+			"oauth_token_secret": oauth_token_secret}
+		self.users = OrderedDict()
+		self.usersLock = threading.Lock()
 		self.twitter = Twython(
 			app_key = app_key, 
 			app_secret = app_secret, 
 			oauth_token = oauth_token, 
 			oauth_token_secret = oauth_token_secret)
+		bound_session(self.twitter.client)
 
-	def search(self, searchTerm: str, limit: int = 10) -> list:
+	def search(self, searchTerm: str, limit: int = 10, resultType: str = "popular") -> list:
 		"""
 		Summary:
 			Wraps twython's built in search functionality to gather data points from 
@@ -42,6 +60,7 @@ class TwitterClient(object):
 		Args:
 			searchTerm: the term to match against
 			limit: the upper limit of results returned by the search
+			resultType: (optional) "popular", "recent" or "mixed"
 
 		Returns:
 			A list of parsed data points.
@@ -49,22 +68,247 @@ class TwitterClient(object):
 		payload = []
 		count = 0
 		try:
-			for entry in self.twitter.cursor(self.twitter.search, q=searchTerm, result_type="popular"):
-				if(count == limit):
+			for entry in self.twitter.cursor(self.twitter.search, q=searchTerm, result_type=resultType):
+				if(count == limit) or expired(self.platform):
 					break
 				payload.append(self.parse(entry))
 				count += 1
 		except:
-			etype, value, tb = sys.exc_info()
-			error = SocialError(etype, value, tb)
-			payload.append([{"error(s)": error.errorInfo}])
+			if not expired(self.platform):
+				etype, value, tb = sys.exc_info()
+				error = SocialError()
+				error.add_error(etype, value, tb)
+				payload.append([{"error(s)": error.errorInfo}])
 		finally:
 			return payload
 
+	def stream(self, searchTerms: list, **kwargs) -> TwitterStream:
+		"""
+		Summary:
+			Opens a streaming connection that tracks keywords. The returned stream is an
+			iterator of parsed tweets, like the results of search, and keeps the connection
+			open until it is stopped.
+
+		Args:
+			searchTerms: a list of keywords to track
+			kwargs: (optional) options accepted by TwitterStream, like url, bufferSize,
+					overflow, spillPath, backoff and timeout
+
+		Returns:
+			An instance of TwitterStream
+		"""
+		if "auth" not in kwargs.keys():
+			kwargs["auth"] = OAuth1(
+				self.config["app_key"],
+				self.config["app_secret"],
+				self.config["oauth_token"],
+				self.config["oauth_token_secret"])
+		return TwitterStream(self, searchTerms, **kwargs)
+
+	def stream_search(self, searchTerm: str, limit: int = 10, timeout: float = None, **kwargs) -> list:
+		"""
+		Summary:
+			Collects tweets matching the search term from the streaming endpoint instead of
+			polling the search api.
+
+		Args:
+			searchTerm: the term to track
+			limit: (optional) the upper limit of results returned
+			timeout: (optional) the maximum number of seconds to listen
+			kwargs: (optional) options accepted by TwitterStream
+
+		Returns:
+			A list of parsed data points.
+		"""
+		payload = []
+		stream = self.stream([searchTerm], **kwargs)
+		timer = threading.Timer(timeout, stream.stop) if timeout is not None else None
+		if timer is not None:
+			timer.start()
+		try:
+			for entry in stream:
+				payload.append(entry)
+				if len(payload) >= limit:
+					break
+		finally:
+			if timer is not None:
+				timer.cancel()
+			stream.stop()
+		return payload
+
+	def bulk_search(self, searchTerm: str, limit: int, resultType: str = "recent", sinceId: int = None, maxId: int = None, extended: bool = True) -> list:
+		"""
+		Summary:
+			High volume search. Requests the maximum page size of 100 tweets and walks back
+			through the results with max_id, so no tweet is requested twice. sinceId and maxId
+			bound the id window, which lets several workers split a time range between them
+			(see split_window and id_for_time). Users embedded without their profile fields are
+			looked up in batches of 100.
+
+		Args:
+			searchTerm: the term to match against
+			limit: the upper limit of results returned by the search
+			resultType: (optional) "recent", "mixed" or "popular"
+			sinceId: (optional) only return tweets with an id greater than sinceId
+			maxId: (optional) only return tweets with an id less than or equal to maxId
+			extended: (optional) request the full, untruncated text of tweets
+
+		Returns:
+			A list of parsed data points.
+		"""
+		payload = []
+		params = {"q": searchTerm, "count": 100, "result_type": resultType, "include_entities": True}
+		if extended:
+			params["tweet_mode"] = "extended"
+		if sinceId is not None:
+			params["since_id"] = sinceId
+		try:
+			while len(payload) < limit and not expired(self.platform):
+				if maxId is not None:
+					params["max_id"] = maxId
+				statuses = self.twitter.search(**params).get("statuses", [])
+				if not statuses:
+					break
+				self.hydrate_users(statuses)
+				for status in statuses[:limit - len(payload)]:
+					payload.append(self.parse(status))
+				maxId = min(status["id"] for status in statuses) - 1
+				if sinceId is not None and maxId <= sinceId:
+					break
+		except:
+			if not expired(self.platform):
+				etype, value, tb = sys.exc_info()
+				error = SocialError()
+				error.add_error(etype, value, tb)
+				payload.append([{"error(s)": error.errorInfo}])
+		finally:
+			return payload
+
+	def hydrate_users(self, statuses: list):
+		"""
+		Summary:
+			Replaces user objects that only carry an id with full user objects. Unknown users
+			are fetched with users/lookup in batches of 100 and kept for later pages. Only the
+			maxUsers most recently seen users are kept.
+
+		Args:
+			statuses: a list of tweets returned by the twitter rest api
+
+		Returns:
+			None
+		"""
+		users = {status["user"]["id"]: status["user"] for status in statuses if "screen_name" in status["user"]}
+		with self.usersLock:
+			for userId in {status["user"]["id"] for status in statuses} - set(users):
+				if userId in self.users:
+					users[userId] = self.users[userId]
+		missing = list({status["user"]["id"] for status in statuses} - set(users))
+		for start in range(0, len(missing), 100):
+			for user in self.twitter.lookup_user(user_id=",".join(str(userId) for userId in missing[start:start + 100])):
+				users[user["id"]] = user
+		for status in statuses:
+			status["user"] = users.get(status["user"]["id"], status["user"])
+		with self.usersLock:
+			for userId, user in users.items():
+				self.users[userId] = user
+				self.users.move_to_end(userId)
+			while len(self.users) > self.maxUsers:
+				self.users.popitem(last=False)
+
+	@staticmethod
+	def id_for_time(timestamp: float) -> int:
+		"""
+		Summary:
+			Converts a unix timestamp to the smallest tweet id created at that time. Tweet ids
+			are snowflakes whose high bits hold the creation time in milliseconds.
+
+		Args:
+			timestamp: seconds since the epoch
+
+		Returns:
+			A tweet id usable as since_id or max_id
+		"""
+		return (int(timestamp * 1000) - 1288834974657) << 22
+
+	@staticmethod
+	def split_window(sinceId: int, maxId: int, parts: int) -> list:
+		"""
+		Summary:
+			Splits an id window into contiguous, non overlapping windows, one per worker. A
+			window holding fewer ids than parts is split into one window per id.
+
+		Args:
+			sinceId: the exclusive lower bound of the window
+			maxId: the inclusive upper bound of the window
+			parts: the number of windows
+
+		Returns:
+			A list of (sinceId, maxId) tuples ordered from newest to oldest, all inside the
+			window
+		"""
+		if maxId <= sinceId:
+			return []
+		parts = max(min(parts, maxId - sinceId), 1)
+		step = (maxId - sinceId) // parts
+		bounds = [maxId - step * i for i in range(parts)] + [sinceId]
+		return [(bounds[i + 1], bounds[i]) for i in range(parts)]
+
+	def get_page(self, sourceName: str) -> (list, list):
+		"""
+		Summary:
+			Gets the first page of recent tweets for a query, so TwitterClient can be crawled
+			with the get_page / update_page protocol used by common.pipeline. Twitter has no
+			sources, so the query itself plays the part of the source.
+
+		Args:
+			sourceName: a search query
+
+		Returns:
+			dataPage: a list of tweets returned by the twitter rest api
+			nextPageLink: a list with the query and the max_id of the next page
+		"""
+		return self.update_page([sourceName, None])
+
+	def update_page(self, nextPageLink: list) -> (list, list):
+		"""
+		Summary:
+			Gets the page of tweets older than the ones already seen
+
+		Args:
+			nextPageLink: a list with the query and the max_id of the page, or None for the
+						  first page
+
+		Returns:
+			dataPage: a list of tweets returned by the twitter rest api
+			nextPageLink: a list with info needed to link to the next page of data
+		"""
+		params = {"q": nextPageLink[0], "count": 100, "result_type": "recent", "include_entities": True, "tweet_mode": "extended"}
+		if nextPageLink[1] is not None:
+			params["max_id"] = nextPageLink[1]
+		dataPage = hedged_call(self, "page", self.twitter.search, **params).get("statuses", [])
+		self.hydrate_users(dataPage)
+		nextPageLink = [nextPageLink[0], min(status["id"] for status in dataPage) - 1] if dataPage else [None]
+		return dataPage, nextPageLink
+
+	def match(self, searchTerm: str, datum: dict) -> bool:
+		"""
+		Summary:
+			Checks whether the text of a tweet contains the search term
+
+		Args:
+			searchTerm: the term to match against
+			datum: a tweet returned by the twitter rest api
+
+		Returns:
+			True if the tweet is relevant
+		"""
+		return searchTerm.lower() in datum.get("full_text", datum.get("text", "")).lower()
+
 	def parse(self, response: dict) -> dict:
 		"""
 		Summary:
-			Parses a single data point returned from the twitter rest api
+			Parses a single data point returned from the twitter rest api. Extended tweets
+			carry their text in full_text.
 
 		Args:
 			response: a data point returned by the twitter rest api
@@ -75,7 +319,7 @@ class TwitterClient(object):
 		payload = {}
 		payload["created_at"]           = response["created_at"]
 		payload["id"]                   = response["id"]
-		payload["text"]                 = response["text"]
+		payload["text"]                 = response["full_text"] if "full_text" in response else response["text"]
 		payload["user_id"]              = response["user"]["id"]
 		payload["user_name"]            = response["user"]["name"]
 		payload["user_screen_name"]     = response["user"]["screen_name"]
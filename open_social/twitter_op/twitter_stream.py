@@ -0,0 +1,278 @@
+from ..common.social_error import SocialError
+import json, os, queue, sys, tempfile, threading
+import requests
+
+class TwitterStream(object):
+
+	"""
+	Summary:
+		Reads tweets from a long lived streaming connection (the statuses/filter endpoint by
+		default), parses them with TwitterClient.parse, and hands them out through an iterator.
+		Tweets are buffered in a bounded queue. When the consumer falls behind, the overflow
+		policy decides whether the oldest or the newest tweets are dropped or whether tweets
+		spill to a file on disk. Dropped connections are retried with exponential backoff.
+	"""
+
+	maxErrors = 100
+
+	def __init__(self, client: object, track: list, url: str = "https://stream.twitter.com/1.1/statuses/filter.json", auth: object = None,
+			bufferSize: int = 1000, overflow: str = "drop_oldest", spillPath: str = None, backoff: float = 1, maxBackoff: float = 320, timeout: float = 90):
+		"""
+		Summary:
+			Initializes an instance of TwitterStream. No connection is made until the stream is
+			started or iterated.
+
+		Args:
+			client: the TwitterClient whose parse function is used
+			track: a list of keywords to track
+			url: (optional) the streaming endpoint. Point it at a local server for testing.
+			auth: (optional) a requests auth object. TwitterClient.stream passes OAuth1 built
+				  from the client's credentials.
+			bufferSize: (optional) the maximum number of parsed tweets held in memory
+			overflow: (optional) "drop_oldest", "drop_newest" or "spill"
+			spillPath: (optional) the file tweets spill to. Defaults to a temporary file.
+			backoff: (optional) seconds to wait before the first reconnect
+			maxBackoff: (optional) the longest wait between reconnects
+			timeout: (optional) seconds without data (including keep alive newlines) before the
+					 connection is considered stalled
+
+		Returns:
+			An instance of the TwitterStream class
+		"""
+		if overflow not in ["drop_oldest", "drop_newest", "spill"]:
+			raise ValueError("overflow must be drop_oldest, drop_newest or spill")
+		self.client = client
+		self.track = track
+		self.url = url
+		self.auth = auth
+		self.buffer = queue.Queue(maxsize=bufferSize)
+		self.overflow = overflow
+		self.spillPath = spillPath
+		self.spillLock = threading.Lock()
+		self.spillWriteOffset = 0
+		self.spillReadOffset = 0
+		self.backoff = backoff
+		self.maxBackoff = maxBackoff
+		self.timeout = timeout
+		self.stopEvent = threading.Event()
+		self.thread = None
+		self.response = None
+		self.errors = SocialError()
+		self.stats = {"received": 0, "dropped": 0, "spilled": 0, "reconnects": 0, "malformed": 0}
+
+	def start(self):
+		"""
+		Summary:
+			Starts reading the stream in a background thread
+
+		Args:
+			None
+
+		Returns:
+			None
+		"""
+		if self.thread is not None and self.thread.is_alive():
+			return
+		if self.overflow == "spill" and self.spillPath is None:
+			handle, self.spillPath = tempfile.mkstemp(suffix=".jsonl")
+			os.close(handle)
+		self.stopEvent.clear()
+		self.thread = threading.Thread(target=self.read_loop, daemon=True)
+		self.thread.start()
+
+	def stop(self):
+		"""
+		Summary:
+			Closes the connection and stops the reader thread
+
+		Args:
+			None
+
+		Returns:
+			None
+		"""
+		self.stopEvent.set()
+		response = self.response
+		if response is not None:
+			response.close()
+		if self.thread is not None:
+			self.thread.join()
+
+	def __iter__(self):
+		"""
+		Summary:
+			Yields parsed tweets as they arrive, starting the stream if it was never started.
+			Iteration ends once the stream is stopped and every buffered tweet has been handed
+			out.
+
+		Args:
+			None
+
+		Returns:
+			A generator of parsed tweets
+		"""
+		if self.thread is None:
+			self.start()
+		while True:
+			try:
+				yield self.buffer.get(timeout=0.1)
+				continue
+			except queue.Empty:
+				pass
+			spilled = self.read_spill()
+			if spilled:
+				for entry in spilled:
+					yield entry
+			elif self.stopEvent.is_set() and not self.thread.is_alive():
+				return
+
+	def read_loop(self):
+		"""
+		Summary:
+			Body of the reader thread. Connects, reads newline delimited json until the
+			connection drops, and reconnects with exponential backoff. Rate limited responses
+			(420 and 429) start the backoff at one minute. Messages that can not be decoded or
+			parsed are counted as malformed and skipped without dropping the connection.
+
+		Args:
+			None
+
+		Returns:
+			None
+		"""
+		delay = self.backoff
+		while not self.stopEvent.is_set():
+			try:
+				self.response = requests.post(
+					self.url,
+					data={"track": ",".join(self.track)},
+					auth=self.auth,
+					stream=True,
+					timeout=self.timeout)
+				if self.response.status_code in [420, 429]:
+					delay = max(delay, 60)
+				self.response.raise_for_status()
+				for line in self.response.iter_lines():
+					if self.stopEvent.is_set():
+						break
+					if not line:
+						continue
+					delay = self.backoff
+					try:
+						self.receive(json.loads(line.decode("utf-8")))
+					except (ValueError, KeyError, TypeError):
+						self.stats["malformed"] += 1
+						self.add_error(*sys.exc_info())
+			except:
+				if self.stopEvent.is_set():
+					break
+				self.add_error(*sys.exc_info())
+			finally:
+				if self.response is not None:
+					self.response.close()
+			if self.stopEvent.wait(delay):
+				break
+			self.stats["reconnects"] += 1
+			delay = min(delay * 2, self.maxBackoff)
+
+	def add_error(self, etype: object, value: object, tb: object):
+		"""
+		Summary:
+			Records an error, keeping only the latest maxErrors errors
+
+		Args:
+			etype: the type of the error
+			value: the value of the error
+			tb: the traceback of the error
+
+		Returns:
+			None
+		"""
+		self.errors.add_error(etype, value, tb)
+		del self.errors.errorInfo[:-self.maxErrors]
+
+	def receive(self, message: dict):
+		"""
+		Summary:
+			Parses a streamed message and buffers it. Control messages (limit notices,
+			disconnects, deletes) carry no tweet text and are skipped.
+
+		Args:
+			message: a decoded json message from the stream
+
+		Returns:
+			None
+		"""
+		if "text" not in message and "full_text" not in message:
+			return
+		if "extended_tweet" in message:
+			message["full_text"] = message["extended_tweet"]["full_text"]
+		entry = self.client.parse(message)
+		self.stats["received"] += 1
+		self.enqueue(entry)
+
+	def enqueue(self, entry: dict):
+		"""
+		Summary:
+			Adds a parsed tweet to the buffer according to the overflow policy
+
+		Args:
+			entry: a parsed tweet
+
+		Returns:
+			None
+		"""
+		if self.overflow == "spill":
+			with self.spillLock:
+				if self.spillWriteOffset == self.spillReadOffset:
+					try:
+						self.buffer.put_nowait(entry)
+						return
+					except queue.Full:
+						pass
+				# keep spilling while older tweets are on disk so order is preserved
+				with open(self.spillPath, "ab") as file:
+					self.spillWriteOffset += file.write((json.dumps(entry, default=str) + "\n").encode("utf-8"))
+				self.stats["spilled"] += 1
+			return
+		while True:
+			try:
+				self.buffer.put_nowait(entry)
+				return
+			except queue.Full:
+				self.stats["dropped"] += 1
+				if self.overflow == "drop_newest":
+					return
+				try:
+					self.buffer.get_nowait()
+				except queue.Empty:
+					pass
+
+	def read_spill(self, batchSize: int = 1000) -> list:
+		"""
+		Summary:
+			Reads tweets that spilled to disk, oldest first. The spill file is truncated once it
+			has been read completely.
+
+		Args:
+			batchSize: (optional) the maximum number of tweets read at once
+
+		Returns:
+			A list of parsed tweets
+		"""
+		if self.overflow != "spill":
+			return []
+		with self.spillLock:
+			if self.spillReadOffset == self.spillWriteOffset:
+				return []
+			payload = []
+			with open(self.spillPath, "rb") as file:
+				file.seek(self.spillReadOffset)
+				while len(payload) < batchSize and self.spillReadOffset < self.spillWriteOffset:
+					line = file.readline()
+					self.spillReadOffset += len(line)
+					payload.append(json.loads(line.decode("utf-8")))
+			if self.spillReadOffset == self.spillWriteOffset:
+				open(self.spillPath, "w").close()
+				self.spillReadOffset = self.spillWriteOffset = 0
+			return payload
@@ -0,0 +1,150 @@
+import collections, os, random, statistics, sys, time, unittest
+sys.path.append(os.path.join(os.path.dirname(__file__), "..", "examples"))
+from aggregators import PhraseCounter, RunningStats, SpaceSaving, TextAnalyticsAggregate, WindowedPhraseTracker
+
+def stats_of(values: list) -> RunningStats:
+	stats = RunningStats()
+	for value in values:
+		stats.update(value)
+	return stats
+
+class RunningStatsTests(unittest.TestCase):
+
+	def test_matches_exact_statistics(self):
+		values = [random.Random(1).gauss(100, 15) for _ in range(1000)]
+		stats = stats_of(values)
+		self.assertAlmostEqual(stats.mean, statistics.fmean(values), places=9)
+		self.assertAlmostEqual(stats.variance, statistics.pvariance(values), places=6)
+		self.assertEqual((stats.minimum, stats.maximum, stats.count), (min(values), max(values), 1000))
+		self.assertAlmostEqual(stats.total, sum(values), places=6)
+
+	def test_merge_equals_single_pass(self):
+		generator = random.Random(2)
+		values = [generator.uniform(-1, 1) * 10 ** generator.randint(0, 6) for _ in range(500)]
+		merged = RunningStats()
+		for start in range(0, 500, 73):
+			merged.merge(stats_of(values[start:start + 73]))
+		single = stats_of(values)
+		self.assertEqual(merged.count, single.count)
+		self.assertAlmostEqual(merged.mean, single.mean, places=6)
+		self.assertAlmostEqual(merged.variance / single.variance, 1, places=9)
+		self.assertEqual((merged.minimum, merged.maximum), (single.minimum, single.maximum))
+
+	def test_merge_with_empty_and_round_trip(self):
+		stats = stats_of([1, 2, 3])
+		self.assertEqual(RunningStats().merge(stats).to_list(), stats.to_list())
+		self.assertEqual(stats.merge(RunningStats()).to_list(), stats_of([1, 2, 3]).to_list())
+		self.assertEqual(RunningStats.from_list(stats.to_list()).summary(), stats.summary())
+		self.assertEqual(RunningStats().variance, 0.0)
+
+class PhraseCounterTests(unittest.TestCase):
+
+	def test_counts_merge_and_rank(self):
+		first, second = PhraseCounter(), PhraseCounter({"b": 2})
+		for phrase in ["a", "b", "a", "c"]:
+			first.update(phrase)
+		first.merge(second)
+		self.assertEqual(first.top(), [("b", 3), ("a", 2), ("c", 1)])
+		self.assertEqual(first.top(1), [("b", 3)])
+		self.assertEqual(PhraseCounter.from_dict(first.to_dict()).counts, first.counts)
+
+def zipf_stream(seed: int, count: int) -> list:
+	generator = random.Random(seed)
+	return ["phrase{rank}".format(rank=int(generator.paretovariate(1.1))) for _ in range(count)]
+
+class SpaceSavingTests(unittest.TestCase):
+
+	def assert_bounds(self, sketch: SpaceSaving, truth: collections.Counter):
+		for phrase, count in sketch.counts.items():
+			self.assertLessEqual(truth[phrase], count)
+			self.assertLessEqual(count - sketch.errors[phrase], truth[phrase])
+			self.assertLessEqual(sketch.errors[phrase], sketch.total / sketch.capacity)
+		for phrase, count in truth.items():
+			if count > sketch.total / sketch.capacity:
+				self.assertIn(phrase, sketch.counts)
+
+	def test_error_bounds(self):
+		stream = zipf_stream(3, 20000)
+		sketch = SpaceSaving(50)
+		for phrase in stream:
+			sketch.update(phrase)
+		self.assertEqual((len(sketch.counts), sketch.total), (50, 20000))
+		self.assert_bounds(sketch, collections.Counter(stream))
+		self.assertEqual(sketch.top(1)[0][0], collections.Counter(stream).most_common(1)[0][0])
+		self.assertTrue(all(lower <= collections.Counter(stream)[phrase] for phrase, count, lower in sketch.guaranteed()))
+		self.assertEqual(SpaceSaving.from_error(0.01).capacity, 100)
+
+	def test_merge_keeps_bounds(self):
+		first, second = zipf_stream(4, 10000), zipf_stream(5, 10000)
+		merged, other = SpaceSaving(40), SpaceSaving(40)
+		for phrase in first:
+			merged.update(phrase)
+		for phrase in second:
+			other.update(phrase)
+		merged.merge(other)
+		self.assertEqual(merged.total, 20000)
+		self.assertLessEqual(len(merged.counts), 40)
+		self.assert_bounds(merged, collections.Counter(first + second))
+
+	def test_round_trip(self):
+		sketch = SpaceSaving(5)
+		for phrase in zipf_stream(6, 500):
+			sketch.update(phrase)
+		loaded = SpaceSaving.from_dict(sketch.to_dict())
+		self.assertEqual((loaded.counts, loaded.errors, loaded.total), (sketch.counts, sketch.errors, sketch.total))
+		loaded.update("new phrase")
+		self.assertIn("new phrase", loaded.counts)
+		self.assertEqual(len(loaded.counts), 5)
+
+class WindowedPhraseTrackerTests(unittest.TestCase):
+
+	def test_old_buckets_leave_the_window(self):
+		now = [1000.0]
+		tracker = WindowedPhraseTracker(windowSeconds=30, bucketSeconds=10, clock=lambda: now[0])
+		tracker.update("old", timestamp=1000)
+		tracker.update("trump", timestamp=1015)
+		tracker.update("trump", timestamp=1025)
+		self.assertEqual(tracker.top(), [("trump", 2), ("old", 1)])
+		now[0] = 1035
+		tracker.update("vote")
+		self.assertEqual(tracker.top(), [("trump", 2), ("vote", 1)])
+		tracker.update("late", timestamp=990)
+		self.assertNotIn("late", dict(tracker.top()))
+
+	def test_merge_and_round_trip(self):
+		now = time.time()
+		first = WindowedPhraseTracker(windowSeconds=3600, bucketSeconds=60, capacity=10, clock=lambda: now)
+		second = WindowedPhraseTracker(windowSeconds=3600, bucketSeconds=60, capacity=10, clock=lambda: now)
+		first.update("trump", timestamp=now)
+		second.update("trump", timestamp=now)
+		second.update("vote", timestamp=now - 120)
+		first.merge(second)
+		self.assertEqual(first.top(), [("trump", 2), ("vote", 1)])
+		aggregate = TextAnalyticsAggregate(first)
+		loaded = TextAnalyticsAggregate.loads(aggregate.dumps())
+		self.assertIsInstance(loaded.phrases, WindowedPhraseTracker)
+		self.assertEqual(loaded.phrases.top(), [("trump", 2), ("vote", 1)])
+
+class TextAnalyticsAggregateTests(unittest.TestCase):
+
+	def outputs(self, scores: list, phrases: list) -> tuple:
+		return (
+			{"documents": [{"id": str(i), "detectedLanguages": [{"name": "English", "score": 1.0}]} for i in range(len(scores))]},
+			{"documents": [{"id": str(i), "score": score} for i, score in enumerate(scores)]},
+			{"documents": [{"id": "0", "keyPhrases": phrases}]})
+
+	def test_sharded_aggregates_merge_exactly(self):
+		shards = [self.outputs([0.1, 0.9], ["trump", "vote"]), self.outputs([0.5], ["trump"])]
+		merged = TextAnalyticsAggregate()
+		for shard in shards:
+			merged.merge(TextAnalyticsAggregate.loads(TextAnalyticsAggregate().update(*shard).dumps()))
+		single = TextAnalyticsAggregate()
+		for shard in shards:
+			single.update(*shard)
+		self.assertEqual(merged.summary()["kAgg"], {"trump": 2, "vote": 1})
+		self.assertEqual(merged.summary()["lAgg"], {"English": {"count": 3, "confidence": 1.0}})
+		self.assertAlmostEqual(merged.summary()["sAgg"]["variance"], single.summary()["sAgg"]["variance"])
+		self.assertEqual(merged.documents, 3)
+
+if __name__ == "__main__":
+	unittest.main()
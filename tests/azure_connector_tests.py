@@ -0,0 +1,141 @@
+import http.server, json, os, socketserver, sys, threading, time, unittest
+sys.path.append(os.path.join(os.path.dirname(__file__), "..", "examples"))
+from azure_text_analytics_connector import AzureTextAnalyticsConnector, DocumentBatcher, RateLimiter
+
+class LocalServer(socketserver.ThreadingMixIn, http.server.HTTPServer):
+
+	# http.server.ThreadingHTTPServer needs python 3.7
+	daemon_threads = True
+
+class ThrottlingHandler(http.server.BaseHTTPRequestHandler):
+
+	requests = []
+	throttled = 0
+
+	def do_POST(self):
+		body = json.loads(self.rfile.read(int(self.headers["Content-Length"])).decode("utf-8"))
+		ThrottlingHandler.requests.append(self.path)
+		if ThrottlingHandler.throttled > 0:
+			ThrottlingHandler.throttled -= 1
+			self.send_response(429)
+			self.send_header("Retry-After", "0")
+			self.send_header("Content-Length", "2")
+			self.end_headers()
+			self.wfile.write(b"{}")
+			return
+		payload = json.dumps({"documents": [{"id": document["id"], "score": 0.5} for document in body["documents"]], "errors": []}).encode("utf-8")
+		self.send_response(200)
+		self.send_header("Content-Type", "application/json")
+		self.send_header("Content-Length", str(len(payload)))
+		self.end_headers()
+		self.wfile.write(payload)
+
+	def log_message(self, *args):
+		pass
+
+class EchoConnector(AzureTextAnalyticsConnector):
+
+	def __init__(self, failing: str = None):
+		super().__init__("app", "key", "http://127.0.0.1/", maxWorkers=4)
+		self.failing = failing
+
+	def call_text_analytics(self, docs: dict, apiType: str, retries: int = 3) -> dict:
+		if apiType == self.failing and docs["documents"][0]["id"] != "0":
+			raise IOError("call failed")
+		return {"documents": [{"id": document["id"], apiType: document["text"]} for document in reversed(docs["documents"])], "errors": []}
+
+class DocumentBatcherTests(unittest.TestCase):
+
+	def test_long_texts_are_split(self):
+		batcher = DocumentBatcher(maxDocumentChars=10)
+		batches = batcher.pack(["a" * 25, "b"])
+		self.assertEqual([document["text"] for document in batches[0]["documents"]], ["a" * 10, "a" * 10, "a" * 5, "b"])
+		self.assertEqual(batcher.sources, {"0": 0, "1": 0, "2": 0, "3": 1})
+
+	def test_split_counts_utf16_code_units(self):
+		batcher = DocumentBatcher(maxDocumentChars=10)
+		documents = [document["text"] for document in batcher.pack(["\U0001F600" * 6 + "abc"])[0]["documents"]]
+		self.assertEqual(documents, ["\U0001F600" * 5, "\U0001F600abc"])
+		self.assertTrue(all(len(text.encode("utf-16-le")) // 2 <= 10 for text in documents))
+		self.assertEqual([len(document["text"]) for document in DocumentBatcher().pack(["\U0001F600" * 6000])[0]["documents"]], [2500, 2500, 1000])
+
+	def test_batches_respect_wire_size_and_count(self):
+		batcher = DocumentBatcher(maxRequestBytes=200, maxDocuments=3)
+		batches = batcher.pack(["text number {i}".format(i=i) for i in range(20)])
+		self.assertTrue(all(len(json.dumps(batch).encode("utf-8")) <= 200 for batch in batches))
+		self.assertTrue(all(len(batch["documents"]) <= 3 for batch in batches))
+		self.assertEqual(sum(len(batch["documents"]) for batch in batches), 20)
+		sizes = [len(json.dumps(batch).encode("utf-8")) for batch in DocumentBatcher(maxRequestBytes=200).pack(["text number {i}".format(i=i) for i in range(20)])]
+		self.assertTrue(all(size > 200 - 45 for size in sizes[:-1]))
+
+	def test_ids_are_unique_across_calls(self):
+		batcher = DocumentBatcher()
+		first, second = batcher.pack(["a", "b"]), batcher.pack(["c"])
+		self.assertEqual([document["id"] for batch in first + second for document in batch["documents"]], ["0", "1", "2"])
+
+	def test_oversized_document_raises(self):
+		with self.assertRaises(ValueError):
+			DocumentBatcher(maxRequestBytes=30, maxDocumentChars=100).pack(["x" * 50])
+
+class RateLimiterTests(unittest.TestCase):
+
+	def test_calls_beyond_capacity_wait(self):
+		limiter = RateLimiter(calls=2, period=0.5)
+		start = time.monotonic()
+		for _ in range(3):
+			limiter.acquire()
+		self.assertGreater(time.monotonic() - start, 0.2)
+
+class ConnectorTests(unittest.TestCase):
+
+	def setUp(self):
+		ThrottlingHandler.requests, ThrottlingHandler.throttled = [], 0
+		self.server = LocalServer(("127.0.0.1", 0), ThrottlingHandler)
+		threading.Thread(target=self.server.serve_forever, daemon=True).start()
+		endpoint = "http://127.0.0.1:{port}/".format(port=self.server.server_address[1])
+		self.connector = AzureTextAnalyticsConnector("app", "key", endpoint, callsPerMinute=6000)
+
+	def tearDown(self):
+		self.server.shutdown()
+		self.server.server_close()
+
+	def test_throttled_calls_are_retried(self):
+		ThrottlingHandler.throttled = 2
+		output = self.connector.call_text_analytics({"documents": [{"id": "0", "text": "a"}]}, "sentiment")
+		self.assertEqual(output["documents"], [{"id": "0", "score": 0.5}])
+		self.assertEqual(len(ThrottlingHandler.requests), 3)
+
+	def test_submit_batches_keeps_order(self):
+		batches = DocumentBatcher(maxDocuments=1).pack(["a", "b", "c", "d"])
+		outputs = self.connector.submit_batches(batches, "sentiment")
+		self.assertEqual([output["documents"][0]["id"] for output in outputs], ["0", "1", "2", "3"])
+
+class AnalyzeTests(unittest.TestCase):
+
+	def test_results_are_merged_and_joined_by_id(self):
+		connector = EchoConnector()
+		sources, results = connector.analyze(["a", "b", "c"], ["sentiment", "keyPhrases"])
+		self.assertEqual(sources, {"0": 0, "1": 1, "2": 2})
+		self.assertEqual([document["id"] for document in results["sentiment"]["documents"]], ["0", "1", "2"])
+		joined = connector.join_results(results)
+		self.assertEqual(joined["1"], {"sentiment": {"id": "1", "sentiment": "b"}, "keyPhrases": {"id": "1", "keyPhrases": "b"}})
+
+	def test_language_confidence_is_the_mean_of_every_score(self):
+		output = {"documents": [{"id": str(i), "detectedLanguages": [{"name": "English", "score": score}]} for i, score in enumerate([1.0, 1.0, 0.1])]}
+		languages = EchoConnector().languages_aggregator(output)
+		self.assertEqual(languages["English"]["count"], 3)
+		self.assertAlmostEqual(languages["English"]["confidence"], 0.7)
+
+	def test_failed_batches_report_errors_per_document(self):
+		connector = EchoConnector(failing="sentiment")
+		texts = ["x" * 5000] * 250
+		sources, results = connector.analyze(texts, ["sentiment", "keyPhrases"])
+		self.assertGreater(len(results["sentiment"]["errors"]), 0)
+		self.assertEqual(len(results["sentiment"]["documents"]) + len(results["sentiment"]["errors"]), 250)
+		self.assertEqual(len(results["keyPhrases"]["documents"]), 250)
+		joined = connector.join_results(results)
+		failed = results["sentiment"]["errors"][0]["id"]
+		self.assertEqual(list(joined[failed]), ["keyPhrases"])
+
+if __name__ == "__main__":
+	unittest.main()
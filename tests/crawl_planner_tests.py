@@ -0,0 +1,54 @@
+import os, sys, unittest
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+from open_social.common.crawl_planner import CrawlPlanner
+from open_social.common.utils import plan_search, search
+
+class FakeClient(object):
+
+	def __init__(self, pages: dict):
+		self.pages = pages
+		self.fetches = {source: 0 for source in pages}
+
+	def get_page(self, sourceName: str) -> (list, list):
+		return self.update_page([sourceName, 0])
+
+	def update_page(self, nextPageLink: list) -> (list, list):
+		source, index = nextPageLink
+		self.fetches[source] += 1
+		dataPage = self.pages[source][index] if index < len(self.pages[source]) else []
+		return dataPage, [source, index + 1]
+
+	def match(self, searchTerm: str, datum: dict) -> bool:
+		return searchTerm in datum["text"]
+
+	def parse(self, datum: dict) -> dict:
+		return datum
+
+class CrawlPlannerTests(unittest.TestCase):
+
+	def test_more_sources_than_limit(self):
+		planner = CrawlPlanner(["a", "b", "c"], 2)
+		self.assertEqual(sum(state.quota for state in planner.states), 2)
+
+	def test_quiet_source_quota_is_reassigned(self):
+		client = FakeClient({
+			"quiet": [[{"text": "nothing"}] * 5] * 50,
+			"busy": [[{"text": "trump"}] * 5] * 50})
+		data = search(client, "trump", ["quiet", "busy"], 10, maxPages=3)
+		self.assertEqual(len(data), 10)
+		self.assertEqual(client.fetches["quiet"], 3)
+
+	def test_request_bound(self):
+		client = FakeClient({"busy": [[{"text": "trump"}] * 5] * 50})
+		planner = CrawlPlanner(["busy"], 10, maxRequests=4)
+		data = plan_search(client, "trump", planner)
+		self.assertEqual(len(data), 3)
+		self.assertTrue(planner.report()["sources"][0]["exhausted"])
+
+	def test_empty_source_stops(self):
+		client = FakeClient({"empty": []})
+		self.assertEqual(search(client, "trump", ["empty"], 10), [])
+		self.assertEqual(client.fetches["empty"], 1)
+
+if __name__ == '__main__':
+	unittest.main()
@@ -0,0 +1,64 @@
+import os, sys, tempfile, unittest
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+from open_social.common.crawl_worker import CrawlCoordinator, CrawlWorker
+from open_social.common.job_queue import LocalJobQueue, SQLiteJobQueue
+from open_social.common.sinks import MemorySink
+
+class FakeClient(object):
+
+	platform = "reddit"
+	sourceKey = "subReddits"
+
+	def search(self, searchTerm: str, sources: list, limit: int) -> list:
+		if sources[0] == "broken":
+			raise ValueError("broken source")
+		return [{"id": "{source}-{i}".format(source=sources[0], i=i), "title": searchTerm} for i in range(limit)]
+
+class ReportingClient(FakeClient):
+
+	def search(self, searchTerm: str, sources: list, limit: int) -> list:
+		if sources[0] == "broken":
+			return [{"id": "broken-0", "title": searchTerm}, [{"error(s)": "broken source"}]]
+		return super().search(searchTerm, sources, limit)
+
+class CrawlWorkerTests(unittest.TestCase):
+
+	def run_job(self, queue: object):
+		sink = MemorySink()
+		coordinator = CrawlCoordinator(queue)
+		jobId = coordinator.submit_job(["trump"], {"reddit": ["news", "politics", "broken"]}, 9)
+		worker = CrawlWorker([FakeClient()], queue, sink, workerId="worker")
+		worker.run()
+		self.assertTrue(coordinator.wait(jobId, timeout=0))
+		self.assertEqual(len(sink.data["reddit"]), 6)
+		self.assertEqual(coordinator.status(jobId), {"pending": 0, "leased": 0, "done": 2, "failed": 1})
+
+	def test_local_queue(self):
+		self.run_job(LocalJobQueue())
+
+	def test_sqlite_queue(self):
+		with tempfile.TemporaryDirectory() as directory:
+			self.run_job(SQLiteJobQueue(os.path.join(directory, "queue.db")))
+
+	def test_error_entries_fail_the_task(self):
+		queue, sink = LocalJobQueue(maxAttempts=2), MemorySink()
+		coordinator = CrawlCoordinator(queue)
+		jobId = coordinator.submit_job(["trump"], {"reddit": ["news", "broken"]}, 4)
+		CrawlWorker([ReportingClient()], queue, sink, workerId="worker").run()
+		self.assertEqual(coordinator.status(jobId), {"pending": 0, "leased": 0, "done": 1, "failed": 1})
+		self.assertEqual([record["id"] for record in sink.data["reddit"]], ["news-0", "news-1"])
+		self.assertIn("broken source", [task for task in queue.tasks.values() if task["status"] == "failed"][0]["error"])
+
+	def test_expired_lease_is_reclaimed(self):
+		now = [0]
+		queue = LocalJobQueue(clock=lambda: now[0])
+		queue.put([{"platform": "reddit", "source": "news", "term": "trump", "limit": 1}])
+		task = queue.lease("first", 10)
+		self.assertIsNone(queue.lease("second", 10))
+		now[0] = 11
+		self.assertEqual(queue.lease("second", 10)["id"], task["id"])
+		self.assertFalse(queue.complete(task["id"], "first", 1))
+		self.assertTrue(queue.complete(task["id"], "second", 1))
+
+if __name__ == '__main__':
+	unittest.main()
@@ -0,0 +1,104 @@
+import http.server, os, pickle, socketserver, sys, threading, time, unittest
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+from open_social.common.deadline import Deadline, activated, bound_session, current_deadline, is_partial
+from open_social.common.utils import search
+from open_social.open_social import OpenSocial
+from open_social.tumblr_op.tumblr_client import TumblrClient
+import requests
+
+class LocalServer(socketserver.ThreadingMixIn, http.server.HTTPServer):
+
+	# http.server.ThreadingHTTPServer needs python 3.7
+	daemon_threads = True
+
+class SlowClient(TumblrClient):
+
+	def __init__(self, delay: float):
+		self.config = {}
+		self.delay = delay
+
+	def get_page(self, sourceName: str) -> (list, list):
+		return self.update_page([sourceName, 0])
+
+	def update_page(self, nextPageLink: list) -> (list, list):
+		time.sleep(self.delay)
+		source, offset = nextPageLink
+		return [{"id": "{source}-{i}".format(source=source, i=i), "summary": "trump"} for i in range(offset, offset + 5)], [source, offset + 5]
+
+	def match(self, searchTerm: str, datum: dict) -> bool:
+		return searchTerm in datum["summary"]
+
+	def parse(self, datum: dict) -> dict:
+		return datum
+
+class HangingClient(SlowClient):
+
+	platform = "hanging"
+
+	def search(self, searchTerm: str, sources: list, limit: int, maxPages: int = None, maxRequests: int = None) -> list:
+		time.sleep(self.delay)
+		return []
+
+class SlowHandler(http.server.BaseHTTPRequestHandler):
+
+	def do_GET(self):
+		time.sleep(1)
+		self.send_response(200)
+		self.end_headers()
+
+	def log_message(self, *args):
+		pass
+
+class DeadlineTests(unittest.TestCase):
+
+	def test_cancel_and_pickle(self):
+		deadline = Deadline(seconds=60)
+		self.assertFalse(deadline.expired())
+		self.assertLessEqual(deadline.timeout(5), 5)
+		self.assertAlmostEqual(pickle.loads(pickle.dumps(deadline)).at, deadline.at)
+		deadline.cancel()
+		self.assertTrue(deadline.expired())
+		self.assertEqual(deadline.remaining(), 0.0)
+
+	def test_activated_restores_the_previous_deadline(self):
+		outer, inner = Deadline(60), Deadline(1)
+		with activated(outer):
+			with activated(None):
+				self.assertIs(current_deadline(), outer)
+			with activated(inner):
+				self.assertIs(current_deadline(), inner)
+			self.assertIs(current_deadline(), outer)
+		self.assertIsNone(current_deadline())
+
+	def test_crawl_returns_gathered_data_when_deadline_passes(self):
+		deadline = Deadline(seconds=0.25)
+		with deadline.activate():
+			payload = search(SlowClient(0.1), "trump", ["a"], 1000, maxPages=100)
+		self.assertTrue(0 < len(payload) < 100)
+		self.assertTrue(all(isinstance(entry, dict) for entry in payload))
+		self.assertTrue(deadline.is_partial("tumblr"))
+
+	def test_session_requests_are_bounded(self):
+		server = LocalServer(("127.0.0.1", 0), SlowHandler)
+		threading.Thread(target=server.serve_forever, daemon=True).start()
+		session = bound_session(requests.Session())
+		url = "http://127.0.0.1:{port}/".format(port=server.server_address[1])
+		started = time.monotonic()
+		with Deadline(seconds=0.2).activate():
+			with self.assertRaises(requests.exceptions.Timeout):
+				session.get(url)
+		self.assertLess(time.monotonic() - started, 0.9)
+		server.shutdown()
+
+	def test_evaluate_all_clients_flags_partial_platforms(self):
+		social = OpenSocial.__new__(OpenSocial)
+		social.clients = [SlowClient(0.1), HangingClient(2)]
+		started = time.monotonic()
+		results = social.evaluate_all_clients("trump", 1000, deadline=0.3, blogs=["a"], maxPages=100)
+		self.assertLess(time.monotonic() - started, 1.5)
+		self.assertTrue(is_partial(results["tumblr"]))
+		self.assertTrue(any(isinstance(entry, dict) for entry in results["tumblr"]))
+		self.assertEqual(results["hanging"], [[{"partial": "deadline exceeded"}]])
+
+if __name__ == "__main__":
+	unittest.main()
@@ -0,0 +1,98 @@
+import os, sys, threading, time, unittest
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+from open_social.common.hedging import Hedger, LatencyTracker, hedged_call
+
+class FakeClient(object):
+
+	platform = "tumblr"
+
+	def __init__(self, hedger: Hedger = None):
+		self.hedger = hedger
+		self.calls = 0
+		self.threads = []
+		self.lock = threading.Lock()
+
+	def posts(self, delays: list, failing: int = None) -> int:
+		with self.lock:
+			call = self.calls
+			self.calls += 1
+			self.threads.append(threading.get_ident())
+		time.sleep(delays[call] if call < len(delays) else 0.001)
+		if call == failing:
+			raise IOError("read timed out")
+		return call
+
+class SharedStateClient(FakeClient):
+
+	hedgeable = False
+
+class HedgingTests(unittest.TestCase):
+
+	def test_percentile_needs_samples(self):
+		tracker = LatencyTracker(window=10, minSamples=5)
+		for latency in [0.1, 0.2, 0.3, 0.4]:
+			tracker.record("tumblr:page", latency)
+		self.assertIsNone(tracker.percentile("tumblr:page", 90))
+		for latency in range(100):
+			tracker.record("tumblr:page", latency)
+		self.assertEqual(tracker.percentile("tumblr:page", 50), 94)
+
+	def test_without_hedger_calls_directly(self):
+		client = FakeClient()
+		self.assertEqual(hedged_call(client, "page", client.posts, []), 0)
+
+	def test_failed_slow_request_uses_the_duplicate(self):
+		hedger = Hedger(percentile=90, maxHedgeRate=0.5, minDelay=0.01, minSamples=5)
+		client = FakeClient(hedger)
+		for _ in range(10):
+			hedged_call(client, "page", client.posts, [])
+		result = hedged_call(client, "page", client.posts, [0.0] * 10 + [0.1, 0.3], failing=10)
+		self.assertEqual(result, 11)
+		self.assertNotIn(threading.get_ident(), client.threads[10:])
+		report = hedger.report()["tumblr:page"]
+		self.assertEqual((report["requests"], report["hedges"], report["hedgeWins"]), (11, 1, 1))
+		hedger.close()
+
+	def test_slow_request_loses_to_a_fast_duplicate(self):
+		hedger = Hedger(percentile=90, maxHedgeRate=0.5, minDelay=0.01, minSamples=5)
+		client = FakeClient(hedger)
+		for _ in range(10):
+			hedged_call(client, "page", client.posts, [])
+		started = time.monotonic()
+		result = hedged_call(client, "page", client.posts, [0.0] * 10 + [1.0])
+		self.assertLess(time.monotonic() - started, 0.5)
+		self.assertEqual(result, 11)
+		self.assertEqual(hedger.report()["tumblr:page"]["hedgeWins"], 1)
+		hedger.close()
+
+	def test_fast_request_is_not_duplicated(self):
+		hedger = Hedger(percentile=90, maxHedgeRate=0.5, minDelay=0.2, minSamples=5)
+		client = FakeClient(hedger)
+		for _ in range(10):
+			hedged_call(client, "page", client.posts, [])
+		with self.assertRaises(IOError):
+			hedged_call(client, "page", client.posts, [], failing=10)
+		self.assertEqual(client.calls, 11)
+		self.assertEqual(hedger.report()["tumblr:page"]["hedges"], 0)
+		hedger.close()
+
+	def test_clients_that_are_not_thread_safe_are_not_hedged(self):
+		hedger = Hedger(minSamples=1)
+		client = SharedStateClient(hedger)
+		for _ in range(3):
+			hedged_call(client, "page", client.posts, [])
+		self.assertEqual(hedger.report(), {})
+		hedger.close()
+
+	def test_hedge_rate_is_capped(self):
+		hedger = Hedger(percentile=50, maxHedgeRate=0.1, minDelay=0.001, minSamples=5)
+		client = FakeClient(hedger)
+		for _ in range(20):
+			hedged_call(client, "page", client.posts, [0.02] * 200)
+		report = hedger.report()["tumblr:page"]
+		self.assertLessEqual(report["hedges"], 2)
+		self.assertLessEqual(report["hedgeRate"], 0.1)
+		hedger.close()
+
+if __name__ == "__main__":
+	unittest.main()
@@ -0,0 +1,78 @@
+import os, sys, tempfile, unittest
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+from open_social.common.identifier_cache import SourceIdentifierCache
+
+class ApiError(Exception):
+
+	def __init__(self, message: str, code: int):
+		super().__init__(message)
+		self.code = code
+
+class Resolver(object):
+
+	def __init__(self):
+		self.calls = 0
+
+	def __call__(self, name: str) -> str:
+		self.calls += 1
+		return "{name}-{calls}".format(name=name, calls=self.calls)
+
+class IdentifierCacheTests(unittest.TestCase):
+
+	def setUp(self):
+		self.directory = tempfile.TemporaryDirectory()
+		self.path = os.path.join(self.directory.name, "identifiers.db")
+
+	def tearDown(self):
+		self.directory.cleanup()
+
+	def test_lookups_are_shared_after_startup(self):
+		first, second, resolver = SourceIdentifierCache(self.path), SourceIdentifierCache(self.path), Resolver()
+		self.assertEqual(first.resolve("facebook", "CNN", resolver), "CNN-1")
+		self.assertEqual(second.resolve("facebook", "cnn ", resolver), "CNN-1")
+		self.assertEqual(resolver.calls, 1)
+
+	def test_entries_expire(self):
+		now = [0]
+		cache, resolver = SourceIdentifierCache(self.path, ttl=10, clock=lambda: now[0]), Resolver()
+		cache.resolve("instagram", "user", resolver)
+		now[0] = 11
+		self.assertIsNone(cache.get("instagram", "user"))
+		self.assertEqual(cache.resolve("instagram", "user", resolver), "user-2")
+
+	def test_stale_identifier_is_resolved_again(self):
+		cache, resolver = SourceIdentifierCache(self.path), Resolver()
+		cache.resolve("facebook", "cnn", resolver)
+
+		def request(identifier: str) -> dict:
+			if identifier == "cnn-1":
+				raise ApiError("page was migrated", 803)
+			return {"id": identifier}
+
+		self.assertEqual(cache.fetch("facebook", "cnn", resolver, request), ("cnn-2", {"id": "cnn-2"}))
+		self.assertEqual(SourceIdentifierCache(self.path).get("facebook", "cnn"), "cnn-2")
+
+	def test_transient_errors_keep_the_identifier(self):
+		cache, resolver = SourceIdentifierCache(self.path), Resolver()
+		cache.resolve("instagram", "user", resolver)
+
+		def request(identifier: str) -> dict:
+			raise ApiError("connection reset", 0)
+
+		with self.assertRaises(ApiError):
+			cache.fetch("instagram", "user", resolver, request)
+		self.assertEqual(resolver.calls, 1)
+		self.assertEqual(cache.get("instagram", "user"), "user-1")
+
+	def test_warm_skips_failures(self):
+		cache = SourceIdentifierCache(self.path)
+
+		def resolver(name: str) -> str:
+			if name == "missing":
+				raise ApiError("not found", 404)
+			return name.upper()
+
+		self.assertEqual(cache.warm("facebook", ["cnn", "missing"], resolver), {"cnn": "CNN"})
+
+if __name__ == "__main__":
+	unittest.main()
@@ -0,0 +1,98 @@
+import json, multiprocessing, os, sys, tempfile, threading, time, unittest
+from unittest import mock
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+from open_social.common.file_lock import FileLock
+from open_social.instagram_op import instagram_session_manager
+from open_social.instagram_op.instagram_session_manager import InstagramSessionManager
+
+class FakeCookieJar(object):
+
+	def __init__(self, expiresAt: float):
+		self.expires_earliest = expiresAt
+
+class FakeApi(object):
+
+	logins = 0
+	lifetime = 7200
+
+	def __init__(self, username: str, password: str, settings: dict = None):
+		if settings is None:
+			FakeApi.logins += 1
+			settings = {"expires": time.time() + FakeApi.lifetime}
+		self.settings = settings
+		self.cookie_jar = FakeCookieJar(settings["expires"])
+
+def hold_lock(path: str, locked: object, seconds: float):
+	with FileLock(path):
+		locked.set()
+		time.sleep(seconds)
+
+class InstagramSessionTests(unittest.TestCase):
+
+	def setUp(self):
+		self.directory = tempfile.TemporaryDirectory()
+		FakeApi.logins, FakeApi.lifetime = 0, 7200
+		self.patch = mock.patch.object(instagram_session_manager, "Client", FakeApi)
+		self.patch.start()
+
+	def tearDown(self):
+		self.patch.stop()
+		self.directory.cleanup()
+
+	def manager(self, **options) -> InstagramSessionManager:
+		return InstagramSessionManager([("user", "password")], cacheDir=self.directory.name, **options)
+
+	def test_file_lock_is_reentrant_and_excludes_threads(self):
+		lock, inside, overlaps = FileLock(os.path.join(self.directory.name, "a.lock")), [0], []
+
+		def work():
+			with lock:
+				with lock:
+					inside[0] += 1
+					overlaps.append(inside[0])
+					time.sleep(0.01)
+					inside[0] -= 1
+
+		threads = [threading.Thread(target=work) for _ in range(5)]
+		for thread in threads:
+			thread.start()
+		for thread in threads:
+			thread.join()
+		self.assertEqual(overlaps, [1] * 5)
+
+	def test_file_lock_excludes_processes(self):
+		path, locked = os.path.join(self.directory.name, "b.lock"), multiprocessing.Event()
+		process = multiprocessing.Process(target=hold_lock, args=(path, locked, 0.3))
+		process.start()
+		locked.wait(5)
+		start = time.time()
+		with FileLock(path):
+			waited = time.time() - start
+		process.join()
+		self.assertGreater(waited, 0.1)
+
+	def test_cache_is_shared_between_managers(self):
+		self.manager().get_client()
+		self.manager().get_client()
+		self.assertEqual(FakeApi.logins, 1)
+		self.assertTrue(os.path.exists(os.path.join(self.directory.name, "instagram_client_cache_user.json")))
+
+	def test_legacy_cache_is_migrated(self):
+		with open(os.path.join(self.directory.name, "instagram_client_cache.json"), "w") as file:
+			json.dump({"expires": time.time() + 7200}, file)
+		self.manager().get_client()
+		self.assertEqual(FakeApi.logins, 0)
+		self.assertTrue(os.path.exists(os.path.join(self.directory.name, "instagram_client_cache_user.json")))
+
+	def test_expiring_session_is_renewed_once(self):
+		manager = self.manager(refreshMargin=600)
+		FakeApi.lifetime = 60
+		manager.get_client()
+		manager.refresh()
+		self.assertEqual(FakeApi.logins, 1)
+		manager.loginTimes["user"] -= manager.checkInterval
+		manager.refresh()
+		self.assertEqual(FakeApi.logins, 2)
+
+if __name__ == "__main__":
+	unittest.main()
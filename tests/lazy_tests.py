@@ -0,0 +1,83 @@
+import json, os, sys, threading, unittest
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+from open_social.common.deadline import Deadline, current_deadline
+from open_social.common.lazy import LazySecondary, SecondaryResolver, resolve, secondary_information
+
+class FakeClient(object):
+
+	platform = "reddit"
+
+	def __init__(self, resolver: SecondaryResolver = None):
+		self.resolver = resolver
+		self.fetched = []
+		self.deadlines = {}
+		self.lock = threading.Lock()
+
+	def parse(self, postId: int) -> dict:
+		return {"id": postId, "title": "post", "secondary_information": secondary_information(self, lambda: {"comments": self.get_comments(postId)})}
+
+	def get_comments(self, postId: int) -> list:
+		if postId < 0:
+			raise ValueError("no such post")
+		with self.lock:
+			self.fetched.append(postId)
+			self.deadlines[postId] = current_deadline()
+		return [{"body": "comment on {postId}".format(postId=postId), "user_screen_name": "someone"}]
+
+class LazyTests(unittest.TestCase):
+
+	def test_eager_without_resolver(self):
+		client = FakeClient()
+		record = client.parse(1)
+		self.assertEqual(client.fetched, [1])
+		self.assertNotIsInstance(record["secondary_information"], LazySecondary)
+
+	def test_access_fetches_a_batch(self):
+		client = FakeClient(SecondaryResolver(batchSize=3))
+		records = [client.parse(i) for i in range(6)]
+		self.assertEqual(client.fetched, [])
+		self.assertEqual(records[0]["title"], "post")
+		self.assertEqual(records[0]["secondary_information"]["comments"][0]["body"], "comment on 0")
+		self.assertTrue(all(record["secondary_information"].event.wait(5) for record in records[:3]))
+		self.assertEqual(sorted(client.fetched), [0, 1, 2])
+		self.assertEqual(records[4]["secondary_information"].get("comments")[0]["body"], "comment on 4")
+		self.assertTrue(all(record["secondary_information"].event.wait(5) for record in records))
+		self.assertEqual(sorted(client.fetched), [0, 1, 2, 3, 4, 5])
+
+	def test_background_fetches_without_access(self):
+		client = FakeClient(SecondaryResolver(background=True))
+		deadline = Deadline(60)
+		with deadline.activate():
+			records = [client.parse(i) for i in range(4)]
+		self.assertTrue(all(record["secondary_information"].event.wait(5) for record in records))
+		self.assertEqual(sorted(client.fetched), [0, 1, 2, 3])
+		self.assertTrue(all(client.deadlines[i] is deadline for i in range(4)))
+
+	def test_batch_fetches_use_the_reader_deadline(self):
+		client = FakeClient(SecondaryResolver(batchSize=3))
+		records = [client.parse(i) for i in range(3)]
+		deadline = Deadline(60)
+		with deadline.activate():
+			resolve(records)
+		self.assertTrue(all(client.deadlines[i] is deadline for i in range(3)))
+
+	def test_pending_drops_collected_handles(self):
+		resolver = SecondaryResolver()
+		resolver.pruneAt = resolver.minPruneAt = 10
+		client = FakeClient(resolver)
+		kept = [client.parse(i) for i in range(5)]
+		for i in range(100):
+			client.parse(i)
+		self.assertLessEqual(len(resolver.pending), 20)
+		self.assertEqual(len(resolver.take_pending(10)), 5)
+		self.assertEqual(len(kept), 5)
+
+	def test_resolve_before_serializing(self):
+		client = FakeClient(SecondaryResolver())
+		results = {"reddit": [client.parse(1), client.parse(-1), [{"error(s)": []}]]}
+		payload = json.loads(json.dumps(resolve(results)))
+		self.assertEqual(payload["reddit"][0]["secondary_information"]["comments"][0]["body"], "comment on 1")
+		self.assertIn("error(s)", payload["reddit"][1]["secondary_information"])
+
+if __name__ == "__main__":
+	unittest.main()
@@ -0,0 +1,47 @@
+import os, sys, unittest
+sys.path.append(os.path.join(os.path.dirname(__file__), "..", "examples"))
+from local_text_analytics import LocalTextAnalytics
+
+class LocalTextAnalyticsTests(unittest.TestCase):
+
+	def setUp(self):
+		self.analytics = LocalTextAnalytics()
+
+	def documents(self, texts: list) -> dict:
+		return {"documents": [{"id": str(i), "text": text} for i, text in enumerate(texts)]}
+
+	def test_base_initializer_runs(self):
+		self.assertEqual((self.analytics.appName, self.analytics.maxWorkers), ("local", 4))
+		self.assertIsNotNone(self.analytics.rateLimiter)
+
+	def test_sentiment_with_negation(self):
+		output = self.analytics.call_text_analytics(self.documents(["a great and wonderful day", "a terrible disaster", "not good", "the table"]), "sentiment")
+		scores = [document["score"] for document in output["documents"]]
+		self.assertGreater(scores[0], 0.5)
+		self.assertLess(scores[1], 0.5)
+		self.assertLess(scores[2], 0.5)
+		self.assertEqual(scores[3], 0.5)
+
+	def test_languages(self):
+		output = self.analytics.call_text_analytics(self.documents([
+			"the president said that he will not sign the bill",
+			"el presidente dijo que no va a firmar la ley porque es muy mala",
+			"der Präsident sagte, dass er das Gesetz nicht unterschreiben wird",
+			""]), "languages")
+		names = [document["detectedLanguages"][0]["name"] for document in output["documents"]]
+		self.assertEqual(names, ["English", "Spanish", "German", "(Unknown)"])
+
+	def test_key_phrases(self):
+		output = self.analytics.call_text_analytics(self.documents(["The senate voted on the border wall funding bill today."]), "keyPhrases")
+		phrases = output["documents"][0]["keyPhrases"]
+		self.assertIn("border wall funding bill today", phrases)
+		self.assertTrue(all(phrase.split()[0] not in self.analytics.stopwords for phrase in phrases))
+
+	def test_analyze_runs_offline(self):
+		sources, results = self.analytics.analyze(["good news", "bad news"])
+		self.assertEqual(sorted(results), ["keyPhrases", "languages", "sentiment"])
+		self.assertEqual(len(self.analytics.join_results(results)), 2)
+		self.assertEqual(self.analytics.call_text_analytics(self.documents(["x"]), "entities")["errors"][0]["id"], "0")
+
+if __name__ == "__main__":
+	unittest.main()
@@ -0,0 +1,132 @@
+import http.server, os, socketserver, sqlite3, sys, tempfile, threading, unittest
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+from open_social.common.deadline import Deadline
+from open_social.common.media import ByteBudget, MediaStore, find_media, instagram_media, tumblr_media
+from open_social.open_social import OpenSocial
+
+class LocalServer(socketserver.ThreadingMixIn, http.server.HTTPServer):
+
+	# http.server.ThreadingHTTPServer needs python 3.7
+	daemon_threads = True
+
+class QuietHandler(http.server.SimpleHTTPRequestHandler):
+
+	requests = []
+	served = None
+
+	def translate_path(self, path: str) -> str:
+		# the directory argument of the handler needs python 3.7
+		return os.path.join(QuietHandler.served, os.path.relpath(super().translate_path(path), os.getcwd()))
+
+	def do_GET(self):
+		QuietHandler.requests.append(self.path)
+		super().do_GET()
+
+	def log_message(self, format: str, *args):
+		pass
+
+class ShortResponse(object):
+
+	headers = {"Content-Length": "5000", "Content-Type": "image/jpeg"}
+
+	def __enter__(self) -> object:
+		return self
+
+	def __exit__(self, *args):
+		pass
+
+	def raise_for_status(self):
+		pass
+
+	def iter_content(self, chunk_size: int) -> list:
+		return [b"x" * 1000]
+
+class ShortSession(object):
+
+	def get(self, url: str, **kwargs) -> ShortResponse:
+		return ShortResponse()
+
+class MediaTests(unittest.TestCase):
+
+	def setUp(self):
+		self.served = tempfile.TemporaryDirectory()
+		self.stored = tempfile.TemporaryDirectory()
+		for name, content in [("a.jpg", b"x" * 1000), ("repost.jpg", b"x" * 1000), ("b.png", b"y" * 3000), ("c.mp4", b"z" * 5000)]:
+			with open(os.path.join(self.served.name, name), "wb") as file:
+				file.write(content)
+		QuietHandler.requests, QuietHandler.served = [], self.served.name
+		self.server = LocalServer(("127.0.0.1", 0), QuietHandler)
+		threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+	def tearDown(self):
+		self.server.shutdown()
+		self.server.server_close()
+		self.served.cleanup()
+		self.stored.cleanup()
+
+	def url(self, name: str) -> str:
+		return "http://127.0.0.1:{port}/{name}".format(port=self.server.server_address[1], name=name)
+
+	def test_same_content_is_stored_once(self):
+		results = MediaStore(self.stored.name, workers=4).download_all([self.url("a.jpg"), self.url("repost.jpg"), self.url("b.png"), self.url("a.jpg")])
+		self.assertEqual(len(results), 3)
+		self.assertEqual(results[self.url("a.jpg")]["path"], results[self.url("repost.jpg")]["path"])
+		self.assertTrue(results[self.url("b.png")]["path"].endswith(".png"))
+		files = [name for _, _, names in os.walk(self.stored.name) for name in names if not name.startswith("index.db")]
+		self.assertEqual(len(files), 2)
+
+	def test_second_job_uses_the_index(self):
+		urls = [self.url("a.jpg"), self.url("b.png")]
+		MediaStore(self.stored.name).download_all(urls)
+		QuietHandler.requests = []
+		results = MediaStore(self.stored.name).download_all(urls)
+		self.assertEqual(QuietHandler.requests, [])
+		self.assertTrue(all(result["cached"] for result in results.values()))
+
+	def test_connections_are_closed(self):
+		with MediaStore(self.stored.name).connect() as connection:
+			pass
+		with self.assertRaises(sqlite3.ProgrammingError):
+			connection.execute("SELECT 1")
+
+	def test_byte_budget_stops_downloads(self):
+		results = MediaStore(self.stored.name, workers=1).download_all([self.url("a.jpg"), self.url("b.png"), self.url("c.mp4")], maxBytes=4500)
+		self.assertIn("path", results[self.url("a.jpg")])
+		self.assertIn("path", results[self.url("b.png")])
+		self.assertIn("error(s)", results[self.url("c.mp4")])
+		self.assertFalse([name for name in os.listdir(self.stored.name) if name.endswith(".part")])
+
+	def test_short_body_returns_its_reservation(self):
+		store, budget = MediaStore(self.stored.name), ByteBudget(10000)
+		store.session = ShortSession()
+		self.assertEqual(store.download("http://example.com/a.jpg", budget)["bytes"], 1000)
+		self.assertEqual(budget.used, 1000)
+
+	def test_downloads_run_under_the_caller_deadline(self):
+		deadline = Deadline(60)
+		deadline.cancel()
+		with deadline.activate():
+			results = MediaStore(self.stored.name, workers=2).download_all([self.url("a.jpg"), self.url("b.png")])
+		self.assertTrue(all("error(s)" in result for result in results.values()))
+		self.assertEqual(QuietHandler.requests, [])
+
+	def test_download_media_annotates_records(self):
+		social = OpenSocial.__new__(OpenSocial)
+		data = {"tumblr": [{"id": 1, "media": [{"url": self.url("a.jpg"), "type": "image"}, {"url": self.url("missing.jpg"), "type": "image"}]}]}
+		report = social.download_media(data, directory=self.stored.name)
+		self.assertEqual((report["downloaded"], report["bytes"], report["errors"]), (1, 1000, 1))
+		self.assertTrue(os.path.exists(data["tumblr"][0]["media"][0]["path"]))
+		self.assertIn("error(s)", data["tumblr"][0]["media"][1])
+
+	def test_extractors(self):
+		carousel = {"carousel_media": [
+			{"image_versions2": {"candidates": [{"url": "https://i/1.jpg", "width": 1080, "height": 1080}, {"url": "https://i/1s.jpg"}]}},
+			{"video_versions": [{"url": "https://v/2.mp4", "width": 720, "height": 1280}], "image_versions2": {"candidates": [{"url": "https://i/2.jpg"}]}}
+		]}
+		self.assertEqual([(entry["url"], entry["type"]) for entry in instagram_media(carousel)], [("https://i/1.jpg", "image"), ("https://v/2.mp4", "video")])
+		post = {"photos": [{"original_size": {"url": "https://t/1.jpg", "width": 500, "height": 400}}], "video_url": "https://t/2.mp4"}
+		self.assertEqual([entry["url"] for entry in tumblr_media(post)], ["https://t/1.jpg", "https://t/2.mp4"])
+		self.assertEqual(len(find_media({"tumblr": [{"media": tumblr_media(post)}, [{"error(s)": "x"}]], "instagram": [{"media": instagram_media(carousel)}]})), 4)
+
+if __name__ == "__main__":
+	unittest.main()
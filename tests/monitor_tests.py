@@ -0,0 +1,107 @@
+import os, sys, unittest
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+from open_social.common.monitor import SourceMonitor
+from open_social.common.sinks import MemorySink
+
+class Clock(object):
+
+	def __init__(self):
+		self.now = 0.0
+
+	def __call__(self) -> float:
+		return self.now
+
+class FakeClient(object):
+
+	platform = "reddit"
+	sourceKey = "subReddits"
+
+	def __init__(self):
+		self.results = {}
+		self.calls = []
+
+	def search(self, searchTerm: str, sources: list, limit: int) -> list:
+		self.calls.append(sources[0])
+		return self.results.get(sources[0], [])[:limit]
+
+class FailingSink(MemorySink):
+
+	def __init__(self, failures: int):
+		super().__init__()
+		self.failures = failures
+
+	def write(self, task: dict, records: list):
+		if self.failures:
+			self.failures -= 1
+			raise IOError("sink unavailable")
+		super().write(task, records)
+
+def records(start: int, count: int) -> list:
+	return [{"id": i} for i in range(start, start + count)]
+
+class MonitorTests(unittest.TestCase):
+
+	def setUp(self):
+		self.clock, self.client = Clock(), FakeClient()
+
+	def monitor(self, sink: object = None) -> SourceMonitor:
+		return SourceMonitor([self.client], sink or MemorySink(), minInterval=10, maxInterval=1000, initialInterval=100,
+			targetNew=5, smoothing=1, backoff=2, clock=self.clock)
+
+	def test_subscriptions_are_polled_when_due(self):
+		monitor = self.monitor()
+		monitor.subscribe("reddit", "news", "trump")
+		monitor.subscribe("reddit", "pics", "trump")
+		self.assertEqual(monitor.run(maxPolls=2), 2)
+		self.assertEqual(self.client.calls, ["news", "pics"])
+		self.assertEqual(monitor.next_due().nextPoll, 100)
+		monitor.unsubscribe("reddit", "news", "trump")
+		self.assertEqual(monitor.next_due().source, "pics")
+
+	def test_interval_follows_velocity_and_backs_off(self):
+		monitor = self.monitor()
+		subscription = monitor.subscribe("reddit", "news", "trump")
+		self.client.results["news"] = records(0, 3)
+		monitor.poll(subscription)
+		self.assertEqual(subscription.interval, 100)
+		self.clock.now = 100
+		self.client.results["news"] = records(0, 13)
+		monitor.poll(subscription)
+		self.assertAlmostEqual(subscription.interval, 50)
+		for now, interval in [(150, 100), (250, 200), (450, 400), (850, 800), (1650, 1000)]:
+			self.clock.now = now
+			monitor.poll(subscription)
+			self.assertAlmostEqual(subscription.interval, interval)
+		self.assertEqual(subscription.nextPoll, 2650)
+
+	def test_old_and_repeated_records_are_dropped(self):
+		sink = MemorySink()
+		monitor = self.monitor(sink)
+		subscription = monitor.subscribe("reddit", "news", "trump")
+		self.client.results["news"] = records(0, 3) + records(1, 2)
+		self.assertEqual(len(monitor.poll(subscription)), 3)
+		self.client.results["news"] = records(2, 3)
+		self.assertEqual([record["id"] for record in monitor.poll(subscription)], [3, 4])
+		self.assertEqual([record["id"] for record in sink.data["reddit"]], [0, 1, 2, 3, 4])
+
+	def test_sink_errors_keep_the_subscription_scheduled(self):
+		sink = FailingSink(failures=1)
+		monitor = self.monitor(sink)
+		subscription = monitor.subscribe("reddit", "news", "trump")
+		self.client.results["news"] = records(0, 2)
+		self.assertEqual(monitor.poll(subscription), [])
+		self.assertEqual(subscription.nextPoll, 100)
+		self.assertEqual(len(monitor.report()[0]["errors"]), 1)
+		self.clock.now = 100
+		self.assertEqual(len(monitor.poll(subscription)), 2)
+		self.assertEqual(len(sink.data["reddit"]), 2)
+
+	def test_error_entries_are_reported(self):
+		monitor = self.monitor()
+		subscription = monitor.subscribe("reddit", "news", "trump")
+		self.client.results["news"] = records(0, 1) + [[{"error(s)": [{"error_type": "ValueError"}]}]]
+		self.assertEqual(len(monitor.poll(subscription)), 1)
+		self.assertEqual(monitor.report()[0]["errors"], [{"error_type": "ValueError"}])
+
+if __name__ == "__main__":
+	unittest.main()
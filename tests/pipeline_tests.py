@@ -0,0 +1,110 @@
+import os, sys, threading, time, unittest
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+from open_social.common.pipeline import Pipeline, Stage, crawl_pipeline, iter_pages
+from open_social.common.sinks import MemorySink
+
+class FakeClient(object):
+
+	platform = "tumblr"
+	sourceKey = "blogs"
+
+	def __init__(self):
+		self.parsed = 0
+		self.lock = threading.Lock()
+
+	def get_page(self, sourceName: str) -> (list, list):
+		return self.update_page([sourceName, 0])
+
+	def update_page(self, nextPageLink: list) -> (list, list):
+		source, offset = nextPageLink
+		# every page repeats its last post on the next page, like a feed that shifted
+		dataPage = [{"id": "{source}-{i}".format(source=source, i=i), "summary": "trump" if i % 2 == 0 else "other"} for i in range(offset, offset + 10)]
+		return dataPage, [source, offset + 9]
+
+	def match(self, searchTerm: str, datum: dict) -> bool:
+		return searchTerm in datum["summary"]
+
+	def parse(self, datum: dict) -> dict:
+		with self.lock:
+			self.parsed += 1
+		time.sleep(0.001)
+		return dict(datum, parsed=True)
+
+class LastPageClient(FakeClient):
+
+	def __init__(self):
+		super().__init__()
+		self.fetches = 0
+
+	def update_page(self, nextPageLink: list) -> (list, list):
+		self.fetches += 1
+		dataPage, nextPageLink = super().update_page(nextPageLink)
+		# the last page of an instagram feed links to [sourceId, None]
+		return dataPage, [nextPageLink[0], None if nextPageLink[1] >= 27 else nextPageLink[1]]
+
+class SharedSessionClient(FakeClient):
+
+	hedgeable = False
+
+	def __init__(self):
+		super().__init__()
+		self.active, self.overlaps = 0, 0
+
+	def parse(self, datum: dict) -> dict:
+		with self.lock:
+			self.active += 1
+			self.overlaps += self.active > 1
+		time.sleep(0.001)
+		with self.lock:
+			self.active -= 1
+		return dict(datum, parsed=True)
+
+class PipelineTests(unittest.TestCase):
+
+	def test_crawl_deduplicates_and_writes_batches(self):
+		client, sink = FakeClient(), MemorySink()
+		pipeline = crawl_pipeline(client, "Trump", ["a", "b"], 1000, sink, maxPages=3, batchSize=4)
+		report = pipeline.run(["a", "b"])
+		ids = [record["id"] for record in sink.data["tumblr"]]
+		self.assertEqual(len(ids), len(set(ids)))
+		self.assertEqual(len(ids), 28)
+		self.assertTrue(all(record["parsed"] for record in sink.data["tumblr"]))
+		self.assertEqual([stage["name"] for stage in report], ["fetch", "match", "dedupe", "enrich", "sink"])
+		self.assertEqual(report[2]["out"], 28)
+
+	def test_limit_stops_upstream_stages(self):
+		client, sink = FakeClient(), MemorySink()
+		pipeline = crawl_pipeline(client, "trump", ["a"], 5, sink, maxPages=1000)
+		pipeline.run(["a"])
+		self.assertEqual(len(sink.data["tumblr"]), 5)
+		self.assertEqual(client.parsed, 5)
+
+	def test_clients_that_are_not_thread_safe_use_one_worker(self):
+		client, sink = SharedSessionClient(), MemorySink()
+		report = crawl_pipeline(client, "trump", ["a", "b"], 1000, sink, maxPages=3).run(["a", "b"])
+		self.assertEqual(len(sink.data["tumblr"]), 28)
+		self.assertEqual(client.overlaps, 0)
+		self.assertEqual((report[0]["workers"], report[3]["workers"]), (1, 1))
+
+	def test_pages_stop_at_the_last_page(self):
+		client = LastPageClient()
+		self.assertEqual(len(list(iter_pages(client, "a"))), 30)
+		self.assertEqual(client.fetches, 3)
+		self.assertEqual(len(list(iter_pages(client, "a", maxPages=2))), 20)
+
+	def test_slow_stage_applies_backpressure(self):
+		produced, depth = [0], [0]
+		def produce(count: int):
+			for i in range(count):
+				produced[0] += 1
+				yield i
+		def consume(item: int):
+			depth[0] = max(depth[0], produced[0] - item)
+			time.sleep(0.001)
+		pipeline = Pipeline([Stage("produce", produce, many=True, queueSize=1), Stage("consume", consume, queueSize=5)])
+		report = pipeline.run([200])
+		self.assertEqual(report[1]["in"], 200)
+		self.assertLessEqual(depth[0], 8)
+
+if __name__ == "__main__":
+	unittest.main()
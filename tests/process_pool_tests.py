@@ -0,0 +1,71 @@
+import os, pickle, sys, unittest
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+from open_social.common import process_pool
+from open_social.open_social import OpenSocial
+from open_social.reddit_op.reddit_client import RedditClient
+from open_social.tumblr_op.tumblr_client import TumblrClient
+
+class FakeTumblrClient(TumblrClient):
+
+	def __init__(self, posts: int = 3, deferNotes: bool = False):
+		self.config = {"posts": posts, "deferNotes": deferNotes}
+		self.posts = posts
+		self.deferNotes = deferNotes
+		self.maxNotes = None
+
+	def get_page(self, sourceName: str) -> (list, list):
+		return [{"id": "{source}{index}".format(source=sourceName, index=i), "blog_name": sourceName} for i in range(self.posts)], [None]
+
+	def update_page(self, nextPageLink: list) -> (list, list):
+		return [], [None]
+
+	def match(self, searchTerm: str, datum: dict) -> bool:
+		return True
+
+	def parse(self, datum: dict) -> dict:
+		return {"id": datum["id"], "pid": os.getpid()}
+
+class FakeRedditClient(RedditClient):
+
+	def __init__(self):
+		self.config = {}
+
+	def search(self, searchTerm: str, subreddits: list, limit: int = 10, combined: bool = None) -> list:
+		return [{"id": subreddit} for subreddit in subreddits][:limit]
+
+class ProcessPoolTests(unittest.TestCase):
+
+	def test_client_round_trips_through_pickle(self):
+		client = pickle.loads(pickle.dumps(FakeTumblrClient(posts=5, deferNotes=True)))
+		self.assertIsInstance(client, FakeTumblrClient)
+		self.assertEqual((client.posts, client.deferNotes), (5, True))
+		real = pickle.loads(pickle.dumps(TumblrClient("key", "secret", "token", "oauth", maxNotes=7)))
+		self.assertEqual(real.config["maxNotes"], 7)
+		self.assertIsNotNone(real.tumblr)
+
+	def test_crawl_options_follow_the_search_signature(self):
+		options = {"maxPages": 2, "maxRequests": 5}
+		self.assertEqual(process_pool.crawl_options(FakeRedditClient(), options), {})
+		self.assertEqual(process_pool.crawl_options(FakeTumblrClient(), options), options)
+
+	def test_search_client_drops_unsupported_options(self):
+		platform, batch = process_pool.search_client(FakeRedditClient(), "trump", 2, {"subReddits": ["a", "b", "c"], "maxPages": 1})
+		self.assertEqual((platform, process_pool.decode_batch(batch)), ("reddit", [{"id": "a"}, {"id": "b"}]))
+		social = OpenSocial.__new__(OpenSocial)
+		self.assertEqual(social.search_sources(FakeRedditClient(), "trump", 2, maxWorkers=1, subReddits=["a", "b"], maxPages=1), {"reddit": [{"id": "a"}, {"id": "b"}]})
+
+	def test_evaluate_all_clients_in_processes(self):
+		social = OpenSocial.__new__(OpenSocial)
+		social.clients = [FakeTumblrClient()]
+		results = social.evaluate_all_clients("trump", 3, executor="process", blogs=["a"])
+		self.assertEqual([entry["id"] for entry in results["tumblr"]], ["a0", "a1", "a2"])
+		self.assertNotEqual(results["tumblr"][0]["pid"], os.getpid())
+
+	def test_search_sources_in_processes(self):
+		social = OpenSocial.__new__(OpenSocial)
+		results = social.search_sources(FakeTumblrClient(), "trump", 4, maxWorkers=2, blogs=["a", "b"], maxPages=1)
+		self.assertEqual(sorted(entry["id"] for entry in results["tumblr"]), ["a0", "a1", "b0", "b1"])
+		self.assertEqual(len({entry["pid"] for entry in results["tumblr"]} - {os.getpid()}), len({entry["pid"] for entry in results["tumblr"]}))
+
+if __name__ == "__main__":
+	unittest.main()
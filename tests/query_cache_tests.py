@@ -0,0 +1,123 @@
+import os, sqlite3, sys, tempfile, threading, time, unittest
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+from open_social.common.deadline import Deadline
+from open_social.common.query_cache import QueryCache, client_options
+from open_social.open_social import OpenSocial
+from open_social.tumblr_op.tumblr_client import TumblrClient
+
+class Clock(object):
+
+	def __init__(self):
+		self.now = 1000.0
+
+	def __call__(self) -> float:
+		return self.now
+
+class CountingSearch(object):
+
+	def __init__(self, delay: float = 0.0):
+		self.calls = 0
+		self.delay = delay
+		self.lock = threading.Lock()
+
+	def __call__(self) -> dict:
+		with self.lock:
+			self.calls += 1
+			call = self.calls
+		time.sleep(self.delay)
+		return {"tumblr": [{"id": call}]}
+
+class FakeTumblrClient(TumblrClient):
+
+	def __init__(self, deferNotes: bool = False):
+		self.config = {"consumer_key": "key", "consumer_secret": "secret", "deferNotes": deferNotes, "maxNotes": None}
+		self.searches = 0
+
+	def search(self, searchTerm: str, sources: list, limit: int, maxPages: int = None, maxRequests: int = None) -> list:
+		self.searches += 1
+		return [{"id": self.searches, "blog_name": sources[0]}]
+
+class QueryCacheTests(unittest.TestCase):
+
+	def test_key_normalizes_queries(self):
+		self.assertEqual(QueryCache.key("reddit", "Trump ", ["News", "politics"], 10), QueryCache.key("reddit", "trump", ["politics", "news"], 10))
+		self.assertNotEqual(QueryCache.key("reddit", "trump", ["news"], 10), QueryCache.key("reddit", "trump", ["news"], 20))
+
+	def test_fresh_stale_and_expired(self):
+		clock, search = Clock(), CountingSearch()
+		cache = QueryCache(ttl=60, staleTtl=60, clock=clock)
+		key = cache.key("tumblr", "trump", ["a"], 10)
+		self.assertEqual(cache.fetch(key, search), {"tumblr": [{"id": 1}]})
+		self.assertEqual(cache.fetch(key, search), {"tumblr": [{"id": 1}]})
+		clock.now += 90
+		self.assertEqual(cache.fetch(key, search), {"tumblr": [{"id": 1}]})
+		time.sleep(0.1)
+		self.assertEqual(cache.fetch(key, search), {"tumblr": [{"id": 2}]})
+		clock.now += 500
+		self.assertEqual(cache.fetch(key, search), {"tumblr": [{"id": 3}]})
+		report = cache.report()
+		self.assertEqual((report["hits"], report["staleHits"], report["misses"], report["refreshes"]), (2, 1, 2, 1))
+
+	def test_concurrent_misses_share_one_search(self):
+		cache, search = QueryCache(), CountingSearch(delay=0.2)
+		key = cache.key("tumblr", "trump", ["a"], 10)
+		results = []
+		threads = [threading.Thread(target=lambda: results.append(cache.fetch(key, search))) for _ in range(5)]
+		for thread in threads:
+			thread.start()
+		for thread in threads:
+			thread.join()
+		self.assertEqual(search.calls, 1)
+		self.assertEqual(results, [{"tumblr": [{"id": 1}]}] * 5)
+
+	def test_misses_are_shared_only_under_the_same_deadline(self):
+		cache, search = QueryCache(), CountingSearch(delay=0.2)
+		key = cache.key("tumblr", "trump", ["a"], 10)
+		shared, results = Deadline(60), []
+		threads = [threading.Thread(target=lambda deadline=deadline: results.append(cache.fetch(key, search, deadline=deadline)))
+				   for deadline in [shared, shared, Deadline(1), None]]
+		for thread in threads:
+			thread.start()
+		for thread in threads:
+			thread.join()
+		self.assertEqual(search.calls, 3)
+		self.assertEqual(cache.report()["coalesced"], 1)
+
+	def test_disk_tier_and_incomplete_results(self):
+		with tempfile.TemporaryDirectory() as directory:
+			path = os.path.join(directory, "queries.db")
+			key = QueryCache.key("tumblr", "trump", ["a"], 10)
+			QueryCache(path=path).fetch(key, CountingSearch())
+			search = CountingSearch()
+			self.assertEqual(QueryCache(path=path).fetch(key, search), {"tumblr": [{"id": 1}]})
+			self.assertEqual(search.calls, 0)
+			cache, partial = QueryCache(), lambda: {"tumblr": [{"id": 1}, [{"partial": "deadline exceeded"}]]}
+			cache.fetch(key, partial)
+			self.assertEqual(cache.get(key), (None, None))
+
+	def test_connections_are_closed(self):
+		with tempfile.TemporaryDirectory() as directory:
+			with QueryCache(path=os.path.join(directory, "queries.db")).connect() as connection:
+				pass
+			with self.assertRaises(sqlite3.ProgrammingError):
+				connection.execute("SELECT 1")
+
+	def test_get_data_uses_cache(self):
+		social = OpenSocial.__new__(OpenSocial)
+		client = FakeTumblrClient()
+		social.enable_query_cache()
+		for blogs in [["a"], ["A"], ["b"]]:
+			social.get_data(client, "trump", 10, blogs=blogs)
+		self.assertEqual(client.searches, 2)
+
+	def test_client_options_are_part_of_the_query(self):
+		self.assertEqual(client_options(FakeTumblrClient()), {"deferNotes": False, "maxNotes": None})
+		social = OpenSocial.__new__(OpenSocial)
+		social.enable_query_cache()
+		eager, deferred = FakeTumblrClient(), FakeTumblrClient(deferNotes=True)
+		social.get_data(eager, "trump", 10, blogs=["a"])
+		social.get_data(deferred, "trump", 10, blogs=["a"])
+		self.assertEqual((eager.searches, deferred.searches), (1, 1))
+
+if __name__ == "__main__":
+	unittest.main()
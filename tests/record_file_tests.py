@@ -0,0 +1,81 @@
+import os, sys, tempfile, unittest
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+from open_social.common.record_file import RecordFileReader, RecordFileWriter, build_index, load_index, parallel_scan, record_time
+from open_social.open_social import OpenSocial
+
+def submission(id: int) -> dict:
+	return {"id": "s{id}".format(id=id), "title": "post {id}".format(id=id), "user_screen_name": "poster", "permalink": "/r/news",
+			"created_utc": 1000.0 + id, "secondary_information": {"comments": []}}
+
+def id_of(entry: dict) -> object:
+	return entry["record"]["id"]
+
+def title_of(entry: dict) -> str:
+	return entry["record"]["title"]
+
+class RecordFileTests(unittest.TestCase):
+
+	def setUp(self):
+		self.directory = tempfile.TemporaryDirectory()
+		self.path = os.path.join(self.directory.name, "results.jsonl")
+		writer = RecordFileWriter(self.path)
+		writer.write({"platform": "reddit", "source": "news", "term": "post"}, [submission(i) for i in range(50)] + [[{"error(s)": []}]])
+		writer.write({"platform": "tumblr", "source": "cnn", "term": "post"}, [{"id": 7, "blog_name": "cnn", "summary": "post", "date": "2018-10-10 20:00:00 GMT"}])
+
+	def tearDown(self):
+		self.directory.cleanup()
+
+	def test_lookup_by_id_and_position(self):
+		with RecordFileReader(self.path) as reader:
+			self.assertEqual(len(reader), 51)
+			self.assertEqual(reader.get("s17")[0]["record"]["title"], "post 17")
+			self.assertEqual(reader.get(7, platform="tumblr")[0]["source"], "cnn")
+			self.assertEqual(reader.get("missing"), [])
+			self.assertEqual([title_of(entry) for entry in reader.slice(48, 50)], ["post 48", "post 49"])
+
+	def test_filter_by_platform_and_time(self):
+		with RecordFileReader(self.path) as reader:
+			self.assertEqual(len(reader.where(platform="reddit", since=1010, until=1020)), 10)
+			self.assertEqual(len(reader.where(platform="tumblr")), 1)
+
+	def test_index_only_reads_appended_lines(self):
+		with open(self.path, "a") as file:
+			file.write('{"platform": "reddit", "record": {"id": "partial"')
+		self.assertEqual(len(build_index(self.path)["offsets"]), 51)
+		with open(self.path, "a") as file:
+			file.write('}}\n')
+		with RecordFileReader(self.path) as reader:
+			self.assertEqual(reader.get("partial")[0]["platform"], "reddit")
+
+	def test_writes_only_append_and_close_indexes(self):
+		self.assertFalse(os.path.exists(self.path + ".idx.npz"))
+		writer = RecordFileWriter(self.path)
+		writer.write({"platform": "reddit", "source": "news", "term": "post"}, [submission(50)])
+		writer.close()
+		self.assertEqual(len(load_index(self.path)["offsets"]), 52)
+
+	def test_record_time_reads_the_platform_field(self):
+		self.assertEqual(record_time({"platform": "reddit", "record": submission(5)}), 1005.0)
+		self.assertEqual(record_time({"platform": "twitter", "record": {"id": 1, "created_at": "Wed Oct 10 20:19:24 +0000 2018"}}), 1539202764.0)
+		self.assertEqual(record_time({"platform": "unknown", "record": {"id": 1}, "written_at": 5.0}), 5.0)
+
+	def test_to_file_writes_every_platform_of_get_data(self):
+		client = OpenSocial.__new__(OpenSocial)
+		client.slash = os.sep
+		path = client.to_file("all", "post", {"reddit": [submission(1)], "tumblr": [{"id": 7, "blog_name": "cnn"}]}, fileFormat="jsonl")
+		self.addCleanup(os.remove, path)
+		self.addCleanup(os.remove, path + ".idx.npz")
+		with RecordFileReader(path) as reader:
+			self.assertEqual([entry["platform"] for entry in reader.slice()], ["reddit", "tumblr"])
+			self.assertEqual(len(reader.where(platform="reddit", since=1001)), 1)
+
+	def test_parallel_scan_covers_every_line_once(self):
+		with RecordFileReader(self.path) as reader:
+			ranges = reader.byte_ranges(4)
+			scanned = [title_of(entry) for start, end in ranges for entry in reader.scan(start, end) if entry["platform"] == "reddit"]
+		self.assertEqual(len(ranges), 4)
+		self.assertEqual(scanned, ["post {i}".format(i=i) for i in range(50)])
+		self.assertEqual(len(parallel_scan(self.path, id_of, workers=2)), 51)
+
+if __name__ == "__main__":
+	unittest.main()
@@ -0,0 +1,43 @@
+import os, sys, unittest
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+from open_social.reddit_op.reddit_client import flatten_comments
+from praw.models import MoreComments
+
+class FakeAuthor(object):
+
+	def __init__(self, name: str):
+		self.name = name
+
+class FakeComment(object):
+
+	def __init__(self, commentId: str, parentId: str, replies: list = None, author: str = "someone"):
+		self.id = commentId
+		self.parent_id = parentId
+		self.replies = replies or []
+		self.body = "comment " + commentId
+		self.author = FakeAuthor(author) if author is not None else None
+		self.score = 1
+		self.created_utc = 1539000000.0
+
+def thread() -> list:
+	return [
+		FakeComment("a", "t3_post", [FakeComment("a1", "t1_a", [FakeComment("a11", "t1_a1")]), FakeComment("a2", "t1_a", author=None)]),
+		MoreComments(None, {"count": 5, "children": ["x"], "parent_id": "t3_post", "id": "more"}),
+		FakeComment("b", "t3_post", [FakeComment("b1", "t1_b")])
+	]
+
+class RedditCommentTests(unittest.TestCase):
+
+	def test_flatten_is_breadth_first_with_parent_ids(self):
+		comments = flatten_comments(thread())
+		self.assertEqual([comment["id"] for comment in comments], ["a", "b", "a1", "a2", "b1", "a11"])
+		self.assertEqual([comment["parent_id"] for comment in comments], [None, None, "a", "a", "b", "a1"])
+		self.assertIsNone(comments[3]["user_screen_name"])
+		self.assertEqual(comments[0]["body"], "comment a")
+
+	def test_depth_and_count_bounds(self):
+		self.assertEqual([comment["id"] for comment in flatten_comments(thread(), maxDepth=0)], ["a", "b"])
+		self.assertEqual([comment["id"] for comment in flatten_comments(thread(), maxComments=3)], ["a", "b", "a1"])
+
+if __name__ == "__main__":
+	unittest.main()
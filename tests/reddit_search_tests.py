@@ -0,0 +1,97 @@
+import os, sys, threading, time, unittest
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+from open_social.common.deadline import Deadline, current_deadline
+from open_social.reddit_op.reddit_client import RedditClient, balance_quotas, chunk_subreddits
+
+class FakeSubreddit(object):
+
+	def __init__(self, name: str, listings: dict, queries: list):
+		self.display_name = name
+		self.listings = listings
+		self.queries = queries
+
+	def search(self, searchTerm: str, limit: int = None) -> list:
+		self.queries.append(self.display_name)
+		names = [name.lower() for name in self.display_name.split("+")]
+		merged = [submission for name in names for submission in self.listings.get(name, [])]
+		return merged[:limit]
+
+class FakeSubmission(object):
+
+	def __init__(self, subreddit: str, index: int):
+		self.id = "{subreddit}{index}".format(subreddit=subreddit, index=index)
+		self.subreddit = FakeSubreddit(subreddit, {}, [])
+
+class FakeReddit(object):
+
+	def __init__(self, listings: dict):
+		self.listings = listings
+		self.queries = []
+
+	def subreddit(self, name: str) -> FakeSubreddit:
+		return FakeSubreddit(name, self.listings, self.queries)
+
+	def submission(self, id: str) -> FakeSubmission:
+		submission = FakeSubmission.__new__(FakeSubmission)
+		submission.id, submission.reddit = id, self
+		return submission
+
+def fake_client(listings: dict) -> RedditClient:
+	client = RedditClient.__new__(RedditClient)
+	client.ownerThread, client.local = threading.get_ident(), threading.local()
+	client.reddit = FakeReddit(listings)
+	client.build_reddit = lambda: FakeReddit(listings)
+	client.commentWorkers = 1
+	client.combinedSearch = True
+	client.parse = lambda submission: {"id": submission.id}
+	return client
+
+class RedditSearchTests(unittest.TestCase):
+
+	def test_chunks_respect_length(self):
+		chunks = chunk_subreddits(["news", "worldnews", "politics", "science"], 18)
+		self.assertEqual(chunks, [["news", "worldnews"], ["politics", "science"]])
+		self.assertTrue(all(len("+".join(chunk)) <= 18 for chunk in chunks))
+
+	def test_quotas_move_to_busy_subreddits(self):
+		groups = {"a": [1, 2, 3, 4, 5], "b": [6], "c": [7, 8, 9]}
+		self.assertEqual(balance_quotas(groups, ["a", "b", "c"], 6), [1, 2, 3, 6, 7, 8])
+		self.assertEqual(balance_quotas(groups, ["a", "b", "c"], 3), [1, 6, 7])
+
+	def test_combined_search_issues_one_query_per_chunk(self):
+		listings = {name: [FakeSubmission(name, i) for i in range(count)] for name, count in [("news", 10), ("pics", 0), ("science", 2)]}
+		client = fake_client(listings)
+		payload = client.search("trump", ["News", "pics", "science"], 6)
+		self.assertEqual(client.reddit.queries, ["News+pics+science"])
+		self.assertEqual([entry["id"] for entry in payload], ["news0", "news1", "news2", "news3", "science0", "science1"])
+
+	def test_comment_workers_use_the_caller_deadline_and_load_submissions_on_their_own_instance(self):
+		client = fake_client({})
+		client.commentWorkers = 2
+		seen = []
+
+		def parse(submission: FakeSubmission) -> dict:
+			time.sleep(0.05)
+			self.assertIs(submission.reddit, client.api())
+			seen.append((current_deadline(), client.api()))
+			return {"id": submission.id}
+
+		client.parse = parse
+		deadline = Deadline(60)
+		with deadline.activate():
+			payload = client.parse_all([FakeSubmission("news", i) for i in range(4)])
+		self.assertEqual([entry["id"] for entry in payload], ["news0", "news1", "news2", "news3"])
+		self.assertTrue(all(active is deadline for active, api in seen))
+		self.assertTrue(all(api is not client.reddit for active, api in seen))
+		self.assertEqual(len({id(api) for active, api in seen}), 2)
+
+	def test_workers_stop_when_the_caller_deadline_passes(self):
+		client = fake_client({})
+		client.commentWorkers = 2
+		deadline = Deadline(60)
+		deadline.cancel()
+		with deadline.activate():
+			self.assertEqual(client.parse_all([FakeSubmission("news", i) for i in range(4)]), [])
+
+if __name__ == "__main__":
+	unittest.main()
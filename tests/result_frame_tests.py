@@ -0,0 +1,80 @@
+import os, sys, unittest
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+from open_social.common.lazy import SecondaryResolver
+from open_social.common.normalize import normalize_record
+from open_social.common.result_frame import ResultFrame
+
+def tweet(id: int, user: str, text: str, retweets: int, favorites: int) -> dict:
+	return {
+		"created_at": "Wed Oct 10 20:19:{second:02d} +0000 2018".format(second=id), "id": id, "text": text, "user_id": len(user),
+		"user_name": user, "user_screen_name": user, "user_location": "", "user_description": "", "user_followers_count": 0,
+		"user_friends_count": 0, "user_timezone": None, "user_statuses_count": 0, "user_language": "en",
+		"retweet_count": retweets, "favorite_count": favorites, "tweet_url": "no tweet url"
+	}
+
+class ResultFrameTests(unittest.TestCase):
+
+	def setUp(self):
+		self.frame = ResultFrame.from_results({
+			"twitter": [tweet(1, "ann", "Budget vote", 1, 2), tweet(2, "bob", "budget talks", 10, 0), tweet(3, "ann", "Weather", 0, 0), [{"error(s)": []}]],
+			"tumblr": [{"type": "text", "blog_name": "cnn", "id": 9, "date": "2018-10-10 20:00:00 GMT", "post_url": "u",
+						"summary": "Budget news", "note_count": 7, "notes": []}]
+		})
+
+	def test_schema(self):
+		self.assertEqual(len(self.frame), 4)
+		self.assertEqual(self.frame.column("platform").tolist(), ["twitter", "twitter", "twitter", "tumblr"])
+		self.assertEqual(self.frame.column("engagement").tolist(), [3, 10, 0, 7])
+		self.assertEqual(self.frame.to_records(1)[0]["author"], "ann")
+
+	def test_filter_and_top_k(self):
+		budget = self.frame.where(text="budget")
+		self.assertEqual(len(budget), 3)
+		self.assertEqual(budget.top_k(2).column("id").tolist(), ["2", "9"])
+		self.assertEqual(len(self.frame.where(platform="twitter", author=["ann"])), 2)
+		self.assertEqual(len(self.frame.where(platform="reddit")), 0)
+
+	def test_group_by(self):
+		groups = self.frame.group_by("author")
+		self.assertEqual(groups["author"].tolist(), ["bob", "cnn", "ann"])
+		self.assertEqual(groups["count"].tolist(), [1, 1, 2])
+		self.assertEqual(groups["sum"].tolist(), [10, 7, 3])
+
+	def test_concat_reencodes_pools(self):
+		other = ResultFrame.from_records("twitter", [tweet(4, "cat", "Budget", 0, 1)])
+		combined = ResultFrame.concat([self.frame, other])
+		self.assertEqual(combined.column("author").tolist()[-1], "cat")
+		self.assertEqual(len(combined.where(text="budget")), 4)
+
+	def test_lazy_comments_are_not_fetched(self):
+		resolver, fetches = SecondaryResolver(), []
+		lazy = resolver.handle(lambda: fetches.append(1) or {"comments": [{"body": "a"}]})
+		records = [
+			{"id": "abc", "title": "Budget", "user_screen_name": "poster", "created_utc": 1539000000.0, "score": 5, "num_comments": 3,
+			 "secondary_information": lazy},
+			{"id": "def", "title": "Vote", "user_screen_name": "poster", "created_utc": 1539000000.0, "score": 1,
+			 "secondary_information": resolver.handle(lambda: fetches.append(1) or {"comments": []})}
+		]
+		frame = ResultFrame.from_records("reddit", records)
+		self.assertEqual(fetches, [])
+		self.assertEqual(frame.column("comments").tolist(), [3, 0])
+		lazy.resolve()
+		del records[0]["num_comments"]
+		self.assertEqual(ResultFrame.from_records("reddit", records).column("comments").tolist(), [1, 0])
+
+	def test_columns_match_the_normalized_posts(self):
+		records = {
+			"reddit": {"id": "abc", "title": "Budget vote", "subreddit_name": "r/news", "user_screen_name": "poster", "permalink": "/r/news/abc",
+					   "created_utc": 1539000000.0, "score": 5, "secondary_information": {"comments": []}},
+			"facebook": {"id": "1_2", "name": "CNN", "message": "Budget report", "created_time": "2018-10-08T12:00:00+0000"},
+			"instagram": {"id": 5, "caption": "Budget day", "date": 1539000000, "like_count": 2}
+		}
+		for platform, record in records.items():
+			row = ResultFrame.from_records(platform, [record], source="cnn").to_records()[0]
+			post, authors, comments = normalize_record(platform, record, "cnn")
+			author = next(entry["name"] for entry in authors if entry["author_id"] == post["author_id"])
+			self.assertEqual((row["id"], row["source"], row["author"], row["text"], row["created_at"]),
+				(post["post_id"], post["source"], author, post["text"], post["created_at"]))
+
+if __name__ == "__main__":
+	unittest.main()
@@ -0,0 +1,77 @@
+import os, sqlite3, sys, tempfile, unittest
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+from open_social.common.result_store import ResultStore
+
+tweet = {
+	"created_at": "Wed Oct 10 20:19:24 +0000 2018", "id": 1, "text": "Climate policy debate tonight",
+	"user_id": 7, "user_name": "Seven", "user_screen_name": "seven", "user_location": "", "user_description": "",
+	"user_followers_count": 3, "user_friends_count": 2, "user_timezone": None, "user_statuses_count": 9,
+	"user_language": "en", "retweet_count": 0, "favorite_count": 1, "tweet_url": "no tweet url"
+}
+
+submission = {
+	"id": "abc", "title": "Budget vote", "domain": "self.news", "subreddit_id": "t5", "subreddit_name": "r/news",
+	"user_screen_name": "poster", "user_link_karma": 1, "user_comment_karma": 1, "user_created_at": 0,
+	"permalink": "/r/news/abc", "url": "https://example.com", "created_utc": 1539000000.0, "upvote_ratio": 1.0, "score": 5,
+	"secondary_information": {"comments": [{"body": "what about climate change", "user_screen_name": "commenter"}]}
+}
+
+facebookPost = {"id": "1_2", "name": "CNN", "message": "Climate report", "created_time": "2018-10-08T12:00:00+0000",
+	"permalink_url": "https://facebook.com/1_2", "secondary_information": {"comments": {"data": []}}}
+
+class ResultStoreTests(unittest.TestCase):
+
+	def setUp(self):
+		self.directory = tempfile.TemporaryDirectory()
+		self.store = ResultStore(os.path.join(self.directory.name, "results.db"))
+
+	def tearDown(self):
+		self.directory.cleanup()
+
+	def test_ingest_normalizes_records(self):
+		self.store.write({"platform": "twitter", "source": None, "term": "climate"}, [tweet, {"error(s)": []}])
+		self.store.ingest("reddit", [submission], source="news")
+		self.assertEqual(self.store.count(), {"posts": 2, "authors": 3, "comments": 1})
+		post = self.store.get_post("reddit", "abc")
+		self.assertEqual(post["author"]["name"], "poster")
+		self.assertEqual(post["comments"][0]["text"], "what about climate change")
+		self.assertEqual(post["record"]["title"], "Budget vote")
+
+	def test_reingest_updates_in_place(self):
+		self.store.ingest("twitter", [tweet])
+		self.store.ingest("twitter", [dict(tweet, text="Budget debate tonight")])
+		self.assertEqual(self.store.count()["posts"], 1)
+		self.assertEqual(self.store.search("climate"), [])
+		self.assertEqual(len(self.store.search("budget")), 1)
+
+	def test_terms_are_kept_across_crawls(self):
+		self.store.ingest("twitter", [tweet], term="climate")
+		self.store.ingest("twitter", [tweet], term="debate")
+		self.store.ingest("twitter", [tweet])
+		post = self.store.get_post("twitter", 1)
+		self.assertEqual((post["term"], post["terms"]), ("climate", ["climate", "debate"]))
+		self.assertEqual(len(self.store.search(term="debate")), 1)
+		self.assertEqual(self.store.search(term="budget"), [])
+
+	def test_facebook_posts_keep_their_time(self):
+		self.store.ingest("facebook", [facebookPost], source="cnn")
+		self.assertEqual(self.store.get_post("facebook", "1_2")["created_at"], 1539000000.0)
+		self.assertEqual(len(self.store.search("climate", since=1538999999)), 1)
+
+	def test_connections_are_closed(self):
+		with self.store.connect() as connection:
+			pass
+		with self.assertRaises(sqlite3.ProgrammingError):
+			connection.execute("SELECT 1")
+
+	def test_search_by_text_and_time(self):
+		self.store.ingest("twitter", [tweet])
+		self.store.ingest("reddit", [submission])
+		self.assertEqual({post["platform"] for post in self.store.search("climate")}, {"twitter", "reddit"})
+		self.assertEqual(len(self.store.search("climate", includeComments=False)), 1)
+		self.assertEqual(len(self.store.search("climate", since=1539100000)), 1)
+		self.assertEqual(len(self.store.search(platform="reddit")), 1)
+		self.assertEqual(self.store.search_comments("climate")[0]["author_id"], "commenter")
+
+if __name__ == "__main__":
+	unittest.main()
@@ -0,0 +1,37 @@
+import os, sys, unittest
+sys.path.append(os.path.join(os.path.dirname(__file__), "..", "examples"))
+from text_analysis import mine_text, mine_texts
+
+class FakeConnector(object):
+
+	def analyze(self, texts: list, apiTypes: list) -> (dict, dict):
+		# two documents per text, returned out of order, with one error
+		sources, results = {}, {apiType: {"documents": [], "errors": []} for apiType in apiTypes}
+		for index, text in enumerate(texts):
+			for part in range(2):
+				documentId = str(index * 2 + part)
+				sources[documentId] = index
+				for apiType in apiTypes:
+					if text == "broken" and apiType == "sentiment":
+						results[apiType]["errors"].append({"id": documentId, "message": "failed"})
+					else:
+						results[apiType]["documents"].insert(0, {"id": documentId, "text": text})
+		return sources, results
+
+class TextAnalysisTests(unittest.TestCase):
+
+	def test_documents_are_split_back_per_entry(self):
+		payload = mine_texts(FakeConnector(), [["a", "b"], "c", ["broken"]])
+		self.assertEqual(len(payload), 3)
+		languages, sentiment, keyPhrases = payload[0]
+		self.assertEqual(sorted(document["text"] for document in languages["documents"]), ["a", "a", "b", "b"])
+		self.assertEqual([document["text"] for document in payload[1][2]["documents"]], ["c", "c"])
+		self.assertEqual((len(payload[2][1]["documents"]), len(payload[2][1]["errors"])), (0, 2))
+		self.assertEqual(len(payload[2][0]["documents"]), 2)
+
+	def test_mine_text_handles_one_entry(self):
+		languages, sentiment, keyPhrases = mine_text(FakeConnector(), ["a"])
+		self.assertEqual([document["id"] for document in sentiment["documents"]], ["1", "0"])
+
+if __name__ == "__main__":
+	unittest.main()
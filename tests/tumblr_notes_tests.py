@@ -0,0 +1,55 @@
+import os, sys, unittest
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+from open_social.common.utils import search
+from open_social.tumblr_op.tumblr_client import TumblrClient
+
+class FakeTumblr(object):
+
+	def __init__(self, pages: list, posts: list = None):
+		self.pages = pages
+		self.postList = posts or []
+		self.requests = []
+
+	def notes(self, blogName: str, id: int = None, before_timestamp: int = None) -> dict:
+		self.requests.append(before_timestamp)
+		index = 0 if before_timestamp is None else min(len(self.pages) - 1, [page["cursor"] for page in self.pages].index(before_timestamp) + 1)
+		page = self.pages[index]
+		links = {"next": {"query_params": {"id": id, "before_timestamp": page["next"]}}} if page["next"] is not None else {}
+		return {"notes": page["notes"], "_links": links}
+
+	def posts(self, blogName: str, limit: int = 50, offset: int = 0, notes_info: bool = True) -> dict:
+		return {"posts": self.postList[offset:offset + limit]}
+
+def fake_client(tumblr: FakeTumblr, maxNotes: int = None) -> TumblrClient:
+	client = TumblrClient("key", "secret", "token", "oauth", deferNotes=True, maxNotes=maxNotes)
+	client.tumblr = tumblr
+	return client
+
+def post(postId: int, summary: str) -> dict:
+	return {"type": "text", "blog_name": "blog", "id": postId, "date": "2018-10-01", "post_url": "", "summary": summary, "note_count": 3}
+
+class TumblrNotesTests(unittest.TestCase):
+
+	def test_notes_follow_cursors(self):
+		tumblr = FakeTumblr([{"cursor": None, "notes": [1, 2], "next": 30}, {"cursor": 30, "notes": [3], "next": None}])
+		self.assertEqual(list(fake_client(tumblr).iter_notes("blog", 1)), [1, 2, 3])
+		self.assertEqual(tumblr.requests, [None, 30])
+
+	def test_repeated_cursor_stops(self):
+		tumblr = FakeTumblr([{"cursor": None, "notes": [1], "next": 30}, {"cursor": 30, "notes": [2], "next": 30}])
+		self.assertEqual(list(fake_client(tumblr).iter_notes("blog", 1)), [1, 2])
+		self.assertEqual(tumblr.requests, [None, 30])
+
+	def test_max_notes(self):
+		tumblr = FakeTumblr([{"cursor": None, "notes": [1, 2], "next": 30}, {"cursor": 30, "notes": [3, 4], "next": None}])
+		self.assertEqual(list(fake_client(tumblr, maxNotes=2).iter_notes("blog", 1)), [1, 2])
+		self.assertEqual(tumblr.requests, [None])
+
+	def test_notes_are_fetched_for_matches_only(self):
+		tumblr = FakeTumblr([{"cursor": None, "notes": [1], "next": None}], [post(1, "about trump"), post(2, "other"), post(3, "trump again")])
+		data = search(fake_client(tumblr), "trump", ["blog"], 10, maxPages=1)
+		self.assertEqual([(datum["id"], datum["notes"]) for datum in data], [(1, [1]), (3, [1])])
+		self.assertEqual(len(tumblr.requests), 2)
+
+if __name__ == "__main__":
+	unittest.main()
@@ -0,0 +1,70 @@
+import os, sys, unittest
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+from open_social.twitter_op.twitter_client import TwitterClient
+
+class FakeTwitter(object):
+
+	def __init__(self, ids: list):
+		self.ids = ids
+		self.lookups = []
+		self.searches = []
+
+	def search(self, **params) -> dict:
+		self.searches.append(params)
+		ids = [i for i in self.ids if i > params.get("since_id", -1) and i <= params.get("max_id", float("inf"))]
+		return {"statuses": [status(i) for i in sorted(ids, reverse=True)[:params["count"]]]}
+
+	def lookup_user(self, user_id: str) -> list:
+		self.lookups.append(user_id)
+		return [user(int(userId)) for userId in user_id.split(",")]
+
+def user(userId: int) -> dict:
+	return {"id": userId, "name": "user", "screen_name": "user{id}".format(id=userId), "location": "", "description": "",
+		"followers_count": 0, "friends_count": 0, "time_zone": None, "statuses_count": 0, "lang": "en"}
+
+def status(statusId: int, userId: int = None) -> dict:
+	return {"id": statusId, "created_at": "", "full_text": "trump", "user": {"id": statusId % 3 if userId is None else userId},
+		"retweet_count": 0, "favorite_count": 0, "entities": {}}
+
+def fake_client(twitter: FakeTwitter) -> TwitterClient:
+	client = TwitterClient("key", "secret", "token", "oauth")
+	client.twitter = twitter
+	return client
+
+class TwitterBulkTests(unittest.TestCase):
+
+	def test_split_window_stays_inside_the_window(self):
+		self.assertEqual(TwitterClient.split_window(10, 12, 5), [(11, 12), (10, 11)])
+		self.assertEqual(TwitterClient.split_window(0, 100, 3), [(67, 100), (34, 67), (0, 34)])
+		self.assertEqual(TwitterClient.split_window(5, 5, 2), [])
+		windows = TwitterClient.split_window(1000, 1999, 7)
+		self.assertEqual((len(windows), windows[0][1], windows[-1][0]), (7, 1999, 1000))
+		self.assertTrue(all(newer[0] == older[1] for newer, older in zip(windows, windows[1:])))
+
+	def test_id_for_time(self):
+		self.assertEqual(TwitterClient.id_for_time(1288834974.657), 0)
+		tweetId = TwitterClient.id_for_time(1539000000)
+		self.assertEqual((tweetId >> 22) + 1288834974657, 1539000000000)
+		self.assertLess(tweetId, TwitterClient.id_for_time(1539000000.001))
+
+	def test_bulk_search_walks_the_window(self):
+		twitter = FakeTwitter(list(range(1, 301)))
+		payload = fake_client(twitter).bulk_search("trump", 1000, sinceId=50, maxId=250)
+		self.assertEqual([entry["id"] for entry in payload], list(range(250, 50, -1)))
+		self.assertEqual([params.get("max_id") for params in twitter.searches], [250, 150])
+
+	def test_users_are_looked_up_once_and_bounded(self):
+		twitter = FakeTwitter([])
+		client = fake_client(twitter)
+		client.hydrate_users([status(1), status(2), status(3)])
+		page = [status(4), status(5, userId=7)]
+		client.hydrate_users(page)
+		self.assertEqual(len(twitter.lookups), 2)
+		self.assertEqual(twitter.lookups[1], "7")
+		self.assertEqual(page[0]["user"]["screen_name"], "user1")
+		client.maxUsers = 2
+		client.hydrate_users([status(6, userId=8), dict(status(7), user=user(9))])
+		self.assertEqual(set(client.users), {8, 9})
+
+if __name__ == "__main__":
+	unittest.main()
@@ -0,0 +1,94 @@
+import http.server, json, os, socketserver, sys, threading, time, unittest
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+from open_social.twitter_op.twitter_client import TwitterClient
+
+def make_tweet(tweetId: int) -> dict:
+	return {
+		"created_at": "Wed Oct 10 20:19:24 +0000 2018",
+		"id": tweetId,
+		"text": "trump {tweetId}".format(tweetId=tweetId),
+		"user": {"id": 1, "name": "name", "screen_name": "screen_name", "location": "", "description": "",
+				 "followers_count": 0, "friends_count": 0, "time_zone": None, "statuses_count": 0, "lang": None},
+		"retweet_count": 0,
+		"favorite_count": 0}
+
+class LocalServer(socketserver.ThreadingMixIn, http.server.HTTPServer):
+
+	# http.server.ThreadingHTTPServer needs python 3.7
+	daemon_threads = True
+
+class ChunkedStreamHandler(http.server.BaseHTTPRequestHandler):
+
+	protocol_version = "HTTP/1.1"
+	connections = 0
+	malformed = False
+
+	def do_POST(self):
+		ChunkedStreamHandler.connections += 1
+		self.rfile.read(int(self.headers["Content-Length"]))
+		self.send_response(200)
+		self.send_header("Content-Type", "application/json")
+		self.send_header("Transfer-Encoding", "chunked")
+		self.send_header("Connection", "close")
+		self.end_headers()
+		start = (ChunkedStreamHandler.connections - 1) * 3
+		messages = [b"\r\n", json.dumps({"limit": {"track": 1}}).encode("utf-8") + b"\r\n"]
+		if ChunkedStreamHandler.malformed:
+			messages.extend([b"{not json\r\n", json.dumps({"id": -1, "text": "no user"}).encode("utf-8") + b"\r\n"])
+		messages.extend(json.dumps(make_tweet(i)).encode("utf-8") + b"\r\n" for i in range(start, start + 3))
+		for message in messages:
+			self.wfile.write("{size:x}\r\n".format(size=len(message)).encode("ascii") + message + b"\r\n")
+		self.wfile.write(b"0\r\n\r\n")
+
+	def log_message(self, *args):
+		pass
+
+class TwitterStreamTests(unittest.TestCase):
+
+	def setUp(self):
+		ChunkedStreamHandler.connections = 0
+		ChunkedStreamHandler.malformed = False
+		self.server = LocalServer(("127.0.0.1", 0), ChunkedStreamHandler)
+		threading.Thread(target=self.server.serve_forever, daemon=True).start()
+		self.url = "http://127.0.0.1:{port}/stream".format(port=self.server.server_address[1])
+		self.client = TwitterClient(app_key="key", app_secret="secret", oauth_token="token", oauth_token_secret="secret")
+
+	def tearDown(self):
+		self.server.shutdown()
+		self.server.server_close()
+
+	def test_stream_search_reconnects(self):
+		data = self.client.stream_search("trump", 5, timeout=10, url=self.url, auth=None, backoff=0.01)
+		self.assertEqual([entry["id"] for entry in data], [0, 1, 2, 3, 4])
+		self.assertGreaterEqual(ChunkedStreamHandler.connections, 2)
+
+	def test_drop_oldest(self):
+		stream = self.client.stream(["trump"], url=self.url, auth=None, bufferSize=2, backoff=60)
+		stream.start()
+		while stream.stats["received"] < 3:
+			time.sleep(0.01)
+		stream.stop()
+		self.assertEqual([entry["id"] for entry in stream], [1, 2])
+		self.assertEqual(stream.stats["dropped"], 1)
+
+	def test_spill(self):
+		stream = self.client.stream(["trump"], url=self.url, auth=None, bufferSize=1, overflow="spill", backoff=60)
+		stream.start()
+		while stream.stats["received"] < 3:
+			time.sleep(0.01)
+		stream.stop()
+		self.assertEqual([entry["id"] for entry in stream], [0, 1, 2])
+		self.assertEqual(stream.stats["spilled"], 2)
+
+	def test_malformed_messages_keep_the_connection(self):
+		ChunkedStreamHandler.malformed = True
+		stream = self.client.stream(["trump"], url=self.url, auth=None, backoff=60)
+		stream.start()
+		while stream.stats["received"] < 3:
+			time.sleep(0.01)
+		stream.stop()
+		self.assertEqual([entry["id"] for entry in stream], [0, 1, 2])
+		self.assertEqual((stream.stats["malformed"], stream.stats["reconnects"], ChunkedStreamHandler.connections), (2, 0, 1))
+
+if __name__ == '__main__':
+	unittest.main()